@@ -0,0 +1,186 @@
+"""Time the editor's hot paths on synthetic documents and save the results as JSON.
+
+    python benchmarks/bench.py                      # medium preset, prints a table
+    python benchmarks/bench.py --preset large -o after.json
+    python benchmarks/bench.py -o after.json --compare before.json
+
+Each case generates a document (see generate.py), writes it to a temporary
+file and times loading it, rendering ``toml_text``, saving, and the commands
+the frontend sends. ``--compare`` prints the ratio to an earlier run and
+exits with status 1 if any case slowed down by more than ``--threshold``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+sys.path.insert(0, str(HERE))
+
+import tomli_w  # noqa: E402
+
+import marimo_toml_editor  # noqa: E402
+from generate import edit_paths, generate  # noqa: E402
+from marimo_toml_editor import TomlConfigEditor  # noqa: E402
+
+# (shape, size) per preset; "large" files are a few MB each
+PRESETS: Dict[str, List[tuple]] = {
+    "small": [("deep", 5), ("wide", 50), ("arrays", 200), ("aot", 50), ("mixed", 20)],
+    "medium": [("deep", 60), ("wide", 1500), ("arrays", 5000), ("aot", 1000), ("mixed", 300)],
+    "large": [("deep", 600), ("wide", 15000), ("arrays", 50000), ("aot", 10000), ("mixed", 3000)],
+}
+
+
+def measure(fn: Callable[[], Any], setup: Optional[Callable[[], Any]] = None, repeat: int = 7) -> Dict[str, float]:
+    """Run ``fn`` ``repeat`` times (``setup`` untimed before each) and summarise in ms."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return {
+        "n": repeat,
+        "min_ms": round(min(times), 4),
+        "median_ms": round(statistics.median(times), 4),
+        "mean_ms": round(statistics.fmean(times), 4),
+    }
+
+
+def command(w: TomlConfigEditor, cmd: str, payload: Dict[str, Any]) -> None:
+    """Send a command the way the frontend does: as a request message."""
+    w._on_request({"type": "request", "batch": [{"id": "bench", "command": cmd, "payload": payload}]}, [])
+
+
+def bench_case(shape: str, size: int, workdir: Path, repeat: int) -> List[Dict[str, Any]]:
+    doc = generate(shape, size)
+    path = workdir / f"{shape}-{size}.toml"
+    path.write_text(tomli_w.dumps(doc), encoding="utf-8")
+    nbytes = path.stat().st_size
+    edits = iter(edit_paths(doc, 10 * repeat + 10))
+    out = workdir / f"{shape}-{size}.out.toml"
+    cache = TomlConfigEditor.parse_cache
+
+    w = TomlConfigEditor()
+    results: Dict[str, Dict[str, float]] = {}
+
+    def fresh_edit() -> Dict[str, Any]:
+        p = next(edits)
+        cur: Any = w.data
+        for seg in p[:-1]:
+            cur = cur[seg]
+        old = cur[p[-1]]
+        value = old + 1 if isinstance(old, int) and not isinstance(old, bool) else f"{old}!"
+        return {"op": "replace", "path": p, "value": value}
+
+    def patch() -> None:
+        command(w, "patch", {
+            "epoch": w._epoch, "base": w.data_version, "ops": [fresh_edit()], "origin": "edit", "entry": None,
+        })
+
+    results["load.cold"] = measure(lambda: w.load(str(path), progressive=False), setup=cache.clear, repeat=repeat)
+    results["load.cached"] = measure(lambda: w.load(str(path), progressive=False), repeat=repeat)
+    results["toml_text.full"] = measure(w._sync_toml_text, setup=w._invalidate_toml_text, repeat=repeat)
+    results["toml_text.after_edit"] = measure(w._sync_toml_text, setup=patch, repeat=repeat)
+    results["command.patch"] = measure(patch, repeat=repeat)
+    results["command.render_text"] = measure(lambda: command(w, "render_text", {}), setup=patch, repeat=repeat)
+    results["save.after_edit"] = measure(lambda: w.save(str(out)), setup=patch, repeat=repeat)
+    results["save.unchanged"] = measure(lambda: w.save(str(out)), repeat=repeat)
+    assert w.status.startswith("Saved"), w.status
+
+    # Progressive load: the frontend asks for table bodies as tabs open
+    w.load(str(path), progressive=True)
+    tables = [k for k, v in w.data.items() if isinstance(v, dict)]
+    if tables:
+        results["command.load_tables"] = measure(
+            lambda: command(w, "load_tables", {"keys": tables[:1]}),
+            setup=lambda: command(w, "evict_tables", {"keys": tables[:1]}),
+            repeat=repeat,
+        )
+    w.close()
+    return [
+        {"case": f"{shape}-{size}", "shape": shape, "size": size, "bytes": nbytes, "op": op, **r}
+        for op, r in results.items()
+    ]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, threshold: float) -> bool:
+    """Print ratios against a baseline run; True if nothing regressed."""
+    with open(baseline_path, encoding="utf-8") as f:
+        base = {(r["case"], r["op"]): r for r in json.load(f)["results"]}
+    ok = True
+    print(f"\n{'case':<18} {'op':<22} {'before':>10} {'after':>10} {'ratio':>7}")
+    for r in results:
+        b = base.get((r["case"], r["op"]))
+        if b is None:
+            continue
+        ratio = r["median_ms"] / b["median_ms"] if b["median_ms"] else float("inf")
+        flag = "  <-- slower" if ratio > threshold else ""
+        ok = ok and not flag
+        print(f"{r['case']:<18} {r['op']:<22} {b['median_ms']:>10.3f} {r['median_ms']:>10.3f} {ratio:>7.2f}{flag}")
+    return ok
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--preset", choices=sorted(PRESETS), default="medium")
+    ap.add_argument("--shape", action="append", help="only these shapes (repeatable)")
+    ap.add_argument("--repeat", type=int, default=7)
+    ap.add_argument("-o", "--out", help="write results to this JSON file")
+    ap.add_argument("--compare", metavar="BASELINE", help="JSON from an earlier run")
+    ap.add_argument("--threshold", type=float, default=1.25, help="ratio counted as a regression")
+    args = ap.parse_args()
+
+    cases = [c for c in PRESETS[args.preset] if not args.shape or c[0] in args.shape]
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for shape, size in cases:
+            rows = bench_case(shape, size, Path(tmp), args.repeat)
+            for r in rows:
+                print(f"{r['case']:<18} {r['bytes'] / 1e6:>7.2f} MB  {r['op']:<22} {r['median_ms']:>10.3f} ms")
+            results.extend(rows)
+
+    report = {
+        "meta": {
+            "version": marimo_toml_editor.__version__,
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "preset": args.preset,
+            "repeat": args.repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare and not compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,847 @@
+"""Behaviour checks: small scripted scenarios that must keep working.
+
+    python benchmarks/check_behaviour.py [-k NAME]
+
+Each check builds an editor or document in a temporary directory, drives it
+through the public API (or the frontend's requests) and asserts on what it
+sees, on disk included. Checks needing tomli-w, or node for the ones that
+run widget.js, are skipped without it.
+Prints one line per check and exits with status 1 if any failed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from unittest import mock
+
+HERE = Path(__file__).resolve().parent
+WIDGET = HERE.parent / "src" / "marimo_toml_editor" / "static" / "widget.js"
+sys.path.insert(0, str(HERE.parent / "src"))
+
+from marimo_toml_editor import TomlConfigEditor, TomlDocument, bulk_apply  # noqa: E402
+from marimo_toml_editor._fileio import write_atomic  # noqa: E402
+from marimo_toml_editor._patch import apply_ops  # noqa: E402
+from marimo_toml_editor._serialize import writer  # noqa: E402
+from marimo_toml_editor._tasks import SerialRunner  # noqa: E402
+from marimo_toml_editor._wire import decode, encode, is_frame  # noqa: E402
+
+CHECKS: List[Callable[[Path], None]] = []
+
+
+class Skip(Exception):
+    pass
+
+
+def check(fn: Callable[[Path], None]) -> Callable[[Path], None]:
+    CHECKS.append(fn)
+    return fn
+
+
+def needs_tomli_w() -> None:
+    if writer() is None:
+        raise Skip("tomli-w isn't installed")
+
+
+@contextmanager
+def without_tomli_w() -> Iterator[None]:
+    """As if the optional tomli-w weren't installed."""
+    with mock.patch.dict(sys.modules, {"tomli_w": None}):
+        yield
+
+
+def request(w: TomlConfigEditor, command: str, payload: Dict[str, Any]) -> None:
+    """Send a command the way the frontend does."""
+    w._on_request({"type": "request", "batch": [{"id": "check", "command": command, "payload": payload}]}, [])
+
+
+def patch(w: TomlConfigEditor, ops: List[Dict[str, Any]], origin: str = "edit", entry: Optional[int] = None) -> None:
+    """An edit (or undo/redo of the frontend's entry ``entry``) made in the frontend."""
+    request(w, "patch", {"epoch": w._epoch, "base": w.data_version, "ops": ops, "origin": origin, "entry": entry})
+
+
+# Runs an ES module against widget.js, with the benchmarks' DOM and model stand-ins
+NODE_PRELUDE = """
+const [shim, models, widgetJs] = process.argv.slice(1);
+(await import(shim)).installDom();
+const { initialState, makeModel, servePython } = await import(models);
+const { default: widget, wireValue } = await import(widgetJs);
+function check(ok, what) { if (!ok) throw new Error(what); }
+"""
+
+
+def in_node(script: str) -> None:
+    """Run ``script`` after ``NODE_PRELUDE``; it fails the check by throwing."""
+    if shutil.which("node") is None:
+        raise Skip("node isn't installed")
+    js = HERE / "js"
+    args = [(js / "dom-shim.mjs").as_uri(), (js / "model.mjs").as_uri(), WIDGET.as_uri()]
+    run = subprocess.run(
+        ["node", "--input-type=module", "-e", NODE_PRELUDE + script, *args], capture_output=True, text=True
+    )
+    assert run.returncode == 0, run.stderr
+
+
+# ---------------------------------------------------------------------------
+# Editing and history
+# ---------------------------------------------------------------------------
+
+
+@check
+def get_returns_default_for_missing_paths(tmp: Path) -> None:
+    for editor in (TomlConfigEditor(), TomlDocument({})):
+        editor.set("server.port", 80)
+        assert editor.get("server.port") == 80
+        assert editor.get("server.host") is None
+        assert editor.get("server.port.x", 1) == 1
+        assert editor.get("nope", "d") == "d"
+
+
+@check
+def dotted_array_indices_become_ints(tmp: Path) -> None:
+    doc = TomlDocument({"servers": [{"port": 80}], "t": {"0": "key"}})
+    inverse = doc.apply_ops([{"op": "replace", "path": "servers.0.port", "value": 81}])
+    assert inverse == [{"op": "replace", "path": ["servers", 0, "port"], "value": 80}], inverse
+    # "0" names a key in a table
+    assert doc.apply_ops([{"op": "remove", "path": "t.0"}]) == [{"op": "add", "path": ["t", "0"], "value": "key"}]
+
+    w = TomlConfigEditor()
+    w.data = {"servers": [{"port": 80}, {"port": 90}]}
+    view = w.select("servers.1")
+    w.set("servers.0.port", 81)
+    assert w.data_patch["ops"][0]["path"] == ["servers", 0, "port"], w.data_patch
+    assert view.version == 0
+    w.apply_ops([{"op": "remove", "path": "servers.0"}])
+    assert w.data_patch["ops"][0]["path"] == ["servers", 0], w.data_patch
+    assert view.value is None and view.version == 1, view.value
+
+
+@check
+def failed_document_batch_changes_nothing(tmp: Path) -> None:
+    needs_tomli_w()
+    text = "# settings\nname = \"app\"\n\n[server]\nport = 80\nhosts = [\"a\"]\n"
+    (tmp / "c.toml").write_text(text)
+    doc = TomlDocument.load(tmp / "c.toml", cache=False)
+    before = copy.deepcopy(doc.data)
+    try:
+        doc.apply_ops([
+            {"op": "replace", "path": "server.port", "value": 81},
+            {"op": "add", "path": "extra.k", "value": 1},
+            {"op": "remove", "path": ["server", "hosts", 3]},
+        ])
+    except IndexError:
+        pass
+    else:
+        raise AssertionError("the batch should have failed")
+    assert doc.data == before and not doc.changed, doc.data
+    assert doc.save() is False
+    assert (tmp / "c.toml").read_text() == text
+    # Later edits are still spliced in, and only they are
+    doc.set("name", "other")
+    assert doc.save() is True
+    assert (tmp / "c.toml").read_text() == text.replace('"app"', '"other"')
+
+
+@check
+def op_values_are_copied(tmp: Path) -> None:
+    w = TomlConfigEditor()
+    mine = {"a": 1}
+    w.apply_ops([{"op": "add", "path": "t", "value": mine}])
+    w.set("t.a", 2)
+    assert mine == {"a": 1}, mine
+    assert w.history[0]["ops"][0]["value"] == {"a": 1}, w.history
+    w.history[0]["ops"][0]["value"]["a"] = 3  # a copy, too
+    assert w.undo() and w.undo() and w.data == {}
+    assert w.redo() and w.data == {"t": {"a": 1}}, w.data
+    w.data["t"]["a"] = 4  # not the history's object
+    assert w.undo() and w.redo() and w.data == {"t": {"a": 1}}, w.data
+    doc = TomlDocument({})
+    doc.set("t", mine)
+    doc.set("t.a", 5)
+    assert mine == {"a": 1}, mine
+
+
+@check
+def inverse_ops_restore_the_document(tmp: Path) -> None:
+    original = {"a": 1, "t": {"x": [1, 2], "u": {"y": "z"}}, "aot": [{"n": 1}, {"n": 2}]}
+    for op in [
+        {"op": "add", "path": ["b"], "value": 2},
+        {"op": "add", "path": ["new", "deep", "k"], "value": {"v": 1}},  # creates tables
+        {"op": "replace", "path": ["t", "u"], "value": 3},
+        {"op": "remove", "path": ["t", "u", "y"]},
+        {"op": "remove", "path": ["missing"]},  # nothing to undo
+        {"op": "add", "path": ["t", "x", 0], "value": 0},
+        {"op": "replace", "path": ["aot", "1", "n"], "value": 5},
+        {"op": "remove", "path": ["aot", 0]},
+        {"op": "replace", "path": [], "value": {"only": True}},
+    ]:
+        doc = copy.deepcopy(original)
+        inverse = apply_ops(doc, [op])
+        apply_ops(doc, inverse)
+        assert doc == original, (op, doc)
+
+
+@check
+def failed_batch_leaves_the_document_alone(tmp: Path) -> None:
+    original = {"a": 1, "t": {"x": [1, 2]}}
+    bad = [
+        {"op": "replace", "path": ["a"], "value": 99},
+        {"op": "add", "path": ["new", "k"], "value": 1},
+        {"op": "remove", "path": ["t", "x", 0]},
+        {"op": "remove", "path": ["t", "x", 5]},  # out of range
+    ]
+    doc = copy.deepcopy(original)
+    try:
+        apply_ops(doc, bad)
+    except IndexError:
+        pass
+    else:
+        raise AssertionError("the batch should have failed")
+    assert doc == original, doc
+
+    (tmp / "c.toml").write_text("a = 1\n\n[t]\nx = [1, 2]\n")
+    w = TomlConfigEditor(str(tmp / "c.toml"))
+    version = w.data_version
+    try:
+        w.apply_ops(bad)
+    except IndexError:
+        pass
+    assert w.data == original and w.data_version == version, w.data
+    assert not w.can_undo
+
+
+@check
+def history_is_bounded_and_forgets_undone_edits(tmp: Path) -> None:
+    w = TomlConfigEditor(history_limit=3)
+    for i in range(5):
+        w.set("n", i)
+    assert [e["ops"][0]["value"] for e in w.history] == [2, 3, 4], w.history
+    assert w.undo() and w.undo() and w.can_redo
+    w.set("m", 1)  # a new edit: the undone ones can't come back
+    assert not w.can_redo and not w.redo()
+    while w.undo():
+        pass
+    assert w.data == {"n": 1}, w.data  # as of the oldest edit kept
+    assert w.redo() and w.data == {"n": 2}, w.data
+
+
+@check
+def frontend_undo_matches_python_history(tmp: Path) -> None:
+    w = TomlConfigEditor()
+    w.data = {"a": 1}
+    patch(w, [{"op": "replace", "path": ["a"], "value": 2}])
+    patch(w, [{"op": "replace", "path": ["a"], "value": 1}], "undo", entry=w.data_version)
+    assert w.data == {"a": 1} and not w.can_undo and w.can_redo
+    assert w.redo() and w.data == {"a": 2} and w.can_undo
+
+
+# ---------------------------------------------------------------------------
+# Views
+# ---------------------------------------------------------------------------
+
+
+def watched(view: Any) -> List[Any]:
+    """The values ``view`` notifies its observers of."""
+    seen: List[Any] = []
+    view.observe(lambda change: seen.append(change["new"]), "value")
+    return seen
+
+
+@check
+def views_refresh_only_for_their_subtree(tmp: Path) -> None:
+    w = TomlConfigEditor()
+    w.data = {"server": {"port": 80, "tls": {"on": False}}, "logging": {"level": "info"}}
+    server, port, tls = w.select("server"), w.select("server.port"), w.select("server.tls")
+    seen = {name: watched(v) for name, v in [("server", server), ("port", port), ("tls", tls)]}
+    w.set("logging.level", "debug")
+    assert seen == {"server": [], "port": [], "tls": []}, seen
+    w.set("server.port", 81)  # below server, at port, beside tls
+    assert seen["server"] == [{"port": 81, "tls": {"on": False}}] and seen["port"] == [81], seen
+    assert seen["tls"] == [] and tls.version == 0
+    patch(w, [{"op": "replace", "path": ["server"], "value": {"tls": {"on": True}}}])  # above all three
+    assert port.value is None and tls.value == {"on": True}, (port.value, tls.value)
+    assert [port.version, tls.version, server.version] == [2, 1, 2]
+    # A copy: editing it changes nothing
+    tls.value["on"] = False
+    assert w.get("server.tls.on") is True
+
+
+@check
+def views_follow_array_inserts_and_removals(tmp: Path) -> None:
+    w = TomlConfigEditor()
+    w.data = {"hosts": ["a", "b", "c"]}
+    first, last = w.select("hosts.0"), w.select("hosts.2")
+    w.apply_ops([{"op": "add", "path": "hosts.0", "value": "z"}])
+    assert (first.value, last.value) == ("z", "b"), (first.value, last.value)
+    patch(w, [{"op": "remove", "path": ["hosts", 0]}, {"op": "remove", "path": ["hosts", 0]}])
+    assert (first.value, last.value) == ("b", None), (first.value, last.value)
+    w.undo()
+    assert (first.value, last.value) == ("z", "b"), (first.value, last.value)
+
+
+@check
+def whole_document_changes_refresh_every_view(tmp: Path) -> None:
+    (tmp / "c.toml").write_text("a = 1\n\n[t]\nx = 2\n")
+    w = TomlConfigEditor()
+    w.data = {"a": 0, "t": {"x": 0}}
+    a, x = w.select("a"), w.select("t.x")
+    w.load(str(tmp / "c.toml"))
+    assert (a.value, x.value) == (1, 2)
+    w.data = {"t": {"x": 3}}
+    assert (a.value, x.value) == (None, 3)
+    patch(w, [{"op": "replace", "path": [], "value": {"a": 5}}])
+    assert (a.value, x.value) == (5, None)
+    w.undo()
+    assert (a.value, x.value) == (None, 3)
+
+
+@check
+def views_stay_quiet_when_the_value_is_unchanged(tmp: Path) -> None:
+    w = TomlConfigEditor()
+    w.data = {"server": {"port": 80, "host": "x"}, "hosts": ["a", "a"]}
+    server, hosts, second = w.select("server"), w.select("hosts"), w.select("hosts.1")
+    seen = [watched(server), watched(hosts), watched(second)]
+    w.set("server.port", 80)
+    w.apply_ops([{"op": "replace", "path": "server", "value": {"port": 80, "host": "x"}}])
+    w.apply_ops([{"op": "remove", "path": "hosts.0"}, {"op": "add", "path": "hosts.0", "value": "a"}])
+    w.data = {"server": {"port": 80, "host": "x"}, "hosts": ["a", "a"]}
+    assert seen == [[], [], []], seen
+    assert [server.version, hosts.version, second.version] == [0, 0, 0]
+
+
+# ---------------------------------------------------------------------------
+# Frontend requests
+# ---------------------------------------------------------------------------
+
+
+def replies_to(w: TomlConfigEditor, content: Dict[str, Any], buffers: Optional[List[Any]] = None) -> List[Any]:
+    """The messages ``w`` sends back for one request message, with their buffers."""
+    out: List[Any] = []
+    with mock.patch.object(w, "send", lambda msg, buffers=None: out.append((msg, buffers))):
+        w._on_request(content, buffers or [])
+    return out
+
+
+@check
+def a_batch_gets_one_reply(tmp: Path) -> None:
+    w = TomlConfigEditor()
+    w.data = {"a": 1}
+    batch = [
+        {"id": "v:1", "command": "patch", "payload": {"epoch": w._epoch, "base": w.data_version,
+                                                     "ops": [{"op": "replace", "path": ["a"], "value": 2}]}},
+        {"id": "v:2", "command": "no_such_command", "payload": {}},
+        {"id": "v:3", "command": "undo"},
+        {"id": "v:4", "command": "undo"},
+    ]
+    sent = replies_to(w, {"type": "request", "batch": batch})
+    assert len(sent) == 1, sent
+    msg, _ = sent[0]
+    assert msg["type"] == "reply" and [r["id"] for r in msg["replies"]] == ["v:1", "v:2", "v:3", "v:4"], msg
+    assert [r["ok"] for r in msg["replies"]] == [True, False, True, True], msg
+    patched, unknown, undone, nothing = msg["replies"]
+    assert patched["result"] == w.data_version - 1 and undone["result"] is True and nothing["result"] is False
+    assert unknown["error"] == "ValueError: Unknown command: 'no_such_command'", unknown
+    # The commands after the bad one still ran
+    assert w.data == {"a": 1} and not w.can_undo
+    assert replies_to(w, {"type": "request", "batch": []}) == []
+
+
+@check
+def binary_requests_get_binary_replies(tmp: Path) -> None:
+    w = TomlConfigEditor(wire="binary", compress_bytes=256)
+    w.data = {"a": 1}
+    long = list(range(1000))
+    batch = [
+        {"id": "v:1", "command": "patch", "payload": {"epoch": w._epoch, "base": w.data_version,
+                                                     "ops": [{"op": "add", "path": ["long"], "value": long}]}},
+        {"id": "v:2", "command": "undo"},
+        {"id": "v:3", "command": "redo"},
+    ]
+    frame = encode(batch, 256)
+    assert frame["$wire"] == "msgpack+deflate"
+    buffer = frame.pop("buffer")
+    sent = replies_to(w, {"type": "request", "batch": frame}, [buffer])
+    assert w.data == {"a": 1, "long": long}, w.data
+    assert len(sent) == 1, sent
+    msg, buffers = sent[0]
+    assert msg["type"] == "reply" and is_frame(msg["replies"]) and len(buffers) == 1, msg
+    replies = decode({**msg["replies"], "buffer": buffers[0]})
+    assert [(r["id"], r["ok"], r["result"]) for r in replies] == [
+        ("v:1", True, w.data_version - 2), ("v:2", True, True), ("v:3", True, True)
+    ], replies
+
+
+@check
+def edits_are_published_live_or_deferred(tmp: Path) -> None:
+    in_node("""
+function mount(extra) {
+    const model = makeModel(initialState({ a: 1, b: 2 }, extra), wireValue);
+    model.saves = 0;
+    model.save_changes = () => { model.saves += 1; };
+    const el = document.createElement("div");
+    document.body.appendChild(el);
+    widget.render({ model, el });
+    return { model, el };
+}
+function edit({ model, el }) {
+    const input = [...el.querySelectorAll("[data-path]")]
+        .flatMap(row => [...row.querySelectorAll("input")]).find(i => /\\bnum\\b/.test(i.className));
+    input.value = String(Number(input.value) + 1);
+    input.dispatchEvent(new Event("change", { bubbles: true }));
+    servePython(model);
+}
+const apply = el => [...el.querySelectorAll("button")].find(b => b.textContent.includes("Apply"));
+
+// live: every edit is published with it
+const live = mount({ publish: "live" });
+edit(live); edit(live);
+check(live.model.state.published === 2 && live.model.saves === 2, `live: ${live.model.state.published}`);
+check(!apply(live.el).classList.contains("visible"), "live: Apply shown");
+
+// deferred: on Apply, then when focus leaves the widget, then on switching to live
+const def = mount({ publish: "deferred" });
+const button = apply(def.el);
+check(button.classList.contains("visible") && button.disabled, "deferred: Apply not idle");
+edit(def); edit(def);
+check(def.model.state.published === 0 && def.model.saves === 0, "deferred: published on edit");
+check(!button.disabled, "deferred: Apply disabled after an edit");
+button.click();
+check(def.model.state.published === 1 && def.model.saves === 1 && button.disabled, "deferred: Apply");
+button.click();
+check(def.model.state.published === 1, "deferred: Apply without edits published");
+edit(def);
+const focusout = relatedTarget => button.dispatchEvent(new Event("focusout", { bubbles: true, relatedTarget }));
+focusout(def.el.querySelector("input"));
+check(def.model.state.published === 1, "deferred: published when focus moved inside");
+focusout(null);
+check(def.model.state.published === 2, "deferred: not published on blur");
+edit(def);
+def.model.pythonSet({ publish: "live" });
+check(def.model.state.published === 3, "deferred: not published on switching to live");
+
+// publish_delay: published once the edits stop
+const timed = mount({ publish: "deferred", publish_delay: 0.05 });
+edit(timed);
+await new Promise(r => setTimeout(r, 20));
+edit(timed);
+check(timed.model.state.published === 0, "publish_delay: published too early");
+await new Promise(r => setTimeout(r, 120));
+check(timed.model.state.published === 1 && timed.model.saves === 1, "publish_delay: not published once");
+""")
+
+
+# ---------------------------------------------------------------------------
+# Saving
+# ---------------------------------------------------------------------------
+
+
+@check
+def save_refuses_stand_in_tables(tmp: Path) -> None:
+    # The frontend's text has every table it hasn't fetched empty
+    path = tmp / "big.toml"
+    original = 'title = "x"\n[server]\nport = 1\n[db]\nurl = "u"\n'
+    path.write_text(original)
+    with without_tomli_w():
+        w = TomlConfigEditor(hydration="lazy")
+        w.load(str(path))
+        w._last_save_path = str(path)
+        w.set("title", "y")
+        request(w, "save_local", {"content": 'title = "y"\n[server]\n[db]\n'})
+    assert path.read_text() == original, path.read_text()
+    assert "tomli-w" in w.status, w.status
+
+
+@check
+def atomic_writes_keep_modes_and_the_umask(tmp: Path) -> None:
+    old = os.umask(0o027)
+    try:
+        with mock.patch("os.umask", side_effect=AssertionError("umask changed")):
+            write_atomic(tmp / "new.toml", b"a = 1\n")
+            (tmp / "kept.toml").write_bytes(b"")
+            os.chmod(tmp / "kept.toml", 0o604)
+            write_atomic(tmp / "kept.toml", b"a = 1\n")
+    finally:
+        os.umask(old)
+    assert (tmp / "new.toml").stat().st_mode & 0o777 == 0o640
+    assert (tmp / "kept.toml").stat().st_mode & 0o777 == 0o604
+    assert (tmp / "kept.toml").read_bytes() == b"a = 1\n"
+    assert sorted(p.name for p in tmp.iterdir()) == ["kept.toml", "new.toml"]
+
+
+@check
+def unchanged_saves_leave_the_file_alone(tmp: Path) -> None:
+    needs_tomli_w()
+    path = tmp / "app.toml"
+    path.write_text("a = 1  # keep\n")
+    doc = TomlDocument.load(path)
+    os.utime(path, ns=(1, 1))
+    assert doc.save() is False
+    assert path.stat().st_mtime_ns == 1
+    doc.set("a", 2)
+    assert doc.save() is True
+    assert path.read_text() == "a = 2  # keep\n"
+
+
+@check
+def failed_atomic_write_keeps_the_old_file(tmp: Path) -> None:
+    path = tmp / "app.toml"
+    path.write_bytes(b"a = 1\n")
+    with mock.patch("os.replace", side_effect=OSError("no")):
+        try:
+            write_atomic(path, b"a = 2\n")
+        except OSError:
+            pass
+        else:
+            raise AssertionError("write_atomic didn't raise")
+    assert path.read_bytes() == b"a = 1\n"
+    assert [p.name for p in tmp.iterdir()] == ["app.toml"]  # no temporary file left
+
+
+@check
+def new_sub_table_goes_after_its_parent(tmp: Path) -> None:
+    needs_tomli_w()
+    path = tmp / "app.toml"
+    path.write_text("a = 1\n[t]\nb = 2  # c\n")
+    doc = TomlDocument.load(path)
+    doc.set("t.new", {"x": 1})
+    doc.save()
+    assert path.read_text() == "a = 1\n[t]\nb = 2  # c\n\n[t.new]\nx = 1\n", path.read_text()
+
+
+@check
+def close_stops_the_worker_thread(tmp: Path) -> None:
+    needs_tomli_w()
+    before = threading.active_count()
+    w = TomlConfigEditor(background=True)
+    w.set("a", 1)
+    w._last_save_path = str(tmp / "a.toml")
+    request(w, "save_local", {})
+    w.close()
+    for t in threading.enumerate():
+        if t.name.startswith("toml-editor"):
+            t.join(5)
+    assert threading.active_count() == before, threading.enumerate()
+    assert (tmp / "a.toml").read_text() == "a = 1\n"
+
+
+@check
+def queued_jobs_coalesce_in_order(tmp: Path) -> None:
+    runner = SerialRunner()
+    busy, gate, ran = threading.Event(), threading.Event(), []
+
+    def job(name: str) -> Callable[[], None]:
+        return lambda: ran.append(name)
+
+    def block() -> None:
+        busy.set()
+        gate.wait(5)
+
+    runner.submit("save", block)
+    busy.wait(5)  # a save is running: the next ones queue behind it
+    assert runner.submit("save", job("save 1")) is True
+    assert runner.submit("save", job("save 2")) is False  # replaces save 1
+    assert runner.submit("load", job("load")) is True
+    # Queued ahead of the load: moves behind it rather than overtaking it
+    assert runner.submit("save", job("save 3")) is False
+    assert runner.submit("render", job("render")) is True
+    gate.set()
+    runner.wait()
+    assert ran == ["load", "save 3", "render"], ran
+    runner.shutdown(wait=True)
+
+
+@check
+def edits_wait_for_the_worker(tmp: Path) -> None:
+    (tmp / "c.toml").write_text("n = 0\n")
+    w = TomlConfigEditor()
+    w.set("n", 1)
+    w.set("n", 2)
+    w.undo()
+    edits: Dict[str, Callable[[], Any]] = {
+        "set": lambda: w.set("n", 3),
+        "apply_ops": lambda: w.apply_ops([{"op": "add", "path": "m", "value": 1}]),
+        "undo": w.undo,
+        "redo": w.redo,
+        "load": lambda: w.load(str(tmp / "c.toml")),
+        "data": lambda: setattr(w, "data", {"n": 4}),
+    }
+    for name, edit in edits.items():
+        # The background worker holds the lock while it works on data
+        with w._lock:
+            t = threading.Thread(target=edit)
+            t.start()
+            t.join(0.2)
+            assert t.is_alive(), f"{name} didn't wait for the lock"
+        t.join(5)
+        assert not t.is_alive(), name
+
+
+# ---------------------------------------------------------------------------
+# Watching
+# ---------------------------------------------------------------------------
+
+
+def until(cond: Callable[[], Any], what: str, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            raise AssertionError(f"timed out waiting for {what}")
+        time.sleep(0.02)
+
+
+def rewrite(path: Path, text: str) -> None:
+    """Replace ``path`` the way most editors do: write a copy, rename it over."""
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+WATCHED = "a = 1\n\n[s]\nx = 1\n\n[t]\ny = 1\n"
+
+
+@check
+def outside_rewrites_arrive_as_table_ops(tmp: Path) -> None:
+    (tmp / "c.toml").write_text(WATCHED)
+    w = TomlConfigEditor(str(tmp / "c.toml"), watch=True)
+    try:
+        rewrite(tmp / "c.toml", WATCHED.replace("y = 1", "y = 2\nz = 3"))
+        until(lambda: w.get("t.z") == 3, "the reload")
+        assert w.data_patch["origin"] == "external", w.data_patch
+        assert w.data_patch["ops"] == [{"op": "replace", "path": ["t"], "value": {"y": 2, "z": 3}}], w.data_patch
+        assert not w.can_undo and not w.conflict
+        rewrite(tmp / "c.toml", "a = 1\n\n[t]\ny = 2\nz = 3\n\n[u]\n")
+        until(lambda: "u" in w.data, "the second reload")
+        assert w.data_patch["ops"] == [{"op": "add", "path": ["u"], "value": {}}, {"op": "remove", "path": ["s"]}]
+    finally:
+        w.close()
+
+
+@check
+def outside_rewrites_dont_overwrite_unsaved_edits(tmp: Path) -> None:
+    needs_tomli_w()
+    for action in ("keep", "reload"):
+        (tmp / "c.toml").write_text(WATCHED)
+        w = TomlConfigEditor(str(tmp / "c.toml"), watch=True)
+        try:
+            w.set("a", 5)
+            rewrite(tmp / "c.toml", WATCHED.replace("y = 1", "y = 2"))
+            until(lambda: w.conflict, "the conflict")
+            assert w.conflict == {"path": "c.toml", "tables": ["t"]}, w.conflict
+            assert w.data == {"a": 5, "s": {"x": 1}, "t": {"y": 1}}, w.data
+            request(w, "resolve_conflict", {"action": action})
+            assert not w.conflict
+            if action == "keep":
+                assert w.data == {"a": 5, "s": {"x": 1}, "t": {"y": 1}}, w.data
+                w.save(str(tmp / "c.toml"))
+                assert (tmp / "c.toml").read_text() == WATCHED.replace("a = 1", "a = 5")
+            else:
+                assert w.data == {"a": 1, "s": {"x": 1}, "t": {"y": 2}}, w.data
+                assert not w._unsaved
+        finally:
+            w.close()
+
+
+@check
+def own_saves_are_not_reloaded(tmp: Path) -> None:
+    needs_tomli_w()
+    (tmp / "c.toml").write_text(WATCHED)
+    w = TomlConfigEditor(str(tmp / "c.toml"), watch=True)
+    try:
+        with mock.patch.object(w, "_reload_from", wraps=w._reload_from) as reload:
+            w.set("a", 2)
+            w.save(str(tmp / "c.toml"))
+            w.set("a", 3)  # unsaved again: a reload would be a conflict
+            time.sleep(0.5)
+            assert not reload.called and not w.conflict, w.conflict
+            assert w.get("a") == 3 and (tmp / "c.toml").read_text() == WATCHED.replace("a = 1", "a = 2")
+            w.save(str(tmp / "c.toml"))
+            rewrite(tmp / "c.toml", WATCHED)  # still watching
+            until(lambda: reload.called, "the reload")
+            assert w.get("a") == 1
+    finally:
+        w.close()
+
+
+# ---------------------------------------------------------------------------
+# Parse cache
+# ---------------------------------------------------------------------------
+
+
+@check
+def cached_documents_are_not_shared(tmp: Path) -> None:
+    path = tmp / "app.toml"
+    path.write_text('[app]\nname = "x"\ntags = ["a"]\n')
+    e1 = TomlConfigEditor(path=str(path))
+    e2 = TomlConfigEditor(path=str(path))
+    e1.data["app"]["name"] = "LEAK"
+    e1.get("app.tags").append("LEAK")
+    assert e2.data == {"app": {"name": "x", "tags": ["a"]}}, e2.data
+    assert TomlConfigEditor(path=str(path)).data == e2.data
+    assert TomlDocument.load(path).data == e2.data
+    assert TomlConfigEditor.parse_cache.hits >= 3
+
+
+@check
+def changed_files_are_parsed_again(tmp: Path) -> None:
+    cache = TomlDocument.parse_cache
+    path = tmp / "app.toml"
+    path.write_text("a = 1\n")
+    assert TomlDocument.load(path).data == {"a": 1}
+    hits = cache.hits
+    assert TomlDocument.load(path).data == {"a": 1} and cache.hits == hits + 1
+    path.write_text("a = 22\n")
+    assert TomlDocument.load(path).data == {"a": 22}
+    assert TomlDocument.load(path, cache=False).data == {"a": 22}
+    old = cache.max_bytes
+    try:
+        cache.max_bytes = 0
+        cache.clear()
+        TomlDocument.load(path)
+        assert len(cache) == 0
+    finally:
+        cache.max_bytes = old
+
+
+# ---------------------------------------------------------------------------
+# Layers
+# ---------------------------------------------------------------------------
+
+
+def layered(tmp: Path, base: str, local: str = "") -> TomlConfigEditor:
+    (tmp / "base.toml").write_text(base)
+    (tmp / "local.toml").write_text(local)
+    return TomlConfigEditor(layers=[str(tmp / "base.toml"), str(tmp / "local.toml")])
+
+
+@check
+def layer_write_inside_array_by_dotted_path(tmp: Path) -> None:
+    # "servers.0.port" splits into strings; servers is still an array
+    w = layered(tmp, "[[servers]]\nport = 1\n[[servers]]\nport = 2\n")
+    w.set("servers.0.port", 9)
+    assert w.data == {"servers": [{"port": 9}, {"port": 2}]}, w.data
+    assert w._stack.docs[1] == {"servers": [{"port": 9}, {"port": 2}]}, w._stack.docs[1]
+
+
+@check
+def layer_undo_restores_write_layer(tmp: Path) -> None:
+    w = layered(tmp, 'name = "a"\n[[servers]]\nport = 1\n[db]\nurl = "u"\n', '[db]\nuser = "me"\n')
+    local = w._stack.docs[1]
+    before = copy.deepcopy(local)
+    w.set("servers.0.port", 9)
+    w.set("db.url", "v")
+    w.set("new.x.y", 1)
+    w.apply_ops([{"op": "remove", "path": "db.user"}])
+    edited = copy.deepcopy(local)
+    while w.undo():
+        pass
+    # Not a copy of servers (or an empty new table) left behind in local.toml
+    assert local == before, local
+    assert w.data == {"name": "a", "servers": [{"port": 1}], "db": {"url": "u", "user": "me"}}, w.data
+    while w.redo():
+        pass
+    assert local == edited, local
+
+
+@check
+def layer_undo_from_frontend_restores_write_layer(tmp: Path) -> None:
+    w = layered(tmp, "[[servers]]\nport = 1\n")
+    patch(w, [{"op": "replace", "path": ["servers", 0, "port"], "value": 5}])
+    assert w._stack.docs[1] == {"servers": [{"port": 5}]}, w._stack.docs[1]
+    entry = w.data_version
+    patch(w, [{"op": "replace", "path": ["servers", 0, "port"], "value": 1}], "undo", entry)
+    assert w._stack.docs[1] == {}, w._stack.docs[1]
+    patch(w, [{"op": "replace", "path": ["servers", 0, "port"], "value": 5}], "redo", entry)
+    assert w._stack.docs[1] == {"servers": [{"port": 5}]}, w._stack.docs[1]
+
+
+@check
+def failed_layer_save_can_be_retried(tmp: Path) -> None:
+    needs_tomli_w()
+    w = layered(tmp, "a = 1\n")
+    w.set("a", 2)
+    with mock.patch.object(w, "_write_file", side_effect=OSError("disk full")):
+        w.save_layers()
+    assert "disk full" in w.status, w.status
+    w.save_layers()
+    assert w.status == "Saved: local.toml", w.status
+    assert (tmp / "local.toml").read_text() == "a = 2\n"
+
+
+# ---------------------------------------------------------------------------
+# Bulk edits
+# ---------------------------------------------------------------------------
+
+
+@check
+def bulk_apply_reports_every_file(tmp: Path) -> None:
+    needs_tomli_w()
+    for workers in (1, 2):
+        (tmp / "a.toml").write_text("[db]\npool = 1  # tuned\n")
+        (tmp / "b.toml").write_text("[db]\npool = 20\n")
+        (tmp / "c.toml").write_text("not toml\n")
+        value = {"size": 20}
+        ops = [{"op": "replace", "path": "db.pool", "value": 20}, {"op": "add", "path": "db.extra", "value": value}]
+        results = bulk_apply(sorted(tmp.glob("*.toml")), ops, workers=workers)
+        assert [Path(r.path).name for r in results] == ["a.toml", "b.toml", "c.toml"], results
+        assert [r.written for r in results] == [True, True, False], results
+        assert results[2].error and "TOMLDecodeError" in results[2].error, results[2]
+        assert (tmp / "a.toml").read_text() == "[db]\npool = 20  # tuned\n\n[db.extra]\nsize = 20\n"
+        assert value == {"size": 20} and ops[0]["path"] == "db.pool"
+        # Already applied: nothing to write
+        assert [r.written for r in bulk_apply([tmp / "a.toml"], ops, workers=workers)] == [False]
+
+
+@check
+def replace_needs_an_existing_value(tmp: Path) -> None:
+    needs_tomli_w()
+    (tmp / "a.toml").write_text("name = \"a\"\n")
+    (tmp / "b.toml").write_text("[db]\nhost = \"x\"\n")
+    ops = [{"op": "replace", "path": "db.pool", "value": 20}]
+    a, b = bulk_apply(sorted(tmp.glob("*.toml")), ops, workers=1)
+    assert not a.written and a.error and "KeyError" in a.error, a
+    assert not b.written and b.error and "KeyError" in b.error, b
+    assert (tmp / "a.toml").read_text() == "name = \"a\"\n"
+    assert (tmp / "b.toml").read_text() == "[db]\nhost = \"x\"\n"
+    # add still creates what it needs
+    (c,) = bulk_apply([tmp / "a.toml"], [{**ops[0], "op": "add"}], workers=1)
+    assert c.written and not c.error, c
+    assert (tmp / "a.toml").read_text() == "name = \"a\"\n\n[db]\npool = 20\n"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-k", dest="pattern", default="", help="only run checks whose name contains this")
+    args = ap.parse_args()
+
+    failed = 0
+    for fn in CHECKS:
+        if args.pattern not in fn.__name__:
+            continue
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                fn(Path(tmp))
+            except Skip as why:
+                print(f"skip {fn.__name__}: {why}")
+                continue
+            except Exception:  # noqa: BLE001
+                failed += 1
+                print(f"FAIL {fn.__name__}")
+                traceback.print_exc()
+            else:
+                print(f"ok   {fn.__name__}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Differential check: the incremental dumper must match ``tomli_w.dumps`` exactly.
+
+    python benchmarks/check_serializer.py [--trials 400] [--seed 1]
+
+Random documents (awkward keys, nested arrays, arrays of tables) get random
+add / replace / remove ops; after each one the spliced output of
+``IncrementalDumper`` is compared with a full ``tomli_w.dumps``. The
+generated benchmark shapes are checked the same way, and so is the
+widget's ``toml_text`` while the same ops arrive from Python and the
+frontend, interleaved with undo and redo.
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import random
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Tuple
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+sys.path.insert(0, str(HERE))
+
+import tomli_w  # noqa: E402
+
+from generate import SHAPES, edit_paths, generate  # noqa: E402
+from marimo_toml_editor import TomlConfigEditor  # noqa: E402
+from marimo_toml_editor._patch import apply_ops  # noqa: E402
+from marimo_toml_editor._serialize import IncrementalDumper  # noqa: E402
+
+# Keys that need quoting, are empty, or look like dotted paths
+KEYS = ["a", "b", "c-d", "x y", "", "ü", "port", "k.dot"]
+
+
+class Fuzzer:
+    def __init__(self, seed: int) -> None:
+        self.rng = random.Random(seed)
+
+    def scalar(self) -> Any:
+        rng = self.rng
+        return rng.choice([
+            rng.randint(-5, 10**6), rng.random(), rng.random() < 0.5,
+            "s" * rng.randint(0, 120), 'q"\n\t', rng.randint(0, 3),
+        ])
+
+    def value(self, depth: int) -> Any:
+        r = self.rng.random()
+        if depth > 3 or r < 0.5:
+            return self.scalar()
+        if r < 0.7:
+            return [self.value(depth + 1) for _ in range(self.rng.randint(0, 4))]
+        if r < 0.85:
+            return [self.table(depth + 1) for _ in range(self.rng.randint(1, 3))]
+        return self.table(depth + 1)
+
+    def table(self, depth: int) -> Dict[str, Any]:
+        rng = self.rng
+        return {rng.choice(KEYS) + str(rng.randint(0, 3)): self.value(depth) for _ in range(rng.randint(0, 5))}
+
+    def op(self, doc: Dict[str, Any], step: int) -> Dict[str, Any]:
+        rng = self.rng
+        paths = [p for p in _paths(doc) if p]
+        if not paths or rng.random() < 0.2:
+            return {"op": "add", "path": [rng.choice(KEYS) + "n"], "value": self.value(1)}
+        p = list(rng.choice(paths))
+        kind = rng.choice(["replace", "remove", "add"])
+        if kind == "add" and not isinstance(p[-1], int):
+            p = [*p[:-1], f"new{step}"]
+        return {"op": kind, "path": p, "value": self.value(2)}
+
+
+def _paths(o: Any, pre: Tuple[Any, ...] = ()) -> Iterator[Tuple[Any, ...]]:
+    yield pre
+    if isinstance(o, dict):
+        for k, v in o.items():
+            yield from _paths(v, (*pre, k))
+    elif isinstance(o, list):
+        for i, v in enumerate(o):
+            yield from _paths(v, (*pre, i))
+
+
+def check(doc: Dict[str, Any], next_op: Callable[[Dict[str, Any], int], Dict[str, Any]], steps: int) -> int:
+    """Apply ``steps`` ops from ``next_op(doc, step)``, comparing outputs after each.
+
+    Returns the number of comparisons.
+    """
+    dumper = IncrementalDumper(tomli_w.dumps)
+    assert dumper.dumps(doc) == tomli_w.dumps(doc)
+    for step in range(steps):
+        op = next_op(doc, step)
+        apply_ops(doc, [op])
+        dumper.invalidate_ops([op])
+        got, expected = dumper.dumps(doc), tomli_w.dumps(doc)
+        if got != expected:
+            raise AssertionError(f"Mismatch after {op!r}:\n--- incremental\n{got}\n--- tomli_w\n{expected}")
+    return steps + 1
+
+
+def check_widget(fz: Fuzzer, steps: int) -> int:
+    """``check`` through the editor: every route an edit takes must invalidate toml_text."""
+    w = TomlConfigEditor(text_sync="eager")
+    w.data = fz.table(0)
+    rng = fz.rng
+    for step in range(steps):
+        r = rng.random()
+        if r < 0.15:
+            w.undo()
+        elif r < 0.25:
+            w.redo()
+        else:
+            op = fz.op(copy.deepcopy(w.data), step)
+            try:
+                if r < 0.6:
+                    w.apply_ops([op])
+                else:
+                    payload = {"epoch": w._epoch, "base": w.data_version, "ops": [op], "origin": "edit", "entry": None}
+                    w._on_request({"type": "request", "batch": [{"id": "x", "command": "patch", "payload": payload}]}, [])
+            except (KeyError, IndexError, TypeError, ValueError):
+                continue  # an op the document can't take, e.g. into a scalar
+        expected = tomli_w.dumps(w.data)
+        if w.toml_text != expected:
+            raise AssertionError(f"toml_text is stale after step {step}:\n--- widget\n{w.toml_text}\n--- tomli_w\n{expected}")
+    return steps
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--trials", type=int, default=400)
+    ap.add_argument("--steps", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    fz = Fuzzer(args.seed)
+    n = 0
+    for _ in range(args.trials):
+        n += check(fz.table(0), fz.op, args.steps)
+    for shape in SHAPES:
+        doc = generate(shape, 20, args.seed)
+        edits = [{"op": "replace", "path": p, "value": fz.scalar()} for p in edit_paths(doc, 30, args.seed)]
+        n += check(doc, lambda _doc, i: edits[i], len(edits))
+    for _ in range(args.trials // 4):
+        n += check_widget(fz, args.steps)
+    print(f"ok: {n} comparisons")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
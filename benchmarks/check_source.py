@@ -0,0 +1,160 @@
+"""Differential check: format-preserving saves must hold exactly the edited data.
+
+    python benchmarks/check_source.py [--trials 300] [--seed 1]
+
+Random documents are written by tomli-w with comments sprinkled in, then
+get random ops from ``check_serializer``'s fuzzer. After each op the text
+``SourceText`` splices together must parse back to the document (or the
+splice must be refused, which a save turns into a full tomli-w render).
+Every other document is written with CRLF line endings, which the spliced
+text must keep. On the generated benchmark shapes, replacing one scalar
+must change exactly one line, and editing one array element must keep the
+comments around it. Prints how often splicing fell back.
+"""
+
+from __future__ import annotations
+
+import argparse
+import difflib
+import random
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+sys.path.insert(0, str(HERE))
+
+import tomli_w  # noqa: E402
+
+from check_serializer import Fuzzer  # noqa: E402
+from generate import SHAPES, edit_paths, generate  # noqa: E402
+from marimo_toml_editor._patch import apply_ops  # noqa: E402
+from marimo_toml_editor._source import SourceText, SpliceError  # noqa: E402
+
+try:
+    import tomllib  # py3.11+
+except ImportError:  # pragma: no cover
+    import tomli as tomllib  # type: ignore[no-redef]
+
+
+def commented(text: str, rng: random.Random) -> str:
+    """``text`` with comment lines, and comments after some values and array elements."""
+    out = []
+    for line in text.splitlines(keepends=True):
+        if rng.random() < 0.15:
+            out.append("# note\n")
+        if rng.random() < 0.15 and " = " in line and not line.rstrip().endswith(("[", "{", '"""')):
+            line = line.rstrip("\n") + "  # why\n"
+        elif rng.random() < 0.3 and line.rstrip().endswith(","):
+            line = line.rstrip("\n") + "  # item\n"
+        out.append(line)
+    return "".join(out)
+
+
+def check(
+    doc: Dict[str, Any],
+    next_op: Callable[[Dict[str, Any], int], Dict[str, Any]],
+    steps: int,
+    rng: random.Random,
+    crlf: bool = False,
+) -> Tuple[int, int]:
+    """Apply ``steps`` ops, checking the spliced text after each; returns (checks, fallbacks)."""
+    text = commented(tomli_w.dumps(doc), rng)
+    if crlf:
+        text = text.replace("\n", "\r\n")
+        crlf = "\r\n" in text  # an empty document has no line endings to keep
+    doc = tomllib.loads(text)
+    source = SourceText(text)
+    fallbacks = 0
+    for step in range(steps):
+        op = next_op(doc, step)
+        apply_ops(doc, [op])
+        source.touch([op])
+        try:
+            got = source.render(doc)
+        except SpliceError:
+            fallbacks += 1
+            source = SourceText(source.with_newlines(tomli_w.dumps(doc)), newline=source.newline)
+            continue
+        if tomllib.loads(got) != doc:
+            raise AssertionError(f"Mismatch after {op!r}:\n--- before\n{text}\n--- spliced\n{got}")
+        if crlf and "\n" in got.replace("\r\n", ""):
+            raise AssertionError(f"Line endings changed after {op!r}:\n{got!r}")
+        text = got
+    return steps, fallbacks
+
+
+def check_one_line(shape: str, seed: int, newline: str = "\n") -> int:
+    """Replacing a scalar in a generated document rewrites only its line."""
+    doc = generate(shape, 20, seed)
+    n = 0
+    for path in edit_paths(doc, 30, seed):
+        text = tomli_w.dumps(doc).replace("\n", newline)
+        source = SourceText(text)
+        # Outside generate()'s range and new each time: a path can come up twice
+        op = {"op": "replace", "path": path, "value": -(10**7) - n}
+        apply_ops(doc, [op])
+        source.touch([op])
+        got = source.render(doc)
+        changed = [d for d in difflib.ndiff(text.splitlines(True), got.splitlines(True)) if d[:1] in "+-"]
+        if len(changed) != 2 or tomllib.loads(got) != doc:
+            raise AssertionError(f"{shape}: {op!r} changed {len(changed)} lines:\n" + "\n".join(changed))
+        n += 1
+    return n
+
+
+# (text, op, expected text): array elements are spliced one at a time
+ARRAY_EDITS = [
+    ("a = [\n  1, # one\n  2,\n]\n", {"op": "replace", "path": ["a", 0], "value": 9},
+     "a = [\n  9, # one\n  2,\n]\n"),
+    ("a = [\n  1, # one\n  2, # two\n]\n", {"op": "add", "path": ["a", 1], "value": 9},
+     "a = [\n  1, # one\n  9,\n  2, # two\n]\n"),
+    ("a = [\n  1, # one\n  2 # two\n]\n", {"op": "add", "path": ["a", 2], "value": 9},
+     "a = [\n  1, # one\n  2, # two\n  9,\n]\n"),
+    ("a = [\n  1, # one\n  2, # two\n]\n", {"op": "remove", "path": ["a", 0]},
+     "a = [\n  2, # two\n]\n"),
+    ("a = [1, 2, 3]  # why\n", {"op": "remove", "path": ["a", 1]}, "a = [1, 3]  # why\n"),
+    ("a = [1]\n", {"op": "add", "path": ["a", 0], "value": "x"}, 'a = ["x", 1]\n'),
+    ("[t]\nb = [\n  { x = 1 }, # one\n  [1, 2], # two\n]\n", {"op": "replace", "path": ["t", "b", 1, 0], "value": 5},
+     "[t]\nb = [\n  { x = 1 }, # one\n  [5, 2], # two\n]\n"),
+]
+
+
+def check_array_edits() -> int:
+    """Editing one element of an array keeps the comments between its elements."""
+    for text, op, want in ARRAY_EDITS:
+        doc = tomllib.loads(text)
+        source = SourceText(text)
+        apply_ops(doc, [op])
+        source.touch([op])
+        got = source.render(doc)
+        if got != want:
+            raise AssertionError(f"{op!r} on\n{text}gave\n{got}instead of\n{want}")
+    return len(ARRAY_EDITS)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--trials", type=int, default=300)
+    ap.add_argument("--steps", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    fz = Fuzzer(args.seed)
+    rng = random.Random(args.seed)
+    n = fallbacks = 0
+    for trial in range(args.trials):
+        checked, fell_back = check(fz.table(0), fz.op, args.steps, rng, crlf=trial % 2 == 1)
+        n, fallbacks = n + checked, fallbacks + fell_back
+    lines = sum(check_one_line(shape, args.seed, nl) for shape in SHAPES for nl in ("\n", "\r\n"))
+    items = check_array_edits()
+    print(
+        f"ok: {n} splices ({fallbacks} fell back to tomli-w, {fallbacks / max(n, 1):.1%}), "
+        f"{lines} one-line edits, {items} array element edits"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
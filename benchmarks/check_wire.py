@@ -0,0 +1,158 @@
+"""Round-trip check of the binary wire encoding (``wire="binary"``).
+
+    python benchmarks/check_wire.py [--trials 300] [--seed 1]
+
+Random documents (numeric lists long enough for typed arrays, large and
+negative ints, non-ASCII keys, dates) and the generated benchmark shapes are
+encoded with ``_wire.encode``, deflated and not, and must decode back to the
+same value. When ``node`` is on the PATH every frame is also decoded by
+widget.js's ``wireValue``, re-encoded with its ``encodeWire`` and decoded
+again in Python. Prints sizes against JSON for the benchmark shapes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import datetime
+import json
+import random
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+sys.path.insert(0, str(HERE))
+
+from generate import SHAPES, generate  # noqa: E402
+from marimo_toml_editor._wire import TYPED_MIN, decode, encode  # noqa: E402
+
+WIDGET = HERE.parent / "src" / "marimo_toml_editor" / "static" / "widget.js"
+
+# Decodes frames from stdin with widget.js and sends them back re-encoded
+NODE = """
+const { encodeWire, wireValue } = await import(process.argv[1]);
+let input = "";
+for await (const chunk of process.stdin) input += chunk;
+const out = JSON.parse(input).map(f => {
+    const frame = { ...f, buffer: new DataView(Uint8Array.from(Buffer.from(f.buffer, "base64")).buffer) };
+    const back = encodeWire(wireValue(frame));
+    const bytes = new Uint8Array(back.buffer.buffer, back.buffer.byteOffset, back.buffer.byteLength);
+    return { ...back, buffer: Buffer.from(bytes).toString("base64") };
+});
+process.stdout.write(JSON.stringify(out));
+"""
+
+
+class Values:
+    def __init__(self, seed: int) -> None:
+        self.rng = random.Random(seed)
+
+    def scalar(self) -> Any:
+        rng = self.rng
+        return rng.choice([
+            rng.randint(-40, 200), rng.randint(-(2**40), 2**40), rng.choice([2**31, -(2**31) - 1, 2**53 - 1]),
+            rng.uniform(-1e6, 1e6), rng.random() < 0.5, "ü€" * rng.randint(0, 3), "s" * rng.randint(0, 300),
+            datetime.date(2026, 1, rng.randint(1, 28)), datetime.datetime(2026, 5, 4, 3, 2, 1),
+        ])
+
+    def numbers(self) -> List[Any]:
+        rng = self.rng
+        n = rng.randint(TYPED_MIN - 2, 40)
+        kind = rng.choice(["int", "float", "mixed", "wide"])
+        if kind == "int":
+            return [rng.randint(-(2**31), 2**31 - 1) for _ in range(n)]
+        if kind == "float":
+            # Integral floats come back as ints from JS, as with JSON
+            return [rng.uniform(-1e9, 1e9) + 0.5 for _ in range(n)]
+        if kind == "wide":
+            return [rng.randint(0, 2**40) for _ in range(n)]
+        return [rng.choice([rng.randint(0, 9), rng.random() + 0.5]) for _ in range(n)]
+
+    def value(self, depth: int) -> Any:
+        r = self.rng.random()
+        if depth > 3 or r < 0.4:
+            return self.scalar()
+        if r < 0.6:
+            return self.numbers()
+        if r < 0.75:
+            return [self.value(depth + 1) for _ in range(self.rng.randint(0, 10))]
+        return self.table(depth + 1)
+
+    def table(self, depth: int) -> Dict[str, Any]:
+        rng = self.rng
+        keys = ["a", "ü", "__proto__", "x y", ""]
+        return {rng.choice(keys) + str(rng.randint(0, 40)): self.value(depth) for _ in range(rng.randint(0, 8))}
+
+
+def plain(value: Any) -> Any:
+    """``value`` as it looks once decoded: dates and times become ISO strings."""
+    if isinstance(value, dict):
+        return {k: plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [plain(v) for v in value]
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def through_node(frames: List[Dict[str, Any]]) -> List[Any]:
+    wire = [{**f, "buffer": base64.b64encode(f["buffer"]).decode()} for f in frames]
+    out = subprocess.run(
+        ["node", "--input-type=module", "-e", NODE, WIDGET.as_uri()],
+        input=json.dumps(wire), capture_output=True, text=True, check=True,
+    ).stdout
+    return [decode({**f, "buffer": base64.b64decode(f["buffer"])}) for f in json.loads(out)]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--trials", type=int, default=300)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--size", type=int, default=500, help="size of the benchmark shapes")
+    args = ap.parse_args()
+
+    gen = Values(args.seed)
+    docs = [gen.table(0) for _ in range(args.trials)]
+    docs += [generate(shape, args.size, args.seed) for shape in SHAPES]
+    frames = []
+    for doc in docs:
+        for compress in (0, 1):
+            frame = encode(doc, compress)
+            if decode(frame) != plain(doc):
+                raise AssertionError(f"Round trip failed ({frame['$wire']}): {doc!r}")
+            frames.append(frame)
+
+    node = shutil.which("node")
+    if node:
+        expected = [plain(doc) for doc in docs for _ in (0, 1)]
+        for i, (got, want) in enumerate(zip(through_node(frames), expected)):
+            if got != want:
+                raise AssertionError(f"widget.js round trip failed for frame {i}: {want!r}")
+
+    for shape in SHAPES:
+        doc = generate(shape, args.size, args.seed)
+        t = time.perf_counter()
+        text = json.dumps(doc, default=str)
+        t_json = time.perf_counter() - t
+        t = time.perf_counter()
+        raw = encode(doc)
+        t_raw = time.perf_counter() - t
+        t = time.perf_counter()
+        small = encode(doc, 1)
+        t_small = time.perf_counter() - t
+        print(
+            f"{shape:>8}: json {len(text) / 1024:7.1f} KB {t_json * 1e3:6.1f} ms   "
+            f"msgpack {len(raw['buffer']) / 1024:7.1f} KB {t_raw * 1e3:6.1f} ms   "
+            f"deflated {len(small['buffer']) / 1024:7.1f} KB {t_small * 1e3:6.1f} ms"
+        )
+    print(f"ok: {len(frames)} frames round-tripped" + (" (and through widget.js)" if node else " (node not found)"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""Deterministic synthetic TOML documents for the benchmarks.
+
+The same ``(shape, size, seed)`` always yields the same document, so timings
+from different versions are comparable::
+
+    python benchmarks/generate.py wide 2000 -o wide.toml
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+from typing import Any, Callable, Dict, List
+
+SHAPES = ("deep", "wide", "arrays", "aot", "mixed")
+
+_WORDS = (
+    "alpha beta gamma delta host port timeout retries pool size level path name "
+    "enabled mode region cache limit batch worker queue color format user token"
+).split()
+
+
+def _scalar(rng: random.Random) -> Any:
+    r = rng.random()
+    if r < 0.35:
+        return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(1, 6)))
+    if r < 0.6:
+        return rng.randint(-1000, 10**6)
+    if r < 0.75:
+        return round(rng.uniform(-100, 100), 4)
+    if r < 0.9:
+        return rng.random() < 0.5
+    return f"#{rng.randrange(0x1000000):06x}"
+
+
+def _key(rng: random.Random, i: int) -> str:
+    return f"{rng.choice(_WORDS)}_{i}"
+
+
+def _table(rng: random.Random, width: int) -> Dict[str, Any]:
+    return {_key(rng, i): _scalar(rng) for i in range(width)}
+
+
+def deep(rng: random.Random, size: int) -> Dict[str, Any]:
+    """``size`` top-level tables, each nested a few levels deep."""
+    def nest(depth: int) -> Dict[str, Any]:
+        t = _table(rng, 4)
+        if depth:
+            t.update({f"level{depth}_{i}": nest(depth - 1) for i in range(2)})
+        return t
+
+    return {"title": "deep", **{f"section_{i}": nest(4) for i in range(size)}}
+
+
+def wide(rng: random.Random, size: int) -> Dict[str, Any]:
+    """A few tables with ``size`` keys each."""
+    return {"title": "wide", **{f"table_{i}": _table(rng, size) for i in range(8)}}
+
+
+def arrays(rng: random.Random, size: int) -> Dict[str, Any]:
+    """Arrays of ``size`` scalars."""
+    return {
+        "title": "arrays",
+        "numbers": {f"series_{i}": [rng.randint(0, 10**6) for _ in range(size)] for i in range(4)},
+        "strings": {f"names_{i}": [_key(rng, j) for j in range(size)] for i in range(4)},
+    }
+
+
+def aot(rng: random.Random, size: int) -> Dict[str, Any]:
+    """Arrays of ``size`` tables ([[servers]] …)."""
+    return {
+        "title": "aot",
+        "servers": [_table(rng, 6) for _ in range(size)],
+        "jobs": {"queue": [_table(rng, 4) for _ in range(size // 2)]},
+    }
+
+
+def mixed(rng: random.Random, size: int) -> Dict[str, Any]:
+    """A bit of everything, scaled by ``size``."""
+    doc: Dict[str, Any] = {"title": "mixed", "version": 3}
+    for i in range(size):
+        t = _table(rng, 8)
+        t["tags"] = [rng.choice(_WORDS) for _ in range(rng.randint(0, 12))]
+        t["limits"] = _table(rng, 3)
+        if i % 5 == 0:
+            t["replicas"] = [_table(rng, 3) for _ in range(3)]
+        doc[f"service_{i}"] = t
+    return doc
+
+
+_GENERATORS: Dict[str, Callable[[random.Random, int], Dict[str, Any]]] = {
+    "deep": deep,
+    "wide": wide,
+    "arrays": arrays,
+    "aot": aot,
+    "mixed": mixed,
+}
+
+
+def generate(shape: str, size: int, seed: int = 0) -> Dict[str, Any]:
+    """A document of the given shape; ``size`` scales it roughly linearly."""
+    return _GENERATORS[shape](random.Random(f"{shape}:{size}:{seed}"), size)
+
+
+def edit_paths(doc: Dict[str, Any], n: int, seed: int = 0) -> List[List[Any]]:
+    """``n`` paths to scalar values in ``doc``, for timing single edits."""
+    found: List[List[Any]] = []
+
+    def walk(v: Any, path: List[Any]) -> None:
+        if isinstance(v, dict):
+            for k, x in v.items():
+                walk(x, [*path, k])
+        elif isinstance(v, list):
+            for i, x in enumerate(v[:4]):
+                walk(x, [*path, i])
+        elif path:
+            found.append(path)
+
+    walk(doc, [])
+    rng = random.Random(seed)
+    return [rng.choice(found) for _ in range(n)] if found else []
+
+
+def main() -> None:
+    import tomli_w
+
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("shape", choices=SHAPES)
+    ap.add_argument("size", type=int)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("-o", "--out", help="output file (default: stdout)")
+    args = ap.parse_args()
+    text = tomli_w.dumps(generate(args.shape, args.size, args.seed))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text, end="")
+
+
+if __name__ == "__main__":
+    main()
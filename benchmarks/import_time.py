@@ -0,0 +1,123 @@
+"""Import-time budget: how long importing the package takes, and what it drags in.
+
+    python benchmarks/import_time.py                 # check every scenario against its budget
+    python benchmarks/import_time.py --repeat 15 -o imports.json
+    python benchmarks/import_time.py --importtime widget
+
+Each scenario runs in a fresh interpreter. Its ``setup`` (untimed) loads
+what a kernel would already have, such as anywidget for the widget; then
+the statement is timed and the modules it newly imported are listed. A
+scenario fails if its median exceeds ``budget_ms`` (scaled by
+``--budget-scale`` on slow machines) or if it imported a module it must
+leave for later: tomli-w until the first save, ctypes until a file is
+watched, the process pool until ``bulk_apply``. Exits with status 1 on
+any failure.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+
+class Scenario(NamedTuple):
+    setup: str
+    stmt: str
+    budget_ms: float
+    deferred: Tuple[str, ...]  # must not be newly imported by stmt
+
+
+_LATER = ("tomli_w", "ctypes", "concurrent.futures.process", "subprocess")
+
+SCENARIOS: Dict[str, Scenario] = {
+    # The bare package: nothing but its own __init__
+    "package": Scenario("", "import marimo_toml_editor", 10, ("anywidget", "ipywidgets", "tomllib") + _LATER),
+    # Headless API: no widget stack
+    "headless": Scenario("", "from marimo_toml_editor import TomlDocument, bulk_apply", 80, ("anywidget",) + _LATER),
+    # The widget's own cost on top of anywidget
+    "widget": Scenario("import anywidget", "from marimo_toml_editor import TomlConfigEditor", 80, _LATER),
+    # An editor that hasn't saved or rendered text yet
+    "instance": Scenario(
+        "import anywidget; from marimo_toml_editor import TomlConfigEditor",
+        "TomlConfigEditor()",
+        20,
+        _LATER,
+    ),
+}
+
+_PROBE = """
+import json, sys, time
+sys.path.insert(0, {src!r})
+{setup}
+before = set(sys.modules)
+t0 = time.perf_counter()
+{stmt}
+ms = (time.perf_counter() - t0) * 1000
+print(json.dumps({{"ms": ms, "modules": sorted(set(sys.modules) - before)}}))
+"""
+
+
+def probe(s: Scenario) -> Dict[str, Any]:
+    code = _PROBE.format(src=str(SRC), setup=s.setup, stmt=s.stmt)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(name: str, s: Scenario, repeat: int, scale: float) -> Dict[str, Any]:
+    runs = [probe(s) for _ in range(repeat)]
+    times = [r["ms"] for r in runs]
+    modules = runs[-1]["modules"]
+    own = [m for m in modules if m.split(".")[0] == "marimo_toml_editor"]
+    early = [m for m in s.deferred if m in modules]
+    median = statistics.median(times)
+    return {
+        "scenario": name,
+        "stmt": s.stmt,
+        "min_ms": round(min(times), 3),
+        "median_ms": round(median, 3),
+        "budget_ms": s.budget_ms * scale,
+        "modules": len(modules),
+        "own_modules": own,
+        "imported_early": early,
+        "ok": median <= s.budget_ms * scale and not early,
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("scenario", nargs="*", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    ap.add_argument("--repeat", type=int, default=7)
+    ap.add_argument("--budget-scale", type=float, default=1.0, help="multiply every budget (slow CI machines)")
+    ap.add_argument("-o", "--out", help="write results to this JSON file")
+    ap.add_argument("--importtime", metavar="SCENARIO", help="print python -X importtime output for one scenario")
+    args = ap.parse_args()
+    for name in [*args.scenario, *([args.importtime] if args.importtime else [])]:
+        if name not in SCENARIOS:
+            ap.error(f"unknown scenario: {name}")
+
+    if args.importtime:
+        s = SCENARIOS[args.importtime]
+        code = f"import sys\nsys.path.insert(0, {str(SRC)!r})\n{s.setup}\n{s.stmt}"
+        return subprocess.run([sys.executable, "-X", "importtime", "-c", code]).returncode
+
+    results: List[Dict[str, Any]] = []
+    for name in args.scenario or SCENARIOS:
+        r = run(name, SCENARIOS[name], args.repeat, args.budget_scale)
+        flag = "" if r["ok"] else "  <-- over budget" if not r["imported_early"] else f"  <-- imported {', '.join(r['imported_early'])}"
+        print(f"{name:<10} {r['median_ms']:>8.2f} ms  (budget {r['budget_ms']:>5.0f})  {r['modules']:>4} modules{flag}")
+        results.append(r)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+// Time widget.js rendering, edits and serialization on synthetic documents.
+//
+//   node benchmarks/js/bench.mjs                        # medium preset
+//   node benchmarks/js/bench.mjs --preset large -o after.json
+//   node benchmarks/js/bench.mjs -o after.json --compare before.json
+//
+// Runs under jsdom when it can be imported, otherwise on the small DOM in
+// dom-shim.mjs (--dom picks one). Needs nothing but Node, so it runs offline.
+// Python's side is played by model.mjs, which acknowledges patches at once:
+// the timings are the frontend's own work.
+
+import fs from "node:fs";
+import os from "node:os";
+import path from "node:path";
+import { fileURLToPath } from "node:url";
+import v8 from "node:v8";
+import vm from "node:vm";
+import zlib from "node:zlib";
+import { execFileSync } from "node:child_process";
+
+import { generate, SHAPES } from "./generate.mjs";
+import { initialState, makeModel, servePython } from "./model.mjs";
+
+const HERE = path.dirname(fileURLToPath(import.meta.url));
+const WIDGET = path.resolve(HERE, "../../src/marimo_toml_editor/static/widget.js");
+
+const PRESETS = {
+    small: [["deep", 5], ["wide", 50], ["arrays", 200], ["aot", 50], ["mixed", 20]],
+    medium: [["deep", 60], ["wide", 1500], ["arrays", 5000], ["aot", 1000], ["mixed", 300]],
+    large: [["deep", 600], ["wide", 15000], ["arrays", 50000], ["aot", 10000], ["mixed", 3000]],
+};
+
+function parseArgs(argv) {
+    const args = { preset: "medium", shapes: [], repeat: 7, edits: 50, out: "", compare: "", threshold: 1.25, dom: "auto", wire: "json" };
+    for (let i = 0; i < argv.length; i++) {
+        const a = argv[i];
+        const next = () => argv[++i];
+        if (a === "--preset") args.preset = next();
+        else if (a === "--shape") args.shapes.push(next());
+        else if (a === "--repeat") args.repeat = Number(next());
+        else if (a === "--edits") args.edits = Number(next());
+        else if (a === "-o" || a === "--out") args.out = next();
+        else if (a === "--compare") args.compare = next();
+        else if (a === "--threshold") args.threshold = Number(next());
+        else if (a === "--dom") args.dom = next();
+        else if (a === "--wire") args.wire = next();
+        else if (a === "-h" || a === "--help") {
+            console.log("usage: bench.mjs [--preset small|medium|large] [--shape S]... [--repeat N] [--edits N]\n" +
+                "                 [-o OUT.json] [--compare BASELINE.json] [--threshold R] [--dom auto|jsdom|shim]\n" +
+                "                 [--wire json|binary]");
+            process.exit(0);
+        } else throw new Error(`Unknown argument: ${a}`);
+    }
+    if (!PRESETS[args.preset]) throw new Error(`Unknown preset: ${args.preset}`);
+    if (!["json", "binary"].includes(args.wire)) throw new Error(`Unknown wire: ${args.wire}`);
+    return args;
+}
+
+async function installDom(kind) {
+    if (kind !== "shim") {
+        try {
+            const { JSDOM } = await import("jsdom");
+            const { window } = new JSDOM("<!doctype html><html><body></body></html>", { pretendToBeVisual: true });
+            for (const k of ["window", "document", "Event", "KeyboardEvent", "Element", "HTMLElement", "requestAnimationFrame", "cancelAnimationFrame"]) {
+                globalThis[k] = k === "window" ? window : window[k];
+            }
+            if (!globalThis.navigator) globalThis.navigator = window.navigator;
+            return "jsdom";
+        } catch (err) {
+            if (kind === "jsdom") throw err;
+        }
+    }
+    (await import("./dom-shim.mjs")).installDom();
+    return "shim";
+}
+
+// Heap numbers are only meaningful after a full collection
+v8.setFlagsFromString("--expose-gc");
+const gc = globalThis.gc || vm.runInNewContext("gc");
+function heapUsed() {
+    gc();
+    gc();
+    return process.memoryUsage().heapUsed;
+}
+
+function summarise(times) {
+    const s = [...times].sort((a, b) => a - b);
+    const q = p => s[Math.min(s.length - 1, Math.floor(p * s.length))];
+    const round = x => Math.round(x * 1e4) / 1e4;
+    return {
+        n: s.length,
+        min_ms: round(s[0]),
+        median_ms: round(q(0.5)),
+        p95_ms: round(q(0.95)),
+        mean_ms: round(s.reduce((a, b) => a + b, 0) / s.length),
+    };
+}
+
+function time(fn) {
+    const t0 = performance.now();
+    fn();
+    return performance.now() - t0;
+}
+
+const all = (root, sel) => [...root.querySelectorAll(sel)];
+const tabButton = (el, name) => all(el, ".tab").find(t => t.textContent === name || t.textContent.startsWith(name + " · "));
+
+/** The top-level table with the most keys: the heaviest tab to open. */
+function biggestTable(data) {
+    let best = null;
+    for (const [k, v] of Object.entries(data)) {
+        if (v && typeof v === "object" && !Array.isArray(v) && (!best || Object.keys(v).length > Object.keys(data[best]).length)) best = k;
+    }
+    return best;
+}
+
+/** Scalar editors currently in the panel, with the path they edit. */
+function scalarInputs(el) {
+    return all(el, "[data-path]")
+        .map(row => ({ row, input: all(row, "input").find(i => /\b(text|num)\b/.test(i.className)) }))
+        .filter(x => x.input && x.row.dataset.path);
+}
+
+/** A deflated frame as TomlConfigEditor sends large values with wire="binary". */
+function deflatedFrame(codec, value) {
+    const { size, buffer } = codec.encodeWire(value);
+    const body = zlib.deflateRawSync(new Uint8Array(buffer.buffer, buffer.byteOffset, buffer.byteLength));
+    return { $wire: "msgpack+deflate", size, buffer: new DataView(body.buffer, body.byteOffset, body.byteLength) };
+}
+
+async function benchCase(widget, codec, shape, size, args) {
+    const data = generate(shape, size);
+    const bytes = Buffer.byteLength(JSON.stringify(data));
+    const results = {};
+    const binary = args.wire === "binary";
+    // What Python sends: frames with wire="binary", plain values otherwise
+    const send = binary ? v => deflatedFrame(codec, v) : v => v;
+    if (binary) {
+        const frames = [];
+        for (let i = 0; i < args.repeat; i++) frames.push(deflatedFrame(codec, data));
+        results["wire.decode_data"] = summarise(frames.map(f => time(() => codec.wireValue(f))));
+    }
+    const heapBefore = heapUsed();
+
+    const model = makeModel(initialState(send(data), {
+        wire: args.wire, data_patch: send({ epoch: 1, version: 1, reset: true, ops: [] }),
+    }), binary ? codec.wireValue : undefined);
+    const el = document.createElement("div");
+    document.body.appendChild(el);
+    results["render.initial"] = summarise([time(() => widget.render({ model, el }))]);
+    const heapRendered = heapUsed();
+
+    // Rendering a table tab: first visit, then switching back to it (cached rows)
+    const table = biggestTable(data);
+    if (table) {
+        results["render.tab_first"] = summarise([time(() => tabButton(el, table).click())]);
+        const back = [];
+        for (let i = 0; i < args.repeat; i++) {
+            tabButton(el, "root").click();
+            back.push(time(() => tabButton(el, table).click()));
+        }
+        results["render.tab_switch"] = summarise(back);
+    }
+
+    // A status change re-runs renderAll with nothing dirty
+    const idle = [];
+    for (let i = 0; i < args.repeat; i++) idle.push(time(() => model.pythonSet({ status: `Ready ${i}.` })));
+    results["render.idle"] = summarise(idle);
+
+    // Edits through the UI: commitChange, local history, the patch command and its ack
+    const heapBeforeEdits = heapUsed();
+    const edits = [];
+    for (let i = 0; i < args.edits; i++) {
+        const inputs = scalarInputs(el);
+        if (!inputs.length) break;
+        const { input } = inputs[i % inputs.length];
+        input.value = input.type === "number" ? String(Number(input.value) + 1) : `${input.value}!`;
+        edits.push(time(() => {
+            input.dispatchEvent(new Event("change", { bubbles: true }));
+            servePython(model);
+        }));
+    }
+    if (edits.length) {
+        results["edit.commit"] = summarise(edits);
+        const grown = heapUsed() - heapBeforeEdits;
+        results["edit.heap_per_edit"] = { n: edits.length, heap_bytes: Math.round(grown / edits.length) };
+    }
+
+    // Undo replays inverse ops
+    const undo = all(el, "button").find(b => b.textContent.includes("Undo"));
+    if (undo && edits.length) {
+        const undos = [];
+        for (let i = 0; i < Math.min(args.repeat, edits.length); i++) undos.push(time(() => { undo.click(); servePython(model); }));
+        results["edit.undo"] = summarise(undos);
+    }
+
+    // A patch from Python (another view's edit, a file reload)
+    const inputs = scalarInputs(el);
+    if (inputs.length) {
+        const applied = [];
+        for (let i = 0; i < args.repeat; i++) {
+            const p = codec.wireValue(model.get("data_patch"));
+            const target = inputs[i % inputs.length].row.dataset.path.split(".");
+            const version = model.get("data_version") + 1;
+            const patch = { epoch: p.epoch, version, origin: "external", entry: null, ops: [{ op: "replace", path: target, value: `external ${i}` }] };
+            applied.push(time(() => model.pythonSet({ data_version: version, data_patch: send(patch) })));
+        }
+        results["patch.external"] = summarise(applied);
+    }
+
+    // Raw tab with text_sync "off": the JS serializer renders the whole document
+    const raw = [];
+    for (let i = 0; i < args.repeat; i++) {
+        tabButton(el, "root").click();
+        raw.push(time(() => tabButton(el, "{ } Raw").click()));
+    }
+    results["serialize.raw_tab"] = summarise(raw);
+
+    results["heap.rendered"] = { n: 1, heap_bytes: heapRendered - heapBefore };
+    el.remove();
+    return Object.entries(results).map(([op, r]) => ({ case: `${shape}-${size}`, shape, size, bytes, op, ...r }));
+}
+
+function gitRevision() {
+    try {
+        return execFileSync("git", ["rev-parse", "--short", "HEAD"], { cwd: HERE, encoding: "utf8", stdio: ["ignore", "pipe", "ignore"] }).trim();
+    } catch {
+        return "";
+    }
+}
+
+function compare(results, baselinePath, threshold) {
+    const base = new Map(JSON.parse(fs.readFileSync(baselinePath, "utf8")).results.map(r => [`${r.case}|${r.op}`, r]));
+    let ok = true;
+    console.log(`\n${"case".padEnd(18)} ${"op".padEnd(26)} ${"before".padStart(10)} ${"after".padStart(10)} ${"ratio".padStart(7)}`);
+    for (const r of results) {
+        const b = base.get(`${r.case}|${r.op}`);
+        if (!b || b.median_ms === undefined) continue;
+        const ratio = b.median_ms ? r.median_ms / b.median_ms : Infinity;
+        const flag = ratio > threshold ? "  <-- slower" : "";
+        if (flag) ok = false;
+        console.log(`${r.case.padEnd(18)} ${r.op.padEnd(26)} ${b.median_ms.toFixed(3).padStart(10)} ${r.median_ms.toFixed(3).padStart(10)} ${ratio.toFixed(2).padStart(7)}${flag}`);
+    }
+    return ok;
+}
+
+async function main() {
+    const args = parseArgs(process.argv.slice(2));
+    const dom = await installDom(args.dom);
+    const { default: widget, ...codec } = await import(WIDGET);
+    const cases = PRESETS[args.preset].filter(([shape]) => !args.shapes.length || args.shapes.includes(shape));
+    for (const s of args.shapes) if (!SHAPES.includes(s)) throw new Error(`Unknown shape: ${s}`);
+
+    const results = [];
+    for (const [shape, size] of cases) {
+        for (const r of await benchCase(widget, codec, shape, size, args)) {
+            const value = r.median_ms !== undefined ? `${r.median_ms.toFixed(3).padStart(10)} ms` : `${(r.heap_bytes / 1024).toFixed(1).padStart(10)} KB`;
+            console.log(`${r.case.padEnd(18)} ${r.op.padEnd(26)} ${value}`);
+            results.push(r);
+        }
+    }
+    const report = {
+        meta: {
+            dom,
+            revision: gitRevision(),
+            node: process.version,
+            platform: `${os.platform()}-${os.arch()}`,
+            cpus: os.cpus().length,
+            preset: args.preset,
+            repeat: args.repeat,
+            edits: args.edits,
+            wire: args.wire,
+            timestamp: new Date().toISOString(),
+        },
+        results,
+    };
+    if (args.out) fs.writeFileSync(args.out, JSON.stringify(report, null, 2));
+    if (args.compare && !compare(results, args.compare, args.threshold)) process.exitCode = 1;
+}
+
+await main();
@@ -0,0 +1,132 @@
+// Minimal DOM for running widget.js under plain Node when jsdom isn't installed.
+//
+// Only what the widget touches is implemented: elements with classList,
+// dataset, style and events; simple selectors (".class", "tag", "[attr]",
+// "[attr=\"v\"]" and comma lists); focus; and fixed layout numbers
+// (clientHeight 400, offsetHeight 32) so windowed lists render a real window.
+class Event {
+    constructor(type, init = {}) { Object.assign(this, init); this.type = type; this.defaultPrevented = false; }
+    preventDefault() { this.defaultPrevented = true; }
+    stopPropagation() { this._stop = true; }
+}
+class Node_ {
+    constructor() { this.childNodes = []; this.parentNode = null; this._listeners = {}; }
+    get firstChild() { return this.childNodes[0] || null; }
+    get lastChild() { return this.childNodes[this.childNodes.length - 1] || null; }
+    get children() { return this.childNodes.filter(n => n instanceof Element); }
+    get nextSibling() { const p = this.parentNode; if (!p) return null; return p.childNodes[p.childNodes.indexOf(this) + 1] || null; }
+    appendChild(n) { return this.insertBefore(n, null); }
+    append(...ns) { for (const n of ns) this.appendChild(typeof n === "string" ? new Text(n) : n); }
+    insertBefore(n, ref) {
+        if (n.parentNode) n.parentNode.removeChild(n);
+        const i = ref ? this.childNodes.indexOf(ref) : -1;
+        if (i < 0) this.childNodes.push(n); else this.childNodes.splice(i, 0, n);
+        n.parentNode = this; return n;
+    }
+    removeChild(n) { const i = this.childNodes.indexOf(n); if (i >= 0) this.childNodes.splice(i, 1); n.parentNode = null; return n; }
+    replaceChild(n, old) { this.insertBefore(n, old); return this.removeChild(old); }
+    replaceChildren(...ns) { for (const c of [...this.childNodes]) this.removeChild(c); for (const n of ns) this.appendChild(n); }
+    remove() { if (this.parentNode) this.parentNode.removeChild(this); }
+    get isConnected() { for (let n = this; n; n = n.parentNode) if (n === globalThis.document.body) return true; return false; }
+    contains(n) { for (let c = n; c; c = c.parentNode) if (c === this) return true; return false; }
+    get textContent() { return this.childNodes.map(c => c.textContent).join(""); }
+    set textContent(t) { this.replaceChildren(); if (t !== "" && t != null) this.appendChild(new Text(String(t))); }
+    addEventListener(t, f) { (this._listeners[t] ||= []).push(f); }
+    removeEventListener(t, f) { this._listeners[t] = (this._listeners[t] || []).filter(x => x !== f); }
+    dispatchEvent(e) {
+        e.target ||= this;
+        for (let n = this; n && !e._stop; n = n.parentNode) {
+            e.currentTarget = n;
+            if (typeof n["on" + e.type] === "function") n["on" + e.type](e);
+            for (const f of [...(n._listeners[e.type] || [])]) f(e);
+            if (e.bubbles === false) break;
+        }
+        return !e.defaultPrevented;
+    }
+}
+class Text extends Node_ {
+    constructor(t) { super(); this.data = t; }
+    get textContent() { return this.data; }
+    set textContent(t) { this.data = String(t); }
+}
+class ClassList {
+    constructor(el) { this.el = el; }
+    _get() { return this.el.className.split(/\s+/).filter(Boolean); }
+    add(...cs) { const s = new Set(this._get()); cs.forEach(c => s.add(c)); this.el.className = [...s].join(" "); }
+    remove(...cs) { this.el.className = this._get().filter(c => !cs.includes(c)).join(" "); }
+    contains(c) { return this._get().includes(c); }
+    toggle(c, force) { const on = force ?? !this.contains(c); if (on) this.add(c); else this.remove(c); return on; }
+}
+class Style {
+    set cssText(t) { for (const part of String(t).split(";")) { const [k, v] = part.split(":"); if (k && v) this[k.trim().replace(/-([a-z])/g, (_, c) => c.toUpperCase())] = v.trim(); } }
+    get cssText() { return ""; }
+    setProperty(k, v) { this[k] = v; }
+}
+class Element extends Node_ {
+    constructor(tag) {
+        super();
+        this.tagName = tag.toUpperCase(); this.className = ""; this.style = new Style();
+        this.attributes = {}; this.dataset = {}; this.classList = new ClassList(this);
+        this.value = ""; this.disabled = false; this.scrollTop = 0; this.scrollLeft = 0;
+        this.selectionStart = 0; this.selectionEnd = 0;
+    }
+    get id() { return this.attributes.id || ""; }
+    set id(v) { this.attributes.id = v; }
+    setAttribute(k, v) { this.attributes[k] = String(v); if (k.startsWith("data-")) this.dataset[k.slice(5).replace(/-([a-z])/g, (_, c) => c.toUpperCase())] = String(v); }
+    getAttribute(k) { return this.attributes[k] ?? null; }
+    removeAttribute(k) { delete this.attributes[k]; }
+    set innerHTML(h) {
+        this.replaceChildren();
+        const re = /<option value="([^"]*)">([^<]*)<\/option>/g; let m;
+        while ((m = re.exec(h))) { const o = new Element("option"); o.value = m[1]; o.textContent = m[2]; this.appendChild(o); }
+        if (!this.childNodes.length && h) this.appendChild(new Text(h.replace(/<[^>]*>/g, "")));
+    }
+    get innerHTML() { return this.textContent; }
+    get clientHeight() { return this._clientHeight ?? 400; }
+    get offsetHeight() { return this._offsetHeight ?? 32; }
+    get scrollHeight() { return this._scrollHeight ?? 0; }
+    get offsetTop() { const p = this.parentNode; if (!p) return 0; let y = 0; for (const c of p.children) { if (c === this) return y; y += c.offsetHeight; } return y; }
+    getRootNode() { return globalThis.document; }
+    getBoundingClientRect() { return { top: 0, left: 0, width: 600, height: this.offsetHeight, bottom: this.offsetHeight, right: 600 }; }
+    scrollIntoView() {}
+    focus() {
+        const doc = globalThis.document;
+        if (doc.activeElement === this) return;
+        const prev = doc.activeElement; doc.activeElement = this;
+        if (prev && prev !== doc.body) prev.dispatchEvent(new Event("blur", { bubbles: false }));
+        this.dispatchEvent(new Event("focus", { bubbles: false }));
+    }
+    blur() { const doc = globalThis.document; if (doc.activeElement === this) { doc.activeElement = doc.body; this.dispatchEvent(new Event("blur", { bubbles: false })); } }
+    click() { this.dispatchEvent(new Event("click")); }
+    setSelectionRange(a, b) { this.selectionStart = a; this.selectionEnd = b; }
+    matches(sel) { return sel === ":focus" ? globalThis.document.activeElement === this : _match(this, sel); }
+    closest(sel) { for (let n = this; n instanceof Element; n = n.parentNode) if (n.matches(sel)) return n; return null; }
+    querySelectorAll(sel) { const out = []; const walk = n => { for (const c of n.children) { if (_match(c, sel)) out.push(c); walk(c); } }; walk(this); return out; }
+    querySelector(sel) { return this.querySelectorAll(sel)[0] || null; }
+}
+function _match(el, sel) {
+    if (sel.startsWith(".")) return el.classList.contains(sel.slice(1));
+    const m = /^\[([\w-]+)(?:="(.*)")?\]$/.exec(sel);
+    if (m) {
+        const attr = m[1].startsWith("data-")
+            ? el.dataset[m[1].slice(5).replace(/-([a-z])/g, (_, c) => c.toUpperCase())]
+            : el.getAttribute(m[1]) ?? undefined;
+        return m[2] === undefined ? attr !== undefined : attr === m[2];
+    }
+    if (sel.includes(",")) return sel.split(",").some(x => _match(el, x.trim()));
+    return el.tagName === sel.toUpperCase();
+}
+export function installDom() {
+    const body = new Element("body");
+    const document = {
+        body, activeElement: body,
+        createElement: t => new Element(t),
+        createTextNode: t => new Text(t),
+        createDocumentFragment: () => new Element("#fragment"),
+    };
+    Object.assign(globalThis, { document, Event, KeyboardEvent: Event, Element, HTMLElement: Element });
+    if (!globalThis.navigator) globalThis.navigator = { userAgent: "node", clipboard: { writeText: async () => {} } };
+    globalThis.requestAnimationFrame ||= f => setTimeout(() => f(performance.now()), 0);
+    globalThis.cancelAnimationFrame ||= id => clearTimeout(id);
+    return document;
+}
@@ -0,0 +1,91 @@
+// Deterministic synthetic documents, in the same shapes as ../generate.py.
+// The values differ from the Python generator's (different PRNG) but the
+// structure and its scaling with `size` are the same.
+
+export const SHAPES = ["deep", "wide", "arrays", "aot", "mixed"];
+
+const WORDS = (
+    "alpha beta gamma delta host port timeout retries pool size level path name " +
+    "enabled mode region cache limit batch worker queue color format user token"
+).split(" ");
+
+function mulberry32(seed) {
+    return () => {
+        seed = (seed + 0x6d2b79f5) | 0;
+        let t = Math.imul(seed ^ (seed >>> 15), 1 | seed);
+        t = (t + Math.imul(t ^ (t >>> 7), 61 | t)) ^ t;
+        return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+    };
+}
+
+function hashSeed(s) {
+    let h = 2166136261;
+    for (let i = 0; i < s.length; i++) h = Math.imul(h ^ s.charCodeAt(i), 16777619);
+    return h >>> 0;
+}
+
+function makeRng(shape, size, seed) {
+    const r = mulberry32(hashSeed(`${shape}:${size}:${seed}`));
+    const int = (a, b) => a + Math.floor(r() * (b - a + 1));
+    const pick = xs => xs[Math.floor(r() * xs.length)];
+    const scalar = () => {
+        const x = r();
+        if (x < 0.35) return Array.from({ length: int(1, 6) }, () => pick(WORDS)).join(" ");
+        if (x < 0.6) return int(-1000, 1e6);
+        if (x < 0.75) return Math.round((r() * 200 - 100) * 1e4) / 1e4 + 0.5;
+        if (x < 0.9) return r() < 0.5;
+        return "#" + int(0, 0xffffff).toString(16).padStart(6, "0");
+    };
+    const key = i => `${pick(WORDS)}_${i}`;
+    const table = width => Object.fromEntries(Array.from({ length: width }, (_, i) => [key(i), scalar()]));
+    return { r, int, pick, scalar, key, table };
+}
+
+const GENERATORS = {
+    deep(g, size) {
+        const nest = depth => {
+            const t = g.table(4);
+            if (depth) for (let i = 0; i < 2; i++) t[`level${depth}_${i}`] = nest(depth - 1);
+            return t;
+        };
+        const doc = { title: "deep" };
+        for (let i = 0; i < size; i++) doc[`section_${i}`] = nest(4);
+        return doc;
+    },
+    wide(g, size) {
+        const doc = { title: "wide" };
+        for (let i = 0; i < 8; i++) doc[`table_${i}`] = g.table(size);
+        return doc;
+    },
+    arrays(g, size) {
+        const numbers = {}, strings = {};
+        for (let i = 0; i < 4; i++) {
+            numbers[`series_${i}`] = Array.from({ length: size }, () => g.int(0, 1e6));
+            strings[`names_${i}`] = Array.from({ length: size }, (_, j) => g.key(j));
+        }
+        return { title: "arrays", numbers, strings };
+    },
+    aot(g, size) {
+        return {
+            title: "aot",
+            servers: Array.from({ length: size }, () => g.table(6)),
+            jobs: { queue: Array.from({ length: Math.floor(size / 2) }, () => g.table(4)) },
+        };
+    },
+    mixed(g, size) {
+        const doc = { title: "mixed", version: 3 };
+        for (let i = 0; i < size; i++) {
+            const t = g.table(8);
+            t.tags = Array.from({ length: g.int(0, 12) }, () => g.pick(WORDS));
+            t.limits = g.table(3);
+            if (i % 5 === 0) t.replicas = Array.from({ length: 3 }, () => g.table(3));
+            doc[`service_${i}`] = t;
+        }
+        return doc;
+    },
+};
+
+/** A document of the given shape; `size` scales it roughly linearly. */
+export function generate(shape, size, seed = 0) {
+    return GENERATORS[shape](makeRng(shape, size, seed), size);
+}
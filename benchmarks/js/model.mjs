@@ -0,0 +1,64 @@
+// Stand-ins for the anywidget model and the Python side, for the benchmarks.
+
+/** Initial synced state for a document, as TomlConfigEditor would send it. */
+export function initialState(data, extra = {}) {
+    return {
+        data, name: "bench", status: "Ready.", toml_text: "", text_sync: "off",
+        history_limit: 100, can_undo: false, can_redo: false,
+        data_version: 1, data_patch: { epoch: 1, version: 1, reset: true, ops: [] },
+        table_index: {}, hydration: "full", layers: [], write_layer: -1, provenance: {}, conflict: {}, instrument: "off",
+        publish: "live", publish_delay: 0, published: 0,
+        ...extra,
+    };
+}
+
+/**
+ * Backbone-like model: get/set/on/save_changes, plus hooks to play Python's
+ * part. Requests the widget sends are queued in ``sent``; ``decode`` reads
+ * batches sent as wire frames.
+ */
+export function makeModel(state, decode = v => v) {
+    const handlers = {};
+    const sent = [];
+    const model = {
+        state, sent, messages: [],
+        get: k => state[k],
+        set: (k, v) => { state[k] = v; },
+        save_changes: () => {},
+        send: (msg, cb, buffers) => {
+            if (msg.type !== "request") { model.messages.push({ msg, buffers }); return; }
+            const batch = Array.isArray(msg.batch) ? msg.batch : decode({ ...msg.batch, buffer: buffers[0] });
+            sent.push(...batch);
+        },
+        on: (ev, f) => { (handlers[ev] ||= []).push(f); },
+        off: (ev, f) => {
+            if (!ev) { for (const k in handlers) delete handlers[k]; return; }
+            handlers[ev] = (handlers[ev] || []).filter(x => x !== f);
+        },
+        /** A Python → JS state update. */
+        pythonSet(patch) {
+            Object.assign(state, patch);
+            for (const k of Object.keys(patch)) for (const f of handlers["change:" + k] || []) f();
+        },
+        pythonSend(msg, buffers) { for (const f of handlers["msg:custom"] || []) f(msg, buffers || []); },
+    };
+    return model;
+}
+
+/**
+ * Answer the commands the widget sent the way Python would, as far as the
+ * benchmarks need: acknowledge patches and report undo state.
+ */
+export function servePython(model) {
+    const replies = [];
+    while (model.sent.length) {
+        const { id, command, payload } = model.sent.shift();
+        let result = null;
+        if (command === "patch") {
+            model.pythonSet({ data_version: payload.base + 1, can_undo: true });
+            result = payload.base + 1;
+        }
+        replies.push({ id, ok: true, result });
+    }
+    if (replies.length) model.pythonSend({ type: "reply", replies });
+}
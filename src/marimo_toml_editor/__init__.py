@@ -1,6 +1,42 @@
-"""marimo-toml-editor public API."""
+"""marimo-toml-editor public API.
 
-from marimo_toml_editor._widget import TomlConfigEditor
+Names are imported on first use (PEP 562): the widget pulls in anywidget,
+ipywidgets and IPython, which is most of the import time, so neither a bare
+``import marimo_toml_editor`` nor the headless API pays for it.
+"""
 
-__all__ = ["TomlConfigEditor"]
+from __future__ import annotations
+
+import importlib
+
+TYPE_CHECKING = False  # not typing.TYPE_CHECKING: typing itself takes a while to import
+if TYPE_CHECKING:
+    from typing import Any, List
+
+    from marimo_toml_editor._core import BulkResult, TomlDocument, bulk_apply
+    from marimo_toml_editor._select import PathView
+    from marimo_toml_editor._widget import TomlConfigEditor
+
+__all__ = ["BulkResult", "PathView", "TomlConfigEditor", "TomlDocument", "bulk_apply"]
 __version__ = "0.1.0"
+
+_EXPORTS = {
+    "BulkResult": "_core",
+    "PathView": "_select",
+    "TomlConfigEditor": "_widget",
+    "TomlDocument": "_core",
+    "bulk_apply": "_core",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value  # later lookups skip this function
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted({*globals(), *__all__})
@@ -0,0 +1,123 @@
+"""marimo-toml-editor — process-wide cache of parsed TOML files.
+
+Notebooks tend to load the same few files again and again (re-run cells,
+several editors on one config). Parsed documents are kept by resolved path,
+mtime and size — plus the content digest when ``verify`` is on, for file
+systems with coarse timestamps — and evicted least recently used first once
+their source sizes exceed ``max_bytes``.
+
+Every caller gets its own copy of a cached document, so editing it (or
+mutating ``data`` directly) can't change what the next load sees. Copying
+the parsed tables is a small fraction of the cost of parsing them again.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from marimo_toml_editor._fileio import digest
+
+try:
+    import tomllib  # py3.11+
+except ImportError:  # pragma: no cover
+    import tomli as tomllib  # type: ignore[no-redef]
+
+# (resolved path, st_mtime_ns, st_size)
+_Key = Tuple[str, int, int]
+
+
+def _copy(value: Any) -> Any:
+    # Parsed TOML is dicts, lists and immutable scalars: cheaper than deepcopy
+    if type(value) is dict:
+        return {k: _copy(v) for k, v in value.items()}
+    if type(value) is list:
+        return [_copy(v) for v in value]
+    return value
+
+
+class Parsed(NamedTuple):
+    doc: Dict[str, Any]  # the caller's own copy
+    digest: str  # sha256 of the source bytes
+    mtime_ns: int
+    nbytes: int
+    text: Optional[str]  # the source, when it had to be read
+
+
+class ParseCache:
+    """LRU of parsed files with a budget in source bytes (0 disables it)."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, verify: bool = False) -> None:
+        self.max_bytes = max_bytes
+        self.verify = verify
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[_Key, Parsed]" = OrderedDict()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        """Total source size of the cached documents."""
+        return self._size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def parse(self, path: Path) -> Parsed:
+        """Parse ``path``, or return the cached document if the file is unchanged.
+
+        Raises what reading or ``tomllib`` raise. The returned ``doc`` is
+        the caller's own.
+        """
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            key: _Key = (str(Path(path).resolve()), st.st_mtime_ns, st.st_size)
+            raw = f.read() if self.verify else None
+            hit = self._get(key, digest(raw) if raw is not None else None)
+            if hit is not None:
+                return hit._replace(doc=_copy(hit.doc))
+            if raw is None:
+                raw = f.read()
+            changed = os.fstat(f.fileno()).st_mtime_ns != st.st_mtime_ns
+        text = raw.decode("utf-8")
+        parsed = Parsed(tomllib.loads(text), digest(raw), st.st_mtime_ns, len(raw), text)
+        if not changed:
+            # (if it was written to while we read it, the key may not match the content)
+            self._put(key, parsed._replace(doc=_copy(parsed.doc), text=None))
+        return parsed
+
+    def _get(self, key: _Key, sha: Optional[str]) -> Optional[Parsed]:
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None or (sha is not None and hit.digest != sha):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return hit
+
+    def _put(self, key: _Key, parsed: Parsed) -> None:
+        if parsed.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            # Older versions of the same file can't be hit again
+            for old in [k for k in self._entries if k[0] == key[0]]:
+                self._size -= self._entries.pop(old).nbytes
+            self._entries[key] = parsed
+            self._size += parsed.nbytes
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.nbytes
+
+
+# The cache every editor and TomlDocument in the process uses
+shared_cache = ParseCache()
@@ -0,0 +1,297 @@
+"""marimo-toml-editor — headless editing of TOML files.
+
+:class:`TomlDocument` is the editor without the widget: load, read and write
+values by dotted path, validate and save, on the same ops, parse cache and
+atomic writes as :class:`TomlConfigEditor`. :func:`bulk_apply` runs the same
+edit over many files in a process pool.
+"""
+
+from __future__ import annotations
+
+import copy
+import datetime
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Union
+
+from marimo_toml_editor._cache import ParseCache, shared_cache
+from marimo_toml_editor._fileio import Stamp, write_if_changed
+from marimo_toml_editor._patch import Op, apply_ops
+from marimo_toml_editor._serialize import writer
+from marimo_toml_editor._source import SourceText, SpliceError
+
+try:
+    import tomllib  # py3.11+
+except ImportError:  # pragma: no cover
+    import tomli as tomllib  # type: ignore[no-redef]
+
+Path_ = Union[str, Sequence[Any]]  # "server.port", 'a."b.c".d' or ["server", "port"]
+
+_MISSING = object()
+_SCALARS = (str, int, float, bool, datetime.datetime, datetime.date, datetime.time)
+
+
+def split_path(path: Path_) -> List[Any]:
+    """Segments of a dotted path; quoted segments may contain dots.
+
+    Lists pass through. Array indices stay strings ("servers.0.port"):
+    :func:`resolve_indices` converts them against a document.
+    """
+    if not isinstance(path, str):
+        return list(path)
+    segs: List[str] = []
+    cur = ""
+    quote = ""
+    quoted = False
+    for ch in path:
+        if quote:
+            if ch == quote:
+                quote = ""
+            else:
+                cur += ch
+        elif ch in "\"'":
+            quote = ch
+            quoted = True
+        elif ch == ".":
+            segs.append(cur if quoted else cur.strip())
+            cur, quoted = "", False
+        else:
+            cur += ch
+    if quote:
+        raise ValueError(f"Unterminated quote in path {path!r}")
+    segs.append(cur if quoted else cur.strip())
+    if any(s == "" for s in segs) and path:
+        raise ValueError(f"Empty segment in path {path!r}")
+    return segs if path else []
+
+
+def get_path(doc: Dict[str, Any], path: Path_, default: Any = _MISSING) -> Any:
+    """Value at ``path`` in ``doc``; ``KeyError`` unless a default is given."""
+    cur: Any = doc
+    for seg in split_path(path):
+        try:
+            cur = cur[int(seg)] if isinstance(cur, list) else cur[seg]
+        except (KeyError, IndexError, TypeError, ValueError):
+            if default is _MISSING:
+                raise KeyError(path) from None
+            return default
+    return cur
+
+
+def resolve_indices(doc: Any, path: List[Any]) -> List[Any]:
+    """``path`` with the segments that index an array in ``doc`` as ints.
+
+    Ops from the frontend carry indices as numbers; ops from a dotted path
+    need this to look the same. Segments past the end of ``doc`` are kept.
+    """
+    out = list(path)
+    cur = doc
+    for i, seg in enumerate(out):
+        if isinstance(cur, list):
+            if isinstance(seg, str) and seg.isdigit():
+                out[i] = seg = int(seg)
+            cur = cur[seg] if isinstance(seg, int) and 0 <= seg < len(cur) else None
+        elif isinstance(cur, dict):
+            cur = cur.get(seg)
+        else:
+            break
+    return out
+
+
+def normalize_ops(ops: Iterable[Op], doc: Optional[Dict[str, Any]] = None) -> List[Op]:
+    """Ops with dotted string paths split into segments and their values copied.
+
+    The values end up in the document, which later edits change in place:
+    the caller's objects must not. With ``doc``, array indices become ints
+    where a path reaches an array in it (see :func:`resolve_indices`).
+    """
+    out = []
+    for op in ops:
+        path = split_path(op.get("path") or [])
+        op = {**op, "path": resolve_indices(doc, path) if doc is not None else path}
+        if "value" in op:
+            op["value"] = copy.deepcopy(op["value"])
+        out.append(op)
+    return out
+
+
+def validate(doc: Any, path: str = "") -> List[str]:
+    """Problems that would stop ``doc`` from being written as TOML."""
+    errors: List[str] = []
+    if isinstance(doc, dict):
+        for k, v in doc.items():
+            where = f"{path}.{k}" if path else str(k)
+            if not isinstance(k, str):
+                errors.append(f"{where}: key must be a string, not {type(k).__name__}")
+            errors.extend(validate(v, where))
+    elif isinstance(doc, (list, tuple)):
+        for i, v in enumerate(doc):
+            errors.extend(validate(v, f"{path}.{i}"))
+    elif doc is None:
+        errors.append(f"{path}: TOML has no null value")
+    elif not isinstance(doc, _SCALARS):
+        errors.append(f"{path}: unsupported type {type(doc).__name__}")
+    return errors
+
+
+class TomlDocument:
+    """A TOML document edited in plain Python: no traitlets, no frontend.
+
+    ``data`` is the document. Edits through :meth:`set`, :meth:`delete` and
+    :meth:`apply_ops` mark it as changed; :meth:`save` writes it atomically
+    and skips the write when the file already holds the same text. A loaded
+    document is saved by splicing those edits into the file's text, keeping
+    comments and layout (see ``preserve_format``); assigning a new ``data``
+    falls back to a plain tomli-w rendering.
+    """
+
+    # Shared with TomlConfigEditor.parse_cache
+    parse_cache: Optional[ParseCache] = shared_cache
+    # Keep the loaded file's formatting when saving (see _source.py)
+    preserve_format = True
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None, path: Optional[Union[str, Path]] = None) -> None:
+        self.data: Dict[str, Any] = data if data is not None else {}
+        self.path = Path(path).expanduser() if path else None
+        self.changed = False
+        self._stamp: Optional[Stamp] = None
+        # The loaded text, and the data it holds (reassigning data drops it)
+        self._source: Optional[SourceText] = None
+        self._source_of: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def load(cls, path: Union[str, Path], cache: bool = True) -> "TomlDocument":
+        """Parse ``path``; with ``cache``, through the process-wide parse cache."""
+        p = Path(path).expanduser()
+        parse_cache = cls.parse_cache if cache else None
+        if parse_cache is not None:
+            parsed = parse_cache.parse(p)
+            doc = cls(parsed.doc, p)
+            doc._stamp = (parsed.digest, parsed.mtime_ns, parsed.nbytes)
+            # A cache hit has no text: read it only if a save needs it
+            source = SourceText(parsed.text) if parsed.text is not None else SourceText.from_file(p, parsed.digest)
+        else:
+            text = p.read_bytes().decode("utf-8")
+            doc = cls(tomllib.loads(text), p)
+            source = SourceText(text)
+        if cls.preserve_format:
+            doc._source, doc._source_of = source, doc.data
+        return doc
+
+    def get(self, path: Path_, default: Any = None) -> Any:
+        """Value at a dotted path, or ``default`` if there is none (as ``TomlConfigEditor.get``)."""
+        return get_path(self.data, path, default)
+
+    def set(self, path: Path_, value: Any) -> None:
+        """Set the value at a dotted path, creating tables on the way."""
+        segs = split_path(path)
+        absent = object()
+        exists = get_path(self.data, segs, absent) is not absent
+        self.apply_ops([{"op": "replace" if exists else "add", "path": segs, "value": value}])
+
+    def delete(self, path: Path_) -> None:
+        """Remove the value at a dotted path; ``KeyError`` if it isn't there."""
+        segs = split_path(path)
+        get_path(self.data, segs)
+        self.apply_ops([{"op": "remove", "path": segs}])
+
+    def apply_ops(self, ops: Iterable[Op]) -> List[Op]:
+        """Apply ``{"op", "path", "value"}`` ops (paths may be dotted); returns the inverse ops.
+
+        All or nothing: if an op fails, ``data`` is left as it was.
+        """
+        ops = normalize_ops(ops, self.data)
+        inverse = apply_ops(self.data, ops)
+        self.changed = True
+        if self._source is not None:
+            self._source.touch(ops)
+        return inverse
+
+    def validate(self) -> List[str]:
+        """Problems that would stop the document from being saved; empty if none."""
+        return validate(self.data)
+
+    def dumps(self) -> str:
+        tomli_w = writer()
+        if tomli_w is None:
+            raise RuntimeError("Install tomli-w to enable saving (pip install tomli-w).")
+        errors = self.validate()
+        if errors:
+            raise ValueError("; ".join(errors[:5]) + (f" (+{len(errors) - 5} more)" if len(errors) > 5 else ""))
+        if self._source is not None and self._source_of is self.data:
+            try:
+                return self._source.render(self.data)
+            except SpliceError:
+                pass
+        text = tomli_w.dumps(self.data)
+        if self._source is not None:
+            # Later edits are spliced into this rendering instead
+            text = self._source.with_newlines(text)
+            self._source, self._source_of = SourceText(text, newline=self._source.newline), self.data
+        return text
+
+    def save(self, path: Optional[Union[str, Path]] = None, fsync: bool = False) -> bool:
+        """Write the document to ``path`` (default: where it was loaded from).
+
+        Returns ``False`` if the file already held the same text. Raises
+        ``ValueError`` if the document fails :meth:`validate`.
+        """
+        p = Path(path).expanduser() if path else self.path
+        if p is None:
+            raise ValueError("No path specified.")
+        last = self._stamp if p == self.path else None
+        written, stamp = write_if_changed(p, self.dumps().encode("utf-8"), fsync=fsync, last=last)
+        if p == self.path:
+            self._stamp = stamp
+            self.changed = False
+        return written
+
+
+# ---------------------------------------------------------------------------
+# Bulk edits
+# ---------------------------------------------------------------------------
+
+
+class BulkResult(NamedTuple):
+    path: str
+    written: bool  # False: unchanged on disk, or failed
+    error: Optional[str] = None
+
+
+def _apply_one(path: str, ops: List[Op], fsync: bool) -> BulkResult:
+    try:
+        doc = TomlDocument.load(path, cache=False)
+        doc.apply_ops(ops)
+        return BulkResult(path, doc.save(fsync=fsync))
+    except Exception as exc:  # noqa: BLE001
+        # One bad file shouldn't stop the batch
+        return BulkResult(path, False, f"{type(exc).__name__}: {exc}")
+
+
+def bulk_apply(
+    paths: Iterable[Union[str, Path]],
+    ops: Iterable[Op],
+    workers: Optional[int] = None,
+    fsync: bool = False,
+) -> List[BulkResult]:
+    """Apply the same ops to many TOML files, parsing and writing in a process pool.
+
+    Each file is loaded, edited, validated and saved atomically; files that
+    end up unchanged aren't rewritten. ``workers`` defaults to the number of
+    CPUs; ``workers=1`` runs in this process. Returns one :class:`BulkResult`
+    per path, in order; failures are reported there rather than raised.
+    """
+    files = [str(Path(p).expanduser()) for p in paths]
+    steps = normalize_ops(ops)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(files) < 2:
+        return [_apply_one(p, steps, fsync) for p in files]
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = min(workers, len(files))
+    # Several files per task: most configs take less to edit than to ship
+    chunksize = max(1, len(files) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(
+            pool.map(_apply_one, files, [steps] * len(files), [fsync] * len(files), chunksize=chunksize)
+        )
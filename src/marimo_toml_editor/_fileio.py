@@ -0,0 +1,111 @@
+"""marimo-toml-editor — crash-safe file writes.
+
+Saves go to a temporary file in the target's directory which then replaces
+the target in one ``os.replace``, so readers see either the old file or the
+new one, never a partial write. Writes whose content matches the file on
+disk are skipped, which keeps mtime-based reloaders quiet.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+# (sha256 hex digest, st_mtime_ns, st_size) of a file as last read or written
+Stamp = Tuple[str, int, int]
+
+
+def digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def stamp_of(path: Path, data: bytes) -> Optional[Stamp]:
+    """Stamp for ``path`` whose content is known to be ``data``."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (digest(data), st.st_mtime_ns, st.st_size)
+
+
+def _unchanged(path: Path, data: bytes, last: Optional[Stamp]) -> bool:
+    try:
+        st = path.stat()
+    except OSError:
+        return False
+    if st.st_size != len(data):
+        return False
+    if last is not None and (last[1], last[2]) == (st.st_mtime_ns, st.st_size):
+        # Untouched since we last read or wrote it: the digest decides
+        return last[0] == digest(data)
+    try:
+        return path.read_bytes() == data
+    except OSError:
+        return False
+
+
+def _create_temp(path: Path) -> Tuple[int, str]:
+    """Create and open a new temporary file next to ``path``.
+
+    Unlike ``tempfile.mkstemp`` (mode 0600), it is created 0666 less the
+    process umask, like any new file.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    for _ in range(100):
+        tmp = str(path.parent / f".{path.name}.{os.urandom(4).hex()}.tmp")
+        try:
+            return os.open(tmp, flags, 0o666), tmp
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"No usable temporary name for {path}")
+
+
+def write_atomic(path: Path, data: bytes, fsync: bool = False) -> None:
+    """Replace ``path`` with ``data`` via a temporary file and a rename."""
+    path = Path(os.path.realpath(path))  # replace a symlink's target, not the link
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = _create_temp(path)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        try:
+            mode: Optional[int] = path.stat().st_mode & 0o7777
+        except OSError:
+            mode = None
+        if mode is not None:
+            # An existing file keeps its mode
+            os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    if fsync and hasattr(os, "O_DIRECTORY"):
+        # Make the rename itself durable
+        dfd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dfd)
+        finally:
+            os.close(dfd)
+
+
+def write_if_changed(
+    path: Path, data: bytes, fsync: bool = False, last: Optional[Stamp] = None
+) -> Tuple[bool, Optional[Stamp]]:
+    """Atomically write ``data`` unless ``path`` already holds it.
+
+    ``last`` is the stamp from the previous read or write of ``path``, if
+    any; when the file hasn't changed since, comparing digests avoids
+    reading it back. Returns ``(written, stamp)``.
+    """
+    if _unchanged(path, data, last):
+        return False, stamp_of(path, data)
+    write_atomic(path, data, fsync=fsync)
+    return True, stamp_of(path, data)
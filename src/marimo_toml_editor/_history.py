@@ -0,0 +1,92 @@
+"""marimo-toml-editor — bounded, delta-encoded edit history."""
+
+from __future__ import annotations
+
+import copy
+import json
+from typing import Any, Dict, List, Optional, Set
+
+from marimo_toml_editor._patch import Op
+
+
+class EditHistory:
+    """Undo/redo stack of ``(ops, inverse)`` pairs.
+
+    Entries are identified by the document version they produced, which lets
+    the frontend and Python agree on which edit an undo refers to. The stack
+    is trimmed from the oldest end to stay within ``limit`` entries and
+    roughly ``max_bytes`` of JSON-encoded ops.
+    """
+
+    def __init__(self, limit: int = 100, max_bytes: int = 8 * 1024 * 1024) -> None:
+        self.limit = limit
+        self.max_bytes = max_bytes
+        self._entries: List[Dict[str, Any]] = []
+        self._index = 0  # number of entries currently applied
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size of the stored ops, in bytes of JSON."""
+        return self._bytes
+
+    @property
+    def can_undo(self) -> bool:
+        return self._index > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self._index < len(self._entries)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """The applied entries, oldest first."""
+        return self._entries[: self._index]
+
+    def versions(self) -> Set[int]:
+        """Versions of all entries, undone ones included."""
+        return {e["version"] for e in self._entries}
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._index = 0
+        self._bytes = 0
+
+    def record(self, version: int, ops: List[Op], inverse: List[Op]) -> None:
+        """Add an edit, dropping the undone ones. The history keeps copies of the ops."""
+        # Their values are in the document (or were taken out of it) and
+        # would change with it
+        ops, inverse = copy.deepcopy(ops), copy.deepcopy(inverse)
+        for dropped in self._entries[self._index :]:
+            self._bytes -= dropped["nbytes"]
+        del self._entries[self._index :]
+        nbytes = len(json.dumps([ops, inverse], default=str))
+        self._entries.append({"version": version, "ops": ops, "inverse": inverse, "nbytes": nbytes})
+        self._bytes += nbytes
+        while len(self._entries) > 1 and (
+            len(self._entries) > max(1, self.limit) or self._bytes > self.max_bytes
+        ):
+            self._bytes -= self._entries.pop(0)["nbytes"]
+        self._index = len(self._entries)
+
+    def peek_undo(self) -> Optional[Dict[str, Any]]:
+        return self._entries[self._index - 1] if self.can_undo else None
+
+    def peek_redo(self) -> Optional[Dict[str, Any]]:
+        return self._entries[self._index] if self.can_redo else None
+
+    def step_back(self) -> Optional[Dict[str, Any]]:
+        """Move before the last applied entry and return it."""
+        entry = self.peek_undo()
+        if entry is not None:
+            self._index -= 1
+        return entry
+
+    def step_forward(self) -> Optional[Dict[str, Any]]:
+        """Move past the next undone entry and return it."""
+        entry = self.peek_redo()
+        if entry is not None:
+            self._index += 1
+        return entry
@@ -0,0 +1,238 @@
+"""marimo-toml-editor — layered configs (base.toml + env.toml + local.toml …).
+
+Later layers override earlier ones: tables merge key by key, anything else
+(arrays included) is replaced whole. The merge is cached per top-level key
+and recomputed only for the keys an edit or reload touched, along with the
+provenance of every value — the index of the layer it comes from.
+
+Edits are made on the merged view and written through to one layer. An op
+inside an array copies the whole array to that layer, since arrays don't
+merge. Each write can be journaled so that undo and redo put the layer back
+as it was, rather than writing the merged values through again.
+"""
+
+from __future__ import annotations
+
+import copy
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from marimo_toml_editor._patch import Op
+
+_MISSING = object()
+
+# (path in the layer, value before the op, value after it); _MISSING for absent
+Journal = List[Tuple[List[Any], Any, Any]]
+
+
+def _merge(values: List[Any], layers: List[int], prefix: str, origin: Dict[str, int]) -> Any:
+    """Merge one key's values from several layers (lowest first)."""
+    last = len(values) - 1
+    if not isinstance(values[last], dict):
+        origin[prefix] = layers[last]
+        return values[last]
+    # Tables below the last non-table are the ones that merge
+    first = last
+    while first > 0 and isinstance(values[first - 1], dict):
+        first -= 1
+    merged: Dict[str, Any] = {}
+    keys: Dict[str, List[int]] = {}
+    for i in range(first, last + 1):
+        for k in values[i]:
+            keys.setdefault(k, []).append(i)
+    for k, idx in keys.items():
+        merged[k] = _merge(
+            [values[i][k] for i in idx], [layers[i] for i in idx], f"{prefix}.{k}", origin
+        )
+    return merged
+
+
+def _get(doc: Any, path: Sequence[Any]) -> Any:
+    for seg in path:
+        doc = doc[int(seg)] if isinstance(doc, list) else doc[seg]
+    return doc
+
+
+def _lookup(doc: Dict[str, Any], path: Sequence[Any]) -> Any:
+    try:
+        return copy.deepcopy(_get(doc, path))
+    except (KeyError, IndexError, TypeError, ValueError):
+        return _MISSING
+
+
+def _array_depth(doc: Any, path: Sequence[Any]) -> int:
+    """Length of the part of ``path`` leading to the first array on it (``len(path)`` if none)."""
+    for i, seg in enumerate(path):
+        if isinstance(doc, list):
+            return i
+        if not isinstance(doc, dict) or seg not in doc:
+            break
+        doc = doc[seg]
+    return len(path)
+
+
+class LayerStack:
+    """The layers of a config and their merge, kept up to date per top-level key.
+
+    ``docs`` are the parsed layers, lowest first.
+    """
+
+    def __init__(self, docs: List[Dict[str, Any]]) -> None:
+        self.docs = docs
+        self.dirty: Set[int] = set()
+        self._merged: Dict[str, Any] = {}
+        self._origin: Dict[str, Dict[str, int]] = {}  # top key → {dotted path: layer}
+        self.recompute()
+
+    def keys(self) -> List[str]:
+        """Top-level keys in order of first appearance, lowest layer first."""
+        seen: Dict[str, None] = {}
+        for doc in self.docs:
+            seen.update(dict.fromkeys(doc))
+        return list(seen)
+
+    def recompute(self, keys: Optional[Iterable[str]] = None) -> Set[str]:
+        """Re-merge ``keys`` (all if ``None``); returns those whose result changed."""
+        todo = self.keys() if keys is None else list(dict.fromkeys(keys))
+        if keys is None:
+            todo += [k for k in self._merged if k not in todo]
+        changed: Set[str] = set()
+        for k in todo:
+            idx = [i for i, doc in enumerate(self.docs) if k in doc]
+            old = self._merged.get(k, _MISSING)
+            if not idx:
+                self._merged.pop(k, None)
+                self._origin.pop(k, None)
+            else:
+                origin: Dict[str, int] = {}
+                self._merged[k] = _merge([self.docs[i][k] for i in idx], idx, k, origin)
+                self._origin[k] = origin
+            if self._merged.get(k, _MISSING) != old:
+                changed.add(k)
+        return changed
+
+    def merged(self) -> Dict[str, Any]:
+        """A private copy of the merged document, in key order."""
+        return {k: copy.deepcopy(self._merged[k]) for k in self.keys()}
+
+    def get(self, key: str) -> Any:
+        """The merged value of a top-level key, shared with the layers: read only."""
+        return self._merged.get(key)
+
+    def value(self, key: str) -> Any:
+        """A private copy of the merged value of a top-level key."""
+        return copy.deepcopy(self._merged[key])
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._merged
+
+    def provenance(self, skip: int = 0) -> Dict[str, int]:
+        """``{dotted path: layer}`` for every value not from layer ``skip``."""
+        return {p: i for origin in self._origin.values() for p, i in origin.items() if i != skip}
+
+    def layer_of(self, path: Sequence[Any]) -> Optional[int]:
+        """Index of the layer the value at ``path`` comes from (tables: the top one)."""
+        if not path:
+            return None
+        origin = self._origin.get(str(path[0]), {})
+        dotted = ".".join(str(p) for p in path)
+        if dotted in origin:
+            return origin[dotted]
+        below = [i for p, i in origin.items() if p.startswith(dotted + ".")]
+        if below:
+            return max(below)
+        # Inside an array: it comes whole from one layer
+        for n in range(len(path) - 1, 0, -1):
+            dotted = ".".join(str(p) for p in path[:n])
+            if dotted in origin:
+                return origin[dotted]
+        return None
+
+    def write(
+        self, layer: int, ops: List[Op], data: Dict[str, Any], journal: Optional[Journal] = None
+    ) -> Set[str]:
+        """Write ops, already applied to the merged ``data``, through to ``layer``.
+
+        Returns the top-level keys touched; pass them to :meth:`recompute`.
+        What each op changed in the layer is appended to ``journal``.
+        """
+        doc = self.docs[layer]
+        touched: Set[str] = set()
+        for op in ops:
+            path = list(op.get("path") or [])
+            if not path:
+                before = copy.deepcopy(doc) if journal is not None else None
+                doc.clear()
+                doc.update(copy.deepcopy(data))
+                touched.update(self.keys())
+                touched.update(self._merged)
+                if journal is not None:
+                    journal.append(([], before, copy.deepcopy(doc)))
+                continue
+            # The value to write: the path itself, or the array holding it
+            n = _array_depth(data, path)
+            anchor = path[:n]
+            touched.add(str(path[0]))
+            # What the write may replace: the anchor, or the first table on the
+            # way to it that it has to create
+            held = len(anchor)
+            parent: Any = doc
+            for i, seg in enumerate(anchor[:-1]):
+                if not isinstance(parent.get(seg), dict):
+                    held = i + 1
+                    break
+                parent = parent[seg]
+            before = _lookup(doc, anchor[:held]) if journal is not None else None
+            self._write_op(doc, op, anchor, n == len(path), data)
+            if journal is not None:
+                journal.append((anchor[:held], before, _lookup(doc, anchor[:held])))
+        if touched:
+            self.dirty.add(layer)
+        return touched
+
+    @staticmethod
+    def _write_op(doc: Dict[str, Any], op: Op, anchor: List[Any], whole: bool, data: Dict[str, Any]) -> None:
+        if op.get("op") == "remove" and whole:
+            parent: Any = doc
+            for seg in anchor[:-1]:
+                parent = parent.get(seg) if isinstance(parent, dict) else None
+            if isinstance(parent, dict):
+                parent.pop(anchor[-1], None)
+            return
+        try:
+            value = _get(data, anchor)
+        except (KeyError, IndexError, TypeError, ValueError):
+            return
+        parent = doc
+        for seg in anchor[:-1]:
+            if not isinstance(parent.get(seg), dict):
+                parent[seg] = {}
+            parent = parent[seg]
+        parent[anchor[-1]] = copy.deepcopy(value)
+
+    def restore(self, layer: int, journal: Journal, undo: bool) -> Set[str]:
+        """Put ``layer`` back as it was before (``undo``) or after a journaled write."""
+        doc = self.docs[layer]
+        touched: Set[str] = set()
+        for path, before, after in reversed(journal) if undo else journal:
+            value = before if undo else after
+            if value is not _MISSING:
+                value = copy.deepcopy(value)
+            if not path:
+                touched.update(self.keys())
+                doc.clear()
+                doc.update(value)
+                touched.update(self._merged)
+                continue
+            touched.add(str(path[0]))
+            parent = doc
+            for seg in path[:-1]:
+                if not isinstance(parent.get(seg), dict):
+                    parent[seg] = {}
+                parent = parent[seg]
+            if value is _MISSING:
+                parent.pop(path[-1], None)
+            else:
+                parent[path[-1]] = value
+        if touched:
+            self.dirty.add(layer)
+        return touched
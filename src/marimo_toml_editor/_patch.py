@@ -0,0 +1,136 @@
+"""marimo-toml-editor — path-based edit operations.
+
+An op is a small JSON-Patch-style dict shared by Python and ``widget.js``::
+
+    {"op": "add" | "replace" | "remove", "path": ["server", "port"], "value": 8080}
+
+``path`` is a list of segments: strings index tables, integers index arrays.
+An empty path addresses the whole document. ``add`` creates the tables on
+its way; ``replace`` needs the value to be there already.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence
+
+Op = Dict[str, Any]
+
+OPS = ("add", "replace", "remove")
+
+
+def _parent(doc: Dict[str, Any], path: Sequence[Any], create: bool) -> Any:
+    """Walk to the container holding ``path[-1]``, creating tables if asked."""
+    cur: Any = doc
+    for i, seg in enumerate(path[:-1]):
+        if isinstance(cur, list):
+            cur = cur[int(seg)]
+            continue
+        if not isinstance(cur, dict):
+            raise ValueError(f"Cannot descend into {type(cur).__name__} at {seg!r}")
+        if create and not isinstance(cur.get(seg), (dict, list)):
+            cur[seg] = {}
+        elif seg not in cur:
+            raise KeyError(f"No table at {_dotted(path[: i + 1])}")
+        cur = cur[seg]
+    return cur
+
+
+def _dotted(path: Sequence[Any]) -> str:
+    return ".".join(str(p) for p in path)
+
+
+def apply_op(doc: Dict[str, Any], op: Op) -> Optional[Op]:
+    """Apply a single op to ``doc`` in place and return the op that undoes it.
+
+    The inverse holds references to the values it restores, not copies.
+    """
+    kind = op.get("op")
+    path = list(op.get("path") or [])
+    if kind not in OPS:
+        raise ValueError(f"Unknown op: {kind!r}")
+
+    if not path:
+        old = dict(doc)
+        doc.clear()
+        if kind != "remove":
+            doc.update(op.get("value") or {})
+        return {"op": "replace", "path": [], "value": old}
+
+    created = _first_missing_table(doc, path) if kind == "add" else None
+    parent = _parent(doc, path, create=kind == "add")
+    key = path[-1]
+    if created is not None:
+        parent[key] = op.get("value")
+        return {"op": "remove", "path": created}
+    if isinstance(parent, list):
+        idx = int(key)
+        if kind == "add":
+            parent.insert(idx, op.get("value"))
+            return {"op": "remove", "path": path}
+        old = parent[idx]
+        if kind == "replace":
+            parent[idx] = op.get("value")
+            return {"op": "replace", "path": path, "value": old}
+        del parent[idx]
+        return {"op": "add", "path": path, "value": old}
+    if not isinstance(parent, dict):
+        raise ValueError(f"Cannot edit inside {type(parent).__name__} at {key!r}")
+    had = key in parent
+    if kind == "replace" and not had:
+        raise KeyError(f"Nothing to replace at {_dotted(path)}")
+    old = parent.get(key)
+    if kind == "remove":
+        parent.pop(key, None)
+        return {"op": "add", "path": path, "value": old} if had else None
+    parent[key] = op.get("value")
+    return {"op": "replace", "path": path, "value": old} if had else {"op": "remove", "path": path}
+
+
+def _first_missing_table(doc: Dict[str, Any], path: Sequence[Any]) -> Optional[List[Any]]:
+    """Prefix of ``path`` naming the first table ``_parent`` would create."""
+    cur: Any = doc
+    for i, seg in enumerate(path[:-1]):
+        if isinstance(cur, list):
+            cur = cur[int(seg)]
+            continue
+        if not isinstance(cur, dict) or not isinstance(cur.get(seg), (dict, list)):
+            return list(path[: i + 1]) if isinstance(cur, dict) and seg not in cur else None
+        cur = cur[seg]
+    return None
+
+
+def apply_ops(doc: Dict[str, Any], ops: List[Op]) -> List[Op]:
+    """Apply ``ops`` to ``doc`` in order, mutating it in place.
+
+    All or nothing: if an op fails, those before it are undone and the error
+    re-raised. Returns the inverse ops, already in the order they must be applied.
+    """
+    inverse: List[Op] = []
+    try:
+        for op in ops:
+            inv = apply_op(doc, op)
+            if inv is not None:
+                inverse.append(inv)
+    except BaseException:
+        for inv in reversed(inverse):
+            apply_op(doc, inv)
+        raise
+    inverse.reverse()
+    return inverse
+
+
+def diff_ops(old: Any, new: Any, path: Optional[List[Any]] = None) -> List[Op]:
+    """Ops turning ``old`` into ``new``, descending into tables they share.
+
+    Values in the ops are ``new``'s own objects, not copies.
+    """
+    path = path or []
+    if not (isinstance(old, dict) and isinstance(new, dict)):
+        return [] if old == new else [{"op": "replace", "path": path, "value": new}]
+    ops: List[Op] = [{"op": "remove", "path": [*path, k]} for k in old if k not in new]
+    for k, v in new.items():
+        if k not in old:
+            ops.append({"op": "add", "path": [*path, k], "value": v})
+        elif old[k] is not v:
+            ops.extend(diff_ops(old[k], v, [*path, k]))
+    return ops
@@ -0,0 +1,95 @@
+"""marimo-toml-editor — reactive views of one path in a document.
+
+``TomlConfigEditor.select("server")`` returns a :class:`PathView` whose
+``value`` trait holds a copy of ``data["server"]``. It is only re-read when
+an op touches that path, something above it or something below it, and
+observers fire only when the value actually changed, so code watching
+``server`` ignores edits to ``logging.level``.
+"""
+
+from __future__ import annotations
+
+import copy
+from typing import Any, Dict, List, Optional, Tuple
+
+import traitlets
+
+from marimo_toml_editor._core import Path_, get_path, resolve_indices, split_path
+from marimo_toml_editor._patch import Op
+from marimo_toml_editor._source import same
+
+_ABSENT = object()
+
+
+def _touched(op: Op) -> Tuple[Any, ...]:
+    """The path whose subtree ``op`` may have changed."""
+    path = tuple(op.get("path") or ())
+    # Adding or removing an array element shifts the ones after it
+    if op.get("op") in ("add", "remove") and path and isinstance(path[-1], int):
+        return path[:-1]
+    return path
+
+
+def _read(data: Dict[str, Any], segs: Tuple[Any, ...], default: Any) -> Any:
+    found = get_path(data, list(segs), _ABSENT)
+    return default if found is _ABSENT else copy.deepcopy(found)
+
+
+def _overlaps(a: Tuple[Any, ...], b: Tuple[Any, ...]) -> bool:
+    n = min(len(a), len(b))
+    return a[:n] == b[:n]
+
+
+class PathView(traitlets.HasTraits):
+    """The value at one dotted path of an editor's document.
+
+    ``value`` is a copy, replaced (and its observers called) only when an
+    edit changes what is at ``path``; ``default`` while nothing is there.
+    ``version`` counts those changes.
+    """
+
+    path: str = traitlets.Unicode(read_only=True)  # type: ignore[assignment]
+    value: Any = traitlets.Any(allow_none=True)
+    version: int = traitlets.Int(default_value=0)  # type: ignore[assignment]
+
+    def __init__(self, path: str, value: Any, default: Any = None) -> None:
+        super().__init__(value=value)
+        self.set_trait("path", path)
+        self.default = default
+
+    def _refresh(self, data: Dict[str, Any], segs: Tuple[Any, ...]) -> None:
+        new = _read(data, segs, self.default)
+        if same(new, self.value):
+            return
+        with self.hold_trait_notifications():
+            self.value = new
+            self.version += 1
+
+    def __repr__(self) -> str:
+        return f"PathView({self.path!r}, version={self.version})"
+
+
+class Selections:
+    """The views an editor has handed out, refreshed by the ops it applies."""
+
+    def __init__(self) -> None:
+        self._views: Dict[Tuple[Any, ...], PathView] = {}
+
+    def select(self, data: Dict[str, Any], path: Path_, default: Any = None) -> PathView:
+        # Array indices as ints, as in the ops (for the arrays already there)
+        segs = tuple(resolve_indices(data, split_path(path)))
+        view = self._views.get(segs)
+        if view is None:
+            name = path if isinstance(path, str) else ".".join(str(s) for s in segs)
+            view = PathView(name, _read(data, segs, default), default)
+            self._views[segs] = view
+        return view
+
+    def notify(self, data: Dict[str, Any], ops: Optional[List[Op]] = None) -> None:
+        """Refresh the views ``ops`` may have changed (all of them for a new document)."""
+        if not self._views:
+            return
+        touched = None if ops is None else [_touched(op) for op in ops]
+        for segs, view in list(self._views.items()):
+            if touched is None or any(_overlaps(segs, t) for t in touched):
+                view._refresh(data, segs)
@@ -0,0 +1,80 @@
+"""marimo-toml-editor — incremental TOML serialization.
+
+``tomli_w.dumps`` renders a document as the root's plain key/value lines
+followed by one block per top-level table or array of tables, each block
+separated by a blank line. Rendering ``{key: value}`` on its own therefore
+yields exactly the text that ``key`` contributes to the full document, so
+those segments can be cached per top-level key and spliced back together.
+"""
+
+from __future__ import annotations
+
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+from marimo_toml_editor._patch import Op
+
+
+def writer() -> Optional[ModuleType]:
+    """``tomli_w``, imported on first use (it isn't needed until a save); ``None`` if missing."""
+    try:
+        import tomli_w
+    except ImportError:
+        return None
+    return tomli_w
+
+
+def toml_dumps(obj: Mapping[str, Any]) -> str:
+    """``tomli_w.dumps``; raises ``ImportError`` if tomli-w isn't installed."""
+    import tomli_w
+
+    return tomli_w.dumps(obj)
+
+
+class IncrementalDumper:
+    """Re-render only the top-level keys touched since the last dump.
+
+    ``dumps`` must be ``tomli_w.dumps`` (or behave exactly like it). The output
+    of :meth:`dumps` is byte-identical to ``dumps(data)`` as long as every
+    change to ``data`` is reported through :meth:`invalidate` or
+    :meth:`invalidate_ops`.
+    """
+
+    def __init__(self, dumps: Callable[[Mapping[str, Any]], str]) -> None:
+        self._dumps = dumps
+        self._segments: Dict[str, str] = {}
+
+    def invalidate(self, keys: Optional[Iterable[str]] = None) -> None:
+        """Forget cached segments for ``keys`` (all of them if ``None``)."""
+        if keys is None:
+            self._segments.clear()
+            return
+        for key in keys:
+            self._segments.pop(key, None)
+
+    def invalidate_ops(self, ops: List[Op]) -> None:
+        """Forget the segments of every top-level key an op touches."""
+        for op in ops:
+            path = op.get("path") or []
+            if not path:
+                self._segments.clear()
+                return
+            self._segments.pop(path[0], None)
+
+    def dumps(self, data: Mapping[str, Any]) -> str:
+        literals: List[str] = []
+        tables: List[str] = []
+        segments: Dict[str, str] = {}
+        for key, value in data.items():
+            seg = self._segments.get(key)
+            if seg is None:
+                seg = self._dumps({key: value})
+            segments[key] = seg
+            # Table and array-of-tables blocks always open with a header;
+            # a key/value line never starts with "[".
+            (tables if seg.startswith("[") else literals).append(seg)
+        # Rebuilding the dict also drops segments of keys that were removed.
+        self._segments = segments
+        if literals:
+            tables.insert(0, "".join(literals))
+        return "\n".join(tables)
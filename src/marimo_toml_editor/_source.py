@@ -0,0 +1,858 @@
+"""marimo-toml-editor — format-preserving edits of a loaded file's text.
+
+:class:`SourceText` keeps the text a document was loaded from, cut into
+chunks by the top-level key each defines (see :func:`_watch.split_chunks`).
+Edits only note the paths they touched. :meth:`SourceText.render` then
+indexes just the chunks of the touched top-level keys, splices the new
+values in, and parses those chunks again to check the result. Everything
+else keeps its bytes, comments and layout included. Files with CRLF line
+endings are worked on with LF ones and get CRLF back.
+
+Whatever can't be expressed as a splice raises :class:`SpliceError`; the
+caller falls back to a full ``tomli_w.dumps`` and starts over from that.
+"""
+
+from __future__ import annotations
+
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from marimo_toml_editor._fileio import digest
+from marimo_toml_editor._patch import Op
+from marimo_toml_editor._serialize import toml_dumps
+from marimo_toml_editor._watch import ROOT, split_chunks
+
+try:
+    import tomllib  # py3.11+
+except ImportError:  # pragma: no cover
+    import tomli as tomllib  # type: ignore[no-redef]
+
+Key = Tuple[Any, ...]  # an absolute path: ("servers", 0, "host")
+
+_ABSENT = object()
+
+
+class SpliceError(Exception):
+    """The edit can't be spliced into the text; re-render the whole document."""
+
+
+# ---------------------------------------------------------------------------
+# Rendering values
+# ---------------------------------------------------------------------------
+
+_BARE_KEY = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def format_key(key: str) -> str:
+    if _BARE_KEY.fullmatch(key):
+        return key
+    # tomli_w knows how to quote it
+    return toml_dumps({key: 0})[: -len(" = 0\n")]
+
+
+def format_value(value: Any, nested: bool = False) -> str:
+    """``value`` as it appears after ``key = ``; tables are written inline."""
+    if isinstance(value, dict):
+        if not value:
+            return "{}"
+        return "{ " + ", ".join(f"{format_key(k)} = {format_value(v, True)}" for k, v in value.items()) + " }"
+    if isinstance(value, list) and (nested or any(isinstance(v, dict) for v in value)):
+        # Inside an inline table everything stays on one line
+        return "[" + ", ".join(format_value(v, True) for v in value) + "]"
+    return toml_dumps({"x": value})[len("x = ") : -1]
+
+
+def _nest(path: Key, value: Any) -> Dict[str, Any]:
+    for k in reversed(path):
+        value = {k: value}
+    return value
+
+
+def _section(path: Key, value: Dict[str, Any]) -> str:
+    """``[a.b]`` and its body (and sub-tables), as tomli_w writes them."""
+    text = toml_dumps(_nest(path, value))
+    return text if text.strip() else "[" + ".".join(format_key(k) for k in path) + "]\n"
+
+
+def same(a: Any, b: Any) -> bool:
+    """Equal as TOML values: ``1``, ``1.0`` and ``True`` differ."""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(v, b[k]) for k, v in a.items())
+    if isinstance(a, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    return bool(a == b)
+
+
+# ---------------------------------------------------------------------------
+# Indexing a group of chunks
+# ---------------------------------------------------------------------------
+
+_KEY_PART = re.compile(r"""[A-Za-z0-9_-]+|"(?:[^"\\\n]|\\.)*"|'[^'\n]*'""")
+_DATETIME = re.compile(r"\d{4}-\d{2}-\d{2}(?:[Tt ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:[Zz]|[+-]\d{2}:\d{2})?)?")
+_TOKEN = re.compile(r"[A-Za-z0-9_+\-.:]+")
+_BASIC = re.compile(r'"(?:[^"\\\n]|\\.)*"')
+_LITERAL = re.compile(r"'[^'\n]*'")
+_BLANK = re.compile(r"[ \t]*")
+
+
+class _Kv(NamedTuple):
+    path: Key
+    start: int  # start of the line
+    end: int  # after its newline
+    vstart: int  # the value
+    vend: int
+    block: Key  # path of the table it is written under
+
+
+class _Block:
+    """A header and its lines (or, in the root group, the lines before the first header)."""
+
+    def __init__(self, path: Key, start: int, hend: int) -> None:
+        self.path = path
+        self.start = start  # header line
+        self.hend = hend  # after the header line
+        self.end = hend  # next header or end of chunk
+        self.last = hend  # after the last key/value line
+        self.indent = ""  # of its key/value lines
+
+
+class _Index:
+    """Where every key/value line and header of one group's text is."""
+
+    def __init__(self, text: str, bounds: List[int], root: bool) -> None:
+        self.text = text
+        self.bounds = bounds  # chunk start offsets, plus len(text)
+        self.root = root  # the text before the first header, or one table's chunks
+        self.kvs: Dict[Key, _Kv] = {}
+        self.items: Dict[Key, Tuple[int, int]] = {}  # element of an inline array → its span
+        self.blocks: Dict[Key, _Block] = {}
+        self.aots: Dict[Key, int] = {}  # [[array]] path → number of elements
+        # Tables made by dotted keys (a.b = 1): path → (block, relative key, end of its last line)
+        self.dotted: Dict[Key, Tuple[_Block, Key, int]] = {}
+        self.prefixes: Set[Key] = set()  # every proper prefix of a path in the text
+        self._scan()
+
+    # -- scanning
+
+    def _skip(self, i: int) -> int:
+        return _BLANK.match(self.text, i).end()  # type: ignore[union-attr]
+
+    def _eol(self, i: int) -> int:
+        """After optional blanks and a comment, the end of the line (after its newline)."""
+        text = self.text
+        i = self._skip(i)
+        if i < len(text) and text[i] == "#":
+            j = text.find("\n", i)
+            return len(text) if j < 0 else j + 1
+        if i >= len(text):
+            return i
+        if text[i] == "\n":
+            return i + 1
+        if text.startswith("\r\n", i):
+            return i + 2
+        raise SpliceError(f"Unexpected text at offset {i}")
+
+    def _key(self, i: int) -> Tuple[Key, int]:
+        parts: List[str] = []
+        text = self.text
+        while True:
+            i = self._skip(i)
+            m = _KEY_PART.match(text, i)
+            if m is None:
+                raise SpliceError(f"Expected a key at offset {i}")
+            tok = m.group(0)
+            if tok[0] == "'":
+                parts.append(tok[1:-1])
+            elif tok[0] == '"':
+                parts.append(tomllib.loads(f"k = {tok}")["k"] if "\\" in tok else tok[1:-1])
+            else:
+                parts.append(tok)
+            i = self._skip(m.end())
+            if i < len(text) and text[i] == ".":
+                i += 1
+                continue
+            return tuple(parts), i
+
+    def _value(self, i: int, path: Key) -> int:
+        """End of the value at ``path`` starting at ``i``."""
+        text = self.text
+        if text.startswith('"""', i) or text.startswith("'''", i):
+            quote = text[i : i + 3]
+            j = i + 3
+            while True:
+                k = text.find(quote, j)
+                if k < 0:
+                    raise SpliceError("Unterminated string")
+                slashes = 0
+                while quote == '"""' and text[k - 1 - slashes] == "\\":
+                    slashes += 1
+                if slashes % 2:
+                    j = k + 1
+                    continue
+                end = k + 3
+                # Up to two quotes of the content may sit right before the delimiter
+                while end < len(text) and end - k < 5 and text[end] == quote[0]:
+                    end += 1
+                return end
+        c = text[i : i + 1]
+        if c == '"' or c == "'":
+            m = (_BASIC if c == '"' else _LITERAL).match(text, i)
+            if m is None:
+                raise SpliceError("Unterminated string")
+            return m.end()
+        if c == "[":
+            return self._array(i + 1, path)
+        if c == "{":
+            return self._inline_table(i + 1, path)
+        m = _DATETIME.match(text, i) or _TOKEN.match(text, i)
+        if m is None:
+            raise SpliceError(f"Expected a value at offset {i}")
+        return m.end()
+
+    def _gap(self, i: int) -> int:
+        """Skip blanks, newlines and comments (inside an array)."""
+        text = self.text
+        while i < len(text):
+            c = text[i]
+            if c in " \t\r\n":
+                i += 1
+            elif c == "#":
+                j = text.find("\n", i)
+                i = len(text) if j < 0 else j + 1
+            else:
+                break
+        return i
+
+    def _array(self, i: int, path: Key) -> int:
+        text = self.text
+        n = 0
+        while True:
+            i = self._gap(i)
+            if i >= len(text):
+                raise SpliceError("Unterminated array")
+            if text[i] == "]":
+                return i + 1
+            end = self._value(i, path + (n,))
+            self.items[path + (n,)] = (i, end)
+            n += 1
+            i = self._gap(end)
+            if i < len(text) and text[i] == ",":
+                i += 1
+            elif not text.startswith("]", i):
+                raise SpliceError(f"Expected ',' or ']' at offset {i}")
+
+    def _inline_table(self, i: int, path: Key) -> int:
+        text = self.text
+        i = self._skip(i)
+        if text.startswith("}", i):
+            return i + 1
+        while True:
+            parts, i = self._key(i)
+            if not text.startswith("=", i):
+                raise SpliceError(f"Expected '=' at offset {i}")
+            i = self._skip(self._value(self._skip(i + 1), path + parts))
+            if text.startswith(",", i):
+                i += 1
+            elif text.startswith("}", i):
+                return i + 1
+            else:
+                raise SpliceError(f"Expected ',' or '}}' at offset {i}")
+
+    def _resolve(self, parts: Key) -> Key:
+        """Absolute path of a header's key: arrays of tables mean their last element."""
+        out: Key = ()
+        for part in parts:
+            out += (part,)
+            n = self.aots.get(out)
+            if n:
+                out += (n - 1,)
+        return out
+
+    def _scan(self) -> None:
+        text = self.text
+        block = _Block((), 0, 0)
+        self.blocks[()] = block
+        i = 0
+        while i < len(text):
+            line = i
+            i = self._skip(i)
+            c = text[i : i + 1]
+            if c in ("", "\n", "\r", "#"):
+                i = self._eol(i)
+                continue
+            if c == "[":
+                aot = text.startswith("[[", i)
+                parts, j = self._key(i + (2 if aot else 1))
+                close = "]]" if aot else "]"
+                if not text.startswith(close, j):
+                    raise SpliceError(f"Bad header at offset {line}")
+                i = self._eol(j + len(close))
+                block.end = line
+                if aot:
+                    base = self._resolve(parts[:-1]) + parts[-1:]
+                    n = self.aots.get(base, 0)
+                    self.aots[base] = n + 1
+                    path = base + (n,)
+                else:
+                    path = self._resolve(parts)
+                if path in self.blocks:
+                    raise SpliceError(f"Table defined twice: {path}")
+                block = self.blocks[path] = _Block(path, line, i)
+                self._note(path)
+                continue
+            parts, j = self._key(i)
+            if not text.startswith("=", j):
+                raise SpliceError(f"Expected '=' at offset {j}")
+            vstart = self._skip(j + 1)
+            path = block.path + parts
+            vend = self._value(vstart, path)
+            i = self._eol(vend)
+            self.kvs[path] = _Kv(path, line, i, vstart, vend, block.path)
+            self._note(path)
+            block.last = i
+            block.indent = text[line : self._skip(line)]
+            for n in range(1, len(parts)):
+                self.dotted[block.path + parts[:n]] = (block, parts[:n], i)
+        block.end = len(text)
+        # Chunks must start exactly at headers: a header-looking line inside
+        # a string, or a header split_chunks couldn't see, breaks that
+        starts = set() if self.root else set(self.bounds[:-1])
+        if starts != {b.start for b in self.blocks.values() if b.path}:
+            raise SpliceError("Headers and chunks don't line up")
+
+    def _note(self, path: Key) -> None:
+        for n in range(1, len(path)):
+            self.prefixes.add(path[:n])
+
+    # -- queries
+
+    def cut(self, block: _Block) -> int:
+        """End of ``block``, less the comment lines right above the next header."""
+        text = self.text
+        end = block.end
+        floor = block.last
+        while end > floor:
+            prev = text.rfind("\n", floor, end - 1) + 1
+            if prev < floor:
+                prev = floor
+            if not text[prev:end].lstrip(" \t").startswith("#"):
+                break
+            end = prev
+        return end
+
+    def is_table(self, path: Key) -> bool:
+        return path in self.blocks or path in self.dotted or path in self.prefixes
+
+    def own_line(self, span: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+        """The lines an array element has to itself (with its comma and comment), if any."""
+        text = self.text
+        start = text.rfind("\n", 0, span[0]) + 1
+        if text[start : span[0]].strip(" \t"):
+            return None
+        i = self._skip(span[1])
+        if text.startswith(",", i):
+            i += 1
+        try:
+            end = self._eol(i)
+        except SpliceError:
+            return None  # the next element or the closing bracket follows
+        return start, end
+
+    def kv_above(self, path: Key) -> Optional[_Kv]:
+        """The key/value line whose (inline) value holds ``path``, if any."""
+        for n in range(len(path) - 1, 0, -1):
+            kv = self.kvs.get(path[:n])
+            if kv is not None:
+                return kv
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Splicing
+# ---------------------------------------------------------------------------
+
+
+
+
+class _Splicer:
+    """Turn the touched paths of one group into splices of its text."""
+
+    def __init__(self, index: _Index, data: Dict[str, Any], more: bool) -> None:
+        self.ix = index
+        self.data = data
+        self.more = more  # headers follow the root group
+        self.splices: List[Tuple[int, int, int, str]] = []  # (start, end, seq, text)
+        self._done: Set[Key] = set()
+        self._removed: List[Tuple[int, int]] = []  # tables spliced out
+        self._orig: Optional[Dict[str, Any]] = None
+
+    def orig(self, path: Key) -> Any:
+        """The value at ``path`` as the text has it now."""
+        if self._orig is None:
+            self._orig = tomllib.loads(self.ix.text)
+        return _get(self._orig, path)
+
+    def splice(self, start: int, end: int, text: str) -> None:
+        self.splices.append((start, end, len(self.splices), text))
+
+    def reconcile(self, path: Key, new: Any) -> None:
+        """Make the text hold ``new`` at ``path`` (``_ABSENT``: nothing)."""
+        ix = self.ix
+        if any(path[:n] in self._done for n in range(1, len(path) + 1)):
+            return
+        kv = ix.kvs.get(path)
+        if kv is not None:
+            if new is _ABSENT:
+                self.splice(kv.start, kv.end, "")
+            elif not self.by_element(path, new):
+                self.splice(kv.vstart, kv.vend, format_value(new))
+            self._done.add(path)
+            return
+        span = ix.items.get(path)
+        if span is not None and new is not _ABSENT:
+            if not self.by_element(path, new):
+                self.splice(span[0], span[1], format_value(new, nested=True))
+            self._done.add(path)
+            return
+        kv = ix.kv_above(path)
+        if kv is not None:
+            # Inside an inline value: rewrite the innermost array element
+            # holding it, or else that value
+            above = next((path[:n] for n in range(len(path) - 1, len(kv.path), -1) if path[:n] in ix.items), kv.path)
+            self.reconcile(above, _get(self.data, above))
+            return
+        if path in ix.aots:
+            count = ix.aots[path]
+            if isinstance(new, list) and new and all(isinstance(v, dict) for v in new):
+                # Element by element; extra ones go after the last
+                for i, item in enumerate(new[:count]):
+                    self.reconcile(path + (i,), item)
+                for i in range(len(new), count):
+                    self.remove_table(path + (i,))
+                if len(new) > count:
+                    self.append(_aot(path, new[count:]), under=path)
+            else:
+                self.remove_table(path)
+                if new is not _ABSENT:
+                    self.add(path, new)
+            self._done.add(path)
+            return
+        if ix.is_table(path):
+            if isinstance(new, dict):
+                old = self.orig(path)
+                if isinstance(old, dict):
+                    for k in [*old, *(k for k in new if k not in old)]:
+                        o, n = old.get(k, _ABSENT), new.get(k, _ABSENT)
+                        if o is _ABSENT or n is _ABSENT or not same(o, n):
+                            self.reconcile(path + (k,), n)
+                    return
+            self.remove_table(path)
+            if new is not _ABSENT:
+                self.add(path, new)
+            else:
+                self.keep_parent(path)
+            self._done.add(path)
+            return
+        if new is not _ABSENT:
+            self.add(path, new)
+
+    def by_element(self, path: Key, new: Any) -> bool:
+        """Reconcile an inline array element by element, or by adding or removing one.
+
+        That keeps the comments and layout between its elements. ``False``
+        if the array has to be written whole.
+        """
+        if not isinstance(new, list) or path + (0,) not in self.ix.items:
+            return False
+        old = self.orig(path)
+        if not isinstance(old, list) or abs(len(new) - len(old)) > 1:
+            return False
+        if len(new) == len(old):
+            for i, (o, n) in enumerate(zip(old, new)):
+                if not same(o, n):
+                    self.reconcile(path + (i,), n)
+            return True
+        # The first element that differs is the one added or removed
+        k = next((i for i, (o, n) in enumerate(zip(old, new)) if not same(o, n)), min(len(old), len(new)))
+        if len(new) > len(old):
+            if not all(same(o, n) for o, n in zip(old[k:], new[k + 1 :])):
+                return False
+            self.insert_item(path, k, len(old), new[k])
+        else:
+            if not all(same(o, n) for o, n in zip(old[k + 1 :], new[k:])):
+                return False
+            self.remove_item(path, k, len(old))
+        return True
+
+    def insert_item(self, path: Key, k: int, count: int, value: Any) -> None:
+        """Add ``value`` as element ``k`` of the ``count`` in the array at ``path``."""
+        ix = self.ix
+        item = format_value(value, nested=True)
+        if k < count:
+            span = ix.items[path + (k,)]
+            lines = ix.own_line(span)
+            if lines is not None:
+                self.splice(lines[0], lines[0], f"{ix.text[lines[0] : span[0]]}{item},\n")
+            else:
+                self.splice(span[0], span[0], f"{item}, ")
+            return
+        span = ix.items[path + (k - 1,)]
+        lines = ix.own_line(span)
+        if lines is None:
+            self.splice(span[1], span[1], f", {item}")
+            return
+        if not ix.text.startswith(",", ix._skip(span[1])):
+            self.splice(span[1], span[1], ",")
+        self.splice(lines[1], lines[1], f"{ix.text[lines[0] : span[0]]}{item},\n")
+
+    def remove_item(self, path: Key, k: int, count: int) -> None:
+        """Remove element ``k`` of the ``count`` in the array at ``path``."""
+        ix = self.ix
+        span = ix.items[path + (k,)]
+        lines = ix.own_line(span)
+        if lines is not None:
+            self.splice(lines[0], lines[1], "")
+        elif k + 1 < count:
+            self.splice(span[0], ix.items[path + (k + 1,)][0], "")
+        elif k > 0:
+            self.splice(ix.items[path + (k - 1,)][1], span[1], "")
+        else:
+            end = ix._skip(span[1])
+            self.splice(span[0], end + 1 if ix.text.startswith(",", end) else span[1], "")
+
+    def remove_table(self, path: Key) -> None:
+        """Splice out every header and line under ``path``."""
+        ix = self.ix
+        n = len(path)
+        gone = [b for b in ix.blocks.values() if b.path[:n] == path]
+        for b in gone:
+            self.splice(b.start, ix.cut(b), "")
+            self._removed.append((b.start, ix.cut(b)))
+        dropped = {b.path for b in gone}
+        for kv in ix.kvs.values():
+            if kv.path[:n] == path and kv.block not in dropped:
+                self.splice(kv.start, kv.end, "")
+
+    def keep_parent(self, path: Key) -> None:
+        """Give an emptied table that had no header of its own one (``[a.b]``)."""
+        parent = path[:-1]
+        ix = self.ix
+        if (
+            parent
+            and not ix.root
+            and parent not in ix.blocks
+            and parent not in ix.dotted
+            and not any(isinstance(k, int) for k in parent)
+            and same(_get(self.data, parent), {})
+        ):
+            self.append(_section(parent, {}))
+
+    def add(self, path: Key, new: Any) -> None:
+        ix = self.ix
+        self._done.add(path)
+        parent, key = path[:-1], path[-1]
+        if isinstance(key, int):
+            raise SpliceError("Array elements are only spliced inside inline arrays")
+        if not parent and not ix.root:
+            raise SpliceError("A top-level key can't be added to a table's chunks")
+        nested = any(isinstance(k, int) for k in path)
+        block = ix.blocks.get(parent)
+        sections = bool(parent) and not nested and not ix.root  # may add a [table]
+        if isinstance(new, dict) and sections and (block is not None or parent in ix.prefixes):
+            self.append(_section(path, new))
+        elif block is not None:
+            self.insert_kv(block, block.last, (key,), new)
+        elif parent in ix.dotted:
+            block, rel, end = ix.dotted[parent]
+            self.insert_kv(block, end, rel + (key,), new)
+        elif parent in ix.prefixes and sections:
+            self.append(_section(parent, {key: new}))
+        elif parent and not ix.is_table(parent):
+            # A new table: write it whole, from the closest table that exists
+            self.reconcile(parent, _get(self.data, parent))
+        else:
+            raise SpliceError(f"Nowhere to add {path}")
+
+    def insert_kv(self, block: _Block, pos: int, rel: Key, value: Any) -> None:
+        text = self.ix.text
+        line = f"{block.indent}{'.'.join(format_key(k) for k in rel)} = {format_value(value)}\n"
+        if not block.path and pos == block.hend:
+            # No root keys yet: before the comments that introduce the first header
+            pos = self.ix.cut(block)
+            if pos < len(text) or self.more:
+                line += "\n"
+        if pos > 0 and text[pos - 1] != "\n":
+            line = "\n" + line
+        self.splice(pos, pos, line)
+
+    def append(self, section: str, under: Key = ()) -> None:
+        """Add ``[tables]`` after the last line of the group (or of the tables under ``under``).
+
+        Blank lines and the comments that lead into the next header stay after it.
+        """
+        ix = self.ix
+        text = ix.text
+        n = len(under)
+        # (the root block, empty in a table's group, starts where its first header does)
+        last = max((b for b in ix.blocks.values() if b.path[:n] == under), key=lambda b: (b.start, b.hend))
+        pos = ix.cut(last)
+        while pos > last.last and not text[text.rfind("\n", 0, pos - 1) + 1 : pos].strip():
+            pos = text.rfind("\n", 0, pos - 1) + 1
+        pos = max(pos, last.last)
+        for start, end in self._removed:
+            if start < pos < end:
+                pos = start
+        lead = "\n" if text[pos - 1 : pos] == "\n" else "\n\n"
+        self.splice(pos, pos, lead + section)
+
+
+def _aot(path: Key, items: List[Dict[str, Any]]) -> str:
+    """``[[path]]`` blocks for ``items``, sub-tables written inline."""
+    if any(isinstance(k, int) for k in path):
+        raise SpliceError("Can't name an array of tables inside another")
+    header = "[[" + ".".join(format_key(k) for k in path) + "]]\n"
+    parts = [header + "".join(f"{format_key(k)} = {format_value(v)}\n" for k, v in item.items()) for item in items]
+    return "\n".join(parts)
+
+
+def _get(doc: Any, path: Key) -> Any:
+    for k in path:
+        try:
+            doc = doc[k]
+        except (KeyError, IndexError, TypeError):
+            return _ABSENT
+    return doc
+
+
+def _apply(text: str, splices: List[Tuple[int, int, int, str]]) -> str:
+    """Apply non-overlapping splices in one pass."""
+    out: List[str] = []
+    pos = 0
+    for start, end, _, new in sorted(splices):
+        if start < pos:
+            raise SpliceError("Overlapping splices")
+        out.append(text[pos:start])
+        out.append(new)
+        pos = end
+    out.append(text[pos:])
+    return "".join(out)
+
+
+def _split_back(text: str, bounds: List[int], splices: List[Tuple[int, int, int, str]]) -> List[str]:
+    """Apply ``splices`` to the chunks ``text`` was joined from."""
+    per: List[List[Tuple[int, int, int, str]]] = [[] for _ in range(len(bounds) - 1)]
+    last = len(bounds) - 2
+    for start, end, seq, new in splices:
+        # An insertion at a boundary belongs to the chunk before it
+        c = 0
+        while c < last and (bounds[c + 1] < start or (bounds[c + 1] == start and end > start)):
+            c += 1
+        if end > bounds[c + 1]:
+            raise SpliceError("A splice spans two chunks")
+        per[c].append((start - bounds[c], end - bounds[c], seq, new))
+    return [_apply(text[bounds[c] : bounds[c + 1]], per[c]) for c in range(len(per))]
+
+
+def _collapse(paths: Iterable[Key]) -> List[Key]:
+    """The touched paths without those under another touched path."""
+    out: List[Key] = []
+    for p in sorted(paths, key=len):
+        if not any(p[: len(q)] == q for q in out):
+            out.append(p)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# The document
+# ---------------------------------------------------------------------------
+
+
+class SourceText:
+    """A TOML file's text, kept in step with edits by splicing.
+
+    Call :meth:`touch` with every op applied to the document and
+    :meth:`render` with the document to get the text. ``render`` only reads
+    and re-parses the chunks of touched top-level keys.
+    """
+
+    def __init__(
+        self, text: Optional[str] = None, load: Optional[Callable[[], str]] = None, newline: Optional[str] = None
+    ) -> None:
+        self._text = text
+        self._load = load
+        self._chunks: Optional[List[Tuple[str, str]]] = None  # (top key, text), in file order
+        self._roots: Set[str] = set()  # top-level keys written before the first header
+        self._headed: Set[str] = set()  # top-level keys written as [tables]
+        self._touched: Set[Key] = set()
+        self._whole = False
+        # Known once the text is read, unless given (for text with no lines)
+        self._crlf: Optional[bool] = None if newline is None else newline == "\r\n"
+
+    @classmethod
+    def from_file(cls, path: Path, sha: str) -> "SourceText":
+        """Read ``path`` on first use; it must still hash to ``sha``."""
+
+        def load() -> str:
+            try:
+                raw = path.read_bytes()
+                if digest(raw) == sha:
+                    return raw.decode("utf-8")
+            except (OSError, UnicodeDecodeError) as exc:
+                raise SpliceError(f"Can't read {path.name}: {exc}") from exc
+            raise SpliceError(f"{path.name} changed since it was loaded")
+
+        return cls(load=load)
+
+    def touch(self, ops: Iterable[Op]) -> None:
+        """Note the paths ``ops`` changed."""
+        for op in ops:
+            path = tuple(op.get("path") or ())
+            if not path:
+                self._whole = True
+            elif op.get("op") in ("add", "remove") and isinstance(path[-1], int):
+                # Elements shift: the whole array changed
+                self._touched.add(path[:-1])
+            else:
+                self._touched.add(path)
+
+    def _ensure_text(self) -> str:
+        text = self._text if self._text is not None else self._load() if self._load else ""
+        if self._crlf is None:
+            # Only if every line ends in CRLF: mixed endings are kept as they are
+            self._crlf = "\r\n" in text and text.count("\n") == text.count("\r\n")
+        if self._crlf:
+            text = text.replace("\r\n", "\n")
+        self._text = text
+        return text
+
+    @property
+    def newline(self) -> str:
+        """The text's line ending: ``"\r\n"`` if every line has one, else ``"\n"``."""
+        if self._crlf is None:
+            try:
+                self._ensure_text()
+            except SpliceError:
+                return "\n"
+        return "\r\n" if self._crlf else "\n"
+
+    def with_newlines(self, text: str) -> str:
+        """``text``, written with LF line endings, in this text's line endings."""
+        return text.replace("\n", "\r\n") if self.newline == "\r\n" else text
+
+    def _ensure_chunks(self) -> List[Tuple[str, str]]:
+        if self._chunks is None:
+            text = self._ensure_text()
+            try:
+                chunks = split_chunks(text)
+            except ValueError as exc:
+                raise SpliceError(str(exc)) from exc
+            root = chunks[0][1]
+            self._roots = {p[0] for p in _Index(root, [0, len(root)], True).kvs}
+            self._headed = {k for k, _ in chunks[1:]}
+            self._chunks = chunks
+            self._text = None
+        return self._chunks
+
+    def _route(self, data: Dict[str, Any]) -> Tuple[Dict[str, List[Tuple[Key, Any]]], Dict[str, Any]]:
+        """Sort the touched paths into the groups that must change, and new tables."""
+        work: Dict[str, List[Tuple[Key, Any]]] = {}
+        new_tables: Dict[str, Any] = {}
+        for path in _collapse(self._touched):
+            top = path[0]
+            where = top if top in self._headed else ROOT if top in self._roots else None
+            if len(path) > 1 and where is not None:
+                work.setdefault(where, []).append((path, _get(data, path)))
+                continue
+            # A whole top-level key: it may move between the root and its own tables
+            new = data.get(top, _ABSENT)
+            tabular = isinstance(new, dict) or (
+                where == top and isinstance(new, list) and bool(new) and all(isinstance(v, dict) for v in new)
+            )
+            want = None if new is _ABSENT else top if tabular and where != ROOT else ROOT
+            if where is not None and where != want:
+                work.setdefault(where, []).append(((top,), _ABSENT))
+            if want == ROOT or (want is not None and want == where):
+                work.setdefault(want, []).append(((top,), new))
+            elif want is not None:
+                new_tables[top] = new
+        return work, new_tables
+
+    def render(self, data: Dict[str, Any]) -> str:
+        """The text with every touched path brought in line with ``data``.
+
+        Raises :class:`SpliceError` if that isn't possible; the text is then
+        left as it was.
+        """
+        if self._whole:
+            raise SpliceError("The whole document was replaced")
+        try:
+            chunks = self._ensure_chunks()
+            if not self._touched:
+                return self.with_newlines("".join(t for _, t in chunks))
+            if self._roots & self._headed:
+                raise SpliceError("A top-level table is split between root keys and headers")
+            return self.with_newlines(self._splice(chunks, data))
+        except (ValueError, LookupError, TypeError) as exc:
+            # TOMLDecodeError included: a chunk that doesn't parse on its own
+            raise SpliceError(f"{type(exc).__name__}: {exc}") from exc
+
+    def _splice(self, chunks: List[Tuple[str, str]], data: Dict[str, Any]) -> str:
+        work, new_tables = self._route(data)
+        updated: Dict[int, str] = {}
+        roots, headed = set(self._roots), set(self._headed)
+        for group, changes in work.items():
+            idx = [0] if group == ROOT else [i for i, (k, _) in enumerate(chunks) if k == group and i]
+            bounds = [0]
+            for i in idx:
+                bounds.append(bounds[-1] + len(chunks[i][1]))
+            text = "".join(chunks[i][1] for i in idx)
+            splicer = _Splicer(_Index(text, bounds, group == ROOT), data, len(chunks) > 1)
+            for path, new in changes:
+                splicer.reconcile(path, new)
+            pieces = _split_back(text, bounds, splicer.splices)
+            updated.update(zip(idx, pieces))
+            # The group alone must parse to exactly what data holds for it
+            try:
+                parsed = tomllib.loads("".join(pieces))
+            except tomllib.TOMLDecodeError as exc:
+                raise SpliceError(f"Spliced text doesn't parse: {exc}") from exc
+            if group == ROOT:
+                roots = set(parsed)
+                expected = {k: data[k] for k in parsed if k in data}
+            else:
+                if not parsed:
+                    headed.discard(group)  # only comments are left
+                expected = {group: data[group]} if parsed and group in data else {}
+            if not same(parsed, expected):
+                raise SpliceError(f"Spliced text doesn't match the data for {group or 'the root'}")
+        if roots & headed or roots | headed | set(new_tables) != set(data):
+            raise SpliceError("Top-level keys don't match")
+
+        out: List[Tuple[str, str]] = []
+        for i, (key, text) in enumerate(chunks):
+            if i not in updated:
+                out.append((key, text))
+                continue
+            # Added sections become chunks of their own; what's left of a
+            # removed one (blank lines, comments) joins the chunk before it
+            parts = split_chunks(updated[i])
+            if i == 0:
+                out.append((key, parts[0][1]))
+            elif parts[0][1]:
+                out[-1] = (out[-1][0], out[-1][1] + parts[0][1])
+            out.extend(parts[1:])
+        for key, value in new_tables.items():
+            section = _section((key,), value)
+            if not same(tomllib.loads(section), {key: value}):
+                raise SpliceError(f"Can't write [{key}] as a table")
+            tail = out[-1][1]
+            lead = "" if not tail or tail.endswith("\n\n") else "\n" if tail.endswith("\n") else "\n\n"
+            out[-1] = (out[-1][0], tail + lead)
+            out.extend(split_chunks(section)[1:])
+            headed.add(key)
+        self._chunks, self._roots, self._headed = out, roots, headed
+        self._touched.clear()
+        return "".join(t for _, t in out)
@@ -0,0 +1,96 @@
+"""marimo-toml-editor — opt-in timing and payload counters."""
+
+from __future__ import annotations
+
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+
+def summarize(samples: List[float], count: int, total: float) -> Dict[str, float]:
+    """Summary of timing samples in ms, as the frontend reports it too."""
+    s = sorted(samples)
+
+    def q(p: float) -> float:
+        return s[min(len(s) - 1, int(p * len(s)))]
+
+    return {
+        "count": count,
+        "mean_ms": round(total / count, 3),
+        "p50_ms": round(q(0.5), 3),
+        "p95_ms": round(q(0.95), 3),
+        "max_ms": round(s[-1], 3),
+        "last_ms": round(samples[-1], 3),
+    }
+
+
+class Timings:
+    """Per-key timings: a count and total, plus the last ``keep`` samples for percentiles."""
+
+    def __init__(self, keep: int = 256) -> None:
+        self.keep = keep
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._totals: Dict[str, float] = {}
+
+    def add(self, key: str, ms: float) -> None:
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.keep)
+        samples.append(ms)
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self._totals[key] = self._totals.get(key, 0.0) + ms
+
+    @contextmanager
+    def time(self, key: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(key, (time.perf_counter() - t0) * 1000)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {k: summarize(list(s), self._counts[k], self._totals[k]) for k, s in sorted(self._samples.items())}
+
+
+class Traffic:
+    """Messages and bytes crossing the comm in one direction, by trait."""
+
+    def __init__(self) -> None:
+        self.messages = 0
+        self.bytes = 0
+        self.by_trait: Dict[str, int] = {}
+
+    def add(self, msg: Dict[str, Any], buffers: Optional[List[Any]] = None) -> None:
+        # What the kernel puts on the wire is JSON plus raw buffers
+        sizes = [memoryview(b).nbytes for b in buffers or ()]
+        if msg.get("method") == "update":
+            parts = {k: len(json.dumps(v, default=str)) for k, v in (msg.get("state") or {}).items()}
+        else:
+            parts = {msg.get("method") or "other": len(json.dumps(msg.get("content"), default=str))}
+        # A buffer counts towards the trait it was cut from (wire="binary")
+        paths = msg.get("buffer_paths") or []
+        for i, n in enumerate(sizes):
+            key = str(paths[i][0]) if i < len(paths) and paths[i] else "buffers"
+            parts[key] = parts.get(key, 0) + n
+        self.messages += 1
+        self.bytes += sum(parts.values())
+        for k, n in parts.items():
+            self.by_trait[k] = self.by_trait.get(k, 0) + n
+
+    def snapshot(self) -> Dict[str, Any]:
+        by_trait = dict(sorted(self.by_trait.items(), key=lambda kv: -kv[1]))
+        return {"messages": self.messages, "bytes": self.bytes, "by_trait": by_trait}
+
+
+class Stats:
+    """Everything one editor records while instrumented."""
+
+    def __init__(self) -> None:
+        self.timings = Timings()
+        self.sent = Traffic()
+        self.received = Traffic()
+        # Last report from the frontend (render timings, round trips, its history)
+        self.frontend: Dict[str, Any] = {}
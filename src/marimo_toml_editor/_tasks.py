@@ -0,0 +1,70 @@
+"""marimo-toml-editor — background execution of file commands."""
+
+from __future__ import annotations
+
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Optional
+
+
+class SerialRunner:
+    """Run jobs one at a time, in order, on a single worker thread.
+
+    Jobs are submitted under a key. Submitting the key of the last queued
+    (not yet started) job replaces that job instead of adding another, so a
+    burst of saves while one is running results in a single extra write.
+    A key queued further up moves to the end with its new job, so jobs never
+    run before ones submitted ahead of them.
+    """
+
+    def __init__(self, name: str = "toml-editor") -> None:
+        self._name = name
+        self._lock = threading.Lock()
+        self._queued: Dict[str, Callable[[], None]] = {}
+        self._order: Deque[str] = deque()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, key: str, job: Callable[[], None]) -> bool:
+        """Queue ``job``; returns ``False`` if it replaced a queued job."""
+        with self._lock:
+            coalesced = key in self._queued
+            self._queued[key] = job
+            if coalesced and self._order[-1] != key:
+                # save, load, save: the second save runs after the load
+                self._order.remove(key)
+                self._order.append(key)
+            elif not coalesced:
+                self._order.append(key)
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self._name)
+                self._executor.submit(self._run_next)
+        return not coalesced
+
+    def _run_next(self) -> None:
+        with self._lock:
+            key = self._order.popleft()
+            job = self._queued.pop(key)
+        try:
+            job()
+        except Exception:  # noqa: BLE001
+            # Jobs report their own errors through status; don't lose the rest.
+            traceback.print_exc()
+
+    def wait(self) -> None:
+        """Block until every job submitted so far has finished."""
+        with self._lock:
+            executor = self._executor
+        if executor is not None:
+            executor.submit(lambda: None).result()
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop the worker thread once the queued jobs have run; ``wait`` blocks until then.
+
+        A later :meth:`submit` starts a new one.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,240 @@
+"""marimo-toml-editor — watching a loaded file for outside changes.
+
+:class:`FileWatcher` calls back when a file is rewritten, using inotify on
+Linux (through ctypes, watching the directory so atomic renames are seen)
+and polling mtime/size elsewhere. :func:`split_tables` and
+:func:`parse_changed` let a reload re-parse only the top-level tables whose
+text changed.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import select
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import tomllib  # py3.11+
+except ImportError:  # pragma: no cover
+    import tomli as tomllib  # type: ignore[no-redef]
+
+# ---------------------------------------------------------------------------
+# Splitting a document into top-level tables
+# ---------------------------------------------------------------------------
+
+# A line that looks like a [table] or [[array]] header. Lines inside
+# multi-line strings or arrays can match too; the chunk before them then
+# fails to parse and the caller falls back to a full parse.
+_HEADER = re.compile(r"^[ \t]*\[\[?[^\[\]\n]+\]\]?[ \t]*(?:#[^\n]*)?\r?$", re.MULTILINE)
+
+ROOT = ""  # group key of the text before the first header
+
+
+def split_chunks(text: str) -> List[Tuple[str, str]]:
+    """Cut a TOML document at every header, in order.
+
+    Returns ``[(top_key, text), ...]`` whose texts join back into ``text``:
+    first ``(ROOT, lines before the first header)``, then one chunk per
+    header, tagged with the top-level key it defines. Raises ``ValueError``
+    if a header can't be read.
+    """
+    chunks: List[Tuple[str, str]] = []
+    tops: Dict[str, str] = {}  # header line → top-level key
+    pos = 0
+    key = ROOT
+    for m in _HEADER.finditer(text):
+        chunks.append((key, text[pos : m.start()]))
+        line = m.group(0).strip()
+        key = tops.get(line)
+        if key is None:
+            try:
+                # Let tomllib read quoted and dotted keys
+                key = next(iter(tomllib.loads(line)))
+            except (tomllib.TOMLDecodeError, StopIteration) as exc:
+                raise ValueError(f"Unreadable header {line!r}") from exc
+            tops[line] = key
+        pos = m.start()
+    chunks.append((key, text[pos:]))
+    return chunks
+
+
+def split_tables(text: str) -> Dict[str, str]:
+    """Group the text of a TOML document by the top-level key each part defines.
+
+    Returns ``{top_key: text}``; ``ROOT`` holds the key/value lines before the
+    first header. Parsing each group on its own yields that key's value.
+    Raises ``ValueError`` if a header can't be read.
+    """
+    groups: Dict[str, List[str]] = {}
+    for key, chunk in split_chunks(text):
+        groups.setdefault(key, []).append(chunk)
+    return {k: "".join(parts) for k, parts in groups.items()}
+
+
+def parse_changed(
+    old_groups: Dict[str, str], text: str
+) -> Optional[Tuple[Dict[str, str], Dict[str, Any], List[str]]]:
+    """Parse only the groups of ``text`` that differ from ``old_groups``.
+
+    Returns ``(groups, values, removed)``: the new groups, the parsed value
+    of every changed top-level key (root keys included) and the top-level
+    keys that disappeared. Returns ``None`` when the text can't be split
+    safely; the caller should parse the whole document instead.
+    """
+    try:
+        groups = split_tables(text)
+    except ValueError:
+        return None
+    values: Dict[str, Any] = {}
+    removed: List[str] = []
+    try:
+        root = tomllib.loads(groups.get(ROOT, ""))
+        old_root = tomllib.loads(old_groups.get(ROOT, "")) if ROOT in old_groups else {}
+        for name, text_ in groups.items():
+            if name == ROOT or old_groups.get(name) == text_:
+                continue
+            values.update(tomllib.loads(text_))
+    except tomllib.TOMLDecodeError:
+        return None
+    # Root dotted keys (a.b = 1) may extend a table defined under a header
+    if set(root) & (set(groups) - {ROOT}) or set(old_root) & (set(old_groups) - {ROOT}):
+        return None
+    if groups.get(ROOT) != old_groups.get(ROOT):
+        values.update(root)
+    # A key can move between the root lines and a header of its own
+    removed.extend(k for k in old_root if k not in root and k not in groups)
+    removed.extend(k for k in old_groups if k != ROOT and k not in groups and k not in root)
+    return groups, values, removed
+
+
+# ---------------------------------------------------------------------------
+# Watching
+# ---------------------------------------------------------------------------
+
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+# Whole writes only (not IN_MODIFY), so a half-written file isn't read
+_IN_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT = struct.Struct("iIII")
+
+
+def _inotify() -> Optional[Any]:
+    if not sys.platform.startswith("linux"):
+        return None
+    # Only when watching is turned on: ctypes isn't free to import
+    import ctypes
+    import ctypes.util
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class FileWatcher:
+    """Call ``callback()`` from a daemon thread whenever ``path`` changes.
+
+    Bursts of events (an editor's write + rename) are settled for
+    ``debounce`` seconds before calling back once. Without inotify, the
+    file's mtime, size and inode are polled every ``interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        callback: Callable[[], None],
+        interval: float = 0.5,
+        debounce: float = 0.05,
+    ) -> None:
+        self.path = Path(os.path.realpath(path))
+        self.callback = callback
+        self.interval = interval
+        self.debounce = debounce
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.backend = ""
+
+    def start(self) -> "FileWatcher":
+        fd = self._open_inotify()
+        target = self._run_inotify if fd is not None else self._run_poll
+        self.backend = "inotify" if fd is not None else "poll"
+        self._thread = threading.Thread(
+            target=target, args=(fd,) if fd is not None else (), name=f"watch:{self.path.name}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+
+    def _open_inotify(self) -> Optional[int]:
+        libc = _inotify()
+        if libc is None:
+            return None
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(self.path.parent), _IN_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _run_inotify(self, fd: int) -> None:
+        name = os.fsencode(self.path.name)
+        try:
+            while not self._stop.is_set():
+                if not select.select([fd], [], [], self.interval)[0]:
+                    continue
+                if not self._drain(fd, name):
+                    continue
+                # Let the rest of the burst arrive before calling back
+                while select.select([fd], [], [], self.debounce)[0]:
+                    self._drain(fd, name)
+                if not self._stop.is_set():
+                    self.callback()
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _drain(fd: int, name: bytes) -> bool:
+        """Read pending events; True if any concerned the watched file."""
+        try:
+            buf = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        hit = False
+        i = 0
+        while i + _EVENT.size <= len(buf):
+            _wd, _mask, _cookie, length = _EVENT.unpack_from(buf, i)
+            raw = buf[i + _EVENT.size : i + _EVENT.size + length].rstrip(b"\0")
+            hit = hit or raw == name
+            i += _EVENT.size + length
+        return hit
+
+    def _signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _run_poll(self) -> None:
+        last = self._signature()
+        while not self._stop.wait(self.interval):
+            sig = self._signature()
+            if sig != last:
+                last = sig
+                self.callback()
@@ -2,177 +2,1194 @@
 
 from __future__ import annotations
 
+import copy
 import io
+import threading
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple
 
 import anywidget
 import traitlets
 
+from marimo_toml_editor._cache import shared_cache
+from marimo_toml_editor._core import Path_, get_path, normalize_ops, split_path, validate
+from marimo_toml_editor._fileio import Stamp, digest, stamp_of, write_if_changed
+from marimo_toml_editor._history import EditHistory
+from marimo_toml_editor._layers import Journal, LayerStack
+from marimo_toml_editor._patch import Op, apply_ops, diff_ops
+from marimo_toml_editor._select import PathView, Selections
+from marimo_toml_editor._serialize import IncrementalDumper, toml_dumps, writer
+from marimo_toml_editor._source import SourceText, SpliceError
+from marimo_toml_editor._stats import Stats
+from marimo_toml_editor._tasks import SerialRunner
+from marimo_toml_editor._watch import FileWatcher, parse_changed, split_tables
+from marimo_toml_editor._wire import decode, encode, is_frame
+
 try:
     import tomllib  # py3.11+
 except ImportError:  # pragma: no cover
     import tomli as tomllib  # type: ignore[no-redef]
 
-try:
-    import tomli_w
-except ImportError:  # pragma: no cover
-    tomli_w = None  # type: ignore[assignment]
-
 _STATIC = Path(__file__).parent / "static"
 
 
+def _table_entry(table: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "table", "size": len(table)}
+
+
+def _table_index(data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Skeleton entries for every top-level table in ``data``."""
+    return {k: _table_entry(v) for k, v in data.items() if isinstance(v, dict)}
+
+
+def _frontend_data(data: Dict[str, Any], widget: "TomlConfigEditor") -> Dict[str, Any]:
+    """What the frontend gets for ``data``: tables still in ``table_index`` are empty."""
+    pending = getattr(widget, "table_index", None)
+    if not pending:
+        return data
+    return {k: ({} if k in pending else v) for k, v in data.items()}
+
+
+def _binary(widget: "TomlConfigEditor") -> bool:
+    return getattr(widget, "wire", "json") == "binary"
+
+
+def _wire_to_json(value: Any, widget: "TomlConfigEditor") -> Any:
+    """``value`` as a MessagePack frame when wire="binary" (see _wire.py)."""
+    if not value or not _binary(widget):
+        return value
+    return encode(value, widget.compress_bytes)
+
+
+def _data_to_json(data: Dict[str, Any], widget: "TomlConfigEditor") -> Any:
+    return _wire_to_json(_frontend_data(data, widget), widget)
+
+
 class TomlConfigEditor(anywidget.AnyWidget):
     """Interactive TOML config editor widget for Jupyter and marimo notebooks."""
 
     # ---- Synced state (Python → JS)
-    data: Dict[str, Any] = traitlets.Dict(default_value={}).tag(sync=True)  # type: ignore[assignment]
+    data: Dict[str, Any] = traitlets.Dict(default_value={}).tag(sync=True, to_json=_data_to_json)  # type: ignore[assignment]
     name: str = traitlets.Unicode(default_value="config").tag(sync=True)  # type: ignore[assignment]
     status: str = traitlets.Unicode(default_value="").tag(sync=True)  # type: ignore[assignment]
-    # toml_text: kept in sync so JS can offer it as a file download
-    toml_text: str = traitlets.Unicode(default_value="").tag(sync=True)  # type: ignore[assignment]
+    # toml_text: rendered TOML for the Raw tab and downloads. How eagerly it is
+    # regenerated is set by text_sync:
+    #   "eager" — after every change (re-serializes the whole document)
+    #   "lazy"  — only when the frontend asks for it; "" means stale
+    #   "off"   — never; the frontend falls back to its own serializer
+    toml_text: str = traitlets.Unicode(default_value="").tag(sync=True, to_json=_wire_to_json)  # type: ignore[assignment]
+    text_sync: str = traitlets.Enum(("eager", "lazy", "off"), default_value="lazy").tag(sync=True)  # type: ignore[assignment]
+
+    # ---- Delta channel (see _patch.py)
+    # data_version counts applied patches; data_patch carries Python → JS ops.
+    # JS → Python ops arrive through the "patch" command.
+    data_version: int = traitlets.Int(default_value=0).tag(sync=True)  # type: ignore[assignment]
+    data_patch: Dict[str, Any] = traitlets.Dict(default_value={}).tag(sync=True, to_json=_wire_to_json)  # type: ignore[assignment]
+
+    # ---- wire: how data, data_patch and toml_text (and requests and their
+    # replies) travel. "json" is plain JSON; "binary" sends MessagePack in binary
+    # buffers, with typed arrays for numeric lists, deflating frames of
+    # compress_bytes or more (0: never) when that makes them smaller.
+    wire: str = traitlets.Enum(("json", "binary"), default_value="json").tag(sync=True)  # type: ignore[assignment]
+    compress_bytes: int = traitlets.Int(default_value=64 * 1024)  # type: ignore[assignment]
+
+    # ---- Lazy tables: top-level tables whose bodies the frontend doesn't
+    # hold, as {key: {"type": "table", "size": number of keys}}. It sees them
+    # as empty tables, asks for the bodies ("load_tables") when their tab
+    # opens, and hands them back ("evict_tables") once it has kept too many.
+    # hydration picks when this applies:
+    #   "auto" — progressive loads of large files (see load())
+    #   "lazy" — every document, however it was set
+    #   "full" — never; the frontend always holds the whole document
+    table_index: Dict[str, Dict[str, Any]] = traitlets.Dict(default_value={}).tag(sync=True)  # type: ignore[assignment]
+    hydration: str = traitlets.Enum(("auto", "lazy", "full"), default_value="auto").tag(sync=True)  # type: ignore[assignment]
 
-    # ---- Command channel (JS → Python)
-    command: str = traitlets.Unicode(default_value="").tag(sync=True)  # type: ignore[assignment]
-    command_payload: Dict[str, Any] = traitlets.Dict(default_value={}).tag(sync=True)  # type: ignore[assignment]
-    command_nonce: int = traitlets.Int(default_value=0).tag(sync=True)  # type: ignore[assignment]
+    # ---- Undo/redo: history_limit caps the entries kept on both sides;
+    # can_undo/can_redo reflect the Python history (which survives reloads).
+    history_limit: int = traitlets.Int(default_value=100).tag(sync=True)  # type: ignore[assignment]
+    can_undo: bool = traitlets.Bool(default_value=False).tag(sync=True)  # type: ignore[assignment]
+    can_redo: bool = traitlets.Bool(default_value=False).tag(sync=True)  # type: ignore[assignment]
+
+    # ---- background: run file I/O, parsing and serialization for frontend
+    # commands on a worker thread, so a slow disk or a huge file doesn't
+    # block the kernel. Queued saves (and loads) coalesce into one.
+    background: bool = traitlets.Bool(default_value=False)  # type: ignore[assignment]
+    # fsync: flush saves (and the rename that publishes them) to disk before
+    # reporting "Saved". Saves are atomic either way.
+    fsync: bool = traitlets.Bool(default_value=False)  # type: ignore[assignment]
+    # preserve_format: save (and render toml_text) by splicing edits into the
+    # text data was loaded from, so comments and layout survive. Only the
+    # top-level tables that were edited are re-read; anything that can't be
+    # spliced falls back to a full tomli-w render. Not in layered mode.
+    preserve_format: bool = traitlets.Bool(default_value=True)  # type: ignore[assignment]
+
+    # ---- watch: reload the loaded file when something else rewrites it.
+    # Only the top-level tables whose text changed are re-parsed, and they
+    # reach the frontend as ops, so the open tab, scroll position and undo
+    # history stay put. With unsaved edits nothing is applied; conflict is
+    # set to {"path": file name, "tables": [changed keys]} and the frontend
+    # answers with "resolve_conflict".
+    watch: bool = traitlets.Bool(default_value=False)  # type: ignore[assignment]
+    conflict: Dict[str, Any] = traitlets.Dict(default_value={}).tag(sync=True)  # type: ignore[assignment]
+
+    # ---- Layered mode (see load_layers()): data is the merge of several
+    # files, lowest precedence first. provenance maps the dotted path of
+    # every value not from layers[0] to the index of its layer; edits are
+    # written to layers[write_layer] (-1: the last one).
+    layers: List[str] = traitlets.List(traitlets.Unicode(), default_value=[]).tag(sync=True)  # type: ignore[assignment]
+    write_layer: int = traitlets.Int(default_value=-1).tag(sync=True)  # type: ignore[assignment]
+    provenance: Dict[str, int] = traitlets.Dict(default_value={}).tag(sync=True)  # type: ignore[assignment]
+
+    # ---- instrument: time commands, background jobs, serialization and
+    # writes, count the bytes synced each way, and collect the frontend's
+    # render timings and patch round trips; read them with stats().
+    #   "off"     — nothing is measured (default)
+    #   "on"      — measured; the frontend reports about once a second
+    #   "overlay" — also shown in a corner of the widget
+    instrument: str = traitlets.Enum(("off", "on", "overlay"), default_value="off").tag(sync=True)  # type: ignore[assignment]
+
+    # ---- publish: when the widget's value changes for marimo, which re-runs
+    # the cells reading it each time the frontend saves model changes.
+    # Edits reach Python as requests (see _on_request), which don't; the
+    # frontend bumps published to publish them:
+    #   "live"     — after every edit (default)
+    #   "deferred" — only on Apply, when focus leaves the widget, or
+    #                publish_delay seconds after the last edit (0: no timer)
+    # data and the delta channel stay in step either way; observe published
+    # to react to publications from Python.
+    publish: str = traitlets.Enum(("live", "deferred"), default_value="live").tag(sync=True)  # type: ignore[assignment]
+    publish_delay: float = traitlets.Float(default_value=0.0).tag(sync=True)  # type: ignore[assignment]
+    published: int = traitlets.Int(default_value=0).tag(sync=True)  # type: ignore[assignment]
 
     # ---- Frontend assets
     _esm = _STATIC / "widget.js"
     _css = _STATIC / "widget.css"
 
-    def __init__(self, path: str = "", name: str = "config", **kwargs: Any) -> None:
-        super().__init__(**kwargs)
+    # Files at least this large load progressively (see load()).
+    progressive_load_bytes = 4 * 1024 * 1024
+    # Parsed files shared by every editor in the process (see _cache.py)
+    parse_cache = shared_cache
+
+    def __init__(
+        self,
+        path: str = "",
+        name: str = "config",
+        text_sync: str = "lazy",
+        history_limit: int = 100,
+        hydration: str = "auto",
+        background: bool = False,
+        fsync: bool = False,
+        watch: bool = False,
+        layers: Optional[List[str]] = None,
+        instrument: str = "off",
+        wire: str = "json",
+        compress_bytes: int = 64 * 1024,
+        publish: str = "live",
+        publish_delay: float = 0.0,
+        **kwargs: Any,
+    ) -> None:
+        self._epoch = 0
+        # Counters while instrumented (see _stats.py); None when off
+        self._stats: Optional[Stats] = None
+        # Guards data and the delta channel against the background worker
+        self._lock = threading.RLock()
+        self._runner = SerialRunner()
+        # Stamps of files as last read or written, to skip no-op saves
+        self._stamps: Dict[str, Stamp] = {}
+        # Set by _set_document() for the next data assignment; None defers to hydration
+        self._deferred_index: Optional[Dict[str, Dict[str, Any]]] = None
+        # Watching: the loaded file, its text split by top-level table (the
+        # baseline for partial re-parses) and whether data has drifted from it
+        self._path: Optional[Path] = None
+        self._groups: Optional[Dict[str, str]] = None
+        self._unsaved = False
+        self._watcher: Optional[FileWatcher] = None
+        # Digest of a save to the watched file in progress, so its own
+        # change event isn't taken for someone else's
+        self._writing: Optional[str] = None
+        self._stack: Optional[LayerStack] = None
+        # History version → (layer, what the edit changed in it), for undo
+        self._layer_edits: Dict[int, Tuple[int, Journal]] = {}
+        self._history = EditHistory(limit=history_limit)
+        # tomli-w is imported by the first render or save (see _serialize.py)
+        self._dumper = IncrementalDumper(toml_dumps)
+        # The text data was loaded from, for format-preserving saves
+        self._source: Optional[SourceText] = None
+        # Views handed out by select()
+        self._selections = Selections()
+        super().__init__(
+            text_sync=text_sync,
+            history_limit=history_limit,
+            hydration=hydration,
+            background=background,
+            fsync=fsync,
+            watch=watch,
+            instrument=instrument,
+            wire=wire,
+            compress_bytes=compress_bytes,
+            publish=publish,
+            publish_delay=publish_delay,
+            **kwargs,
+        )
+        self.on_msg(self._on_custom_msg)
         self.name = name
         self.status = "Ready."
         self.data = {}
-        if path:
+        if layers:
+            self.load_layers(layers)
+        elif path:
             self.load(str(Path(path).expanduser()))
 
     # ------------------------------------------------------------------
     # Keep toml_text in sync whenever data changes
     # ------------------------------------------------------------------
 
+    @traitlets.validate("data")
+    def _validate_data(self, proposal: Dict[str, Any]) -> Dict[str, Any]:
+        # Runs before data is serialized for the frontend, which must already
+        # know which tables it gets as stand-ins.
+        index = self._deferred_index
+        if index is None:
+            index = _table_index(proposal["value"]) if self.hydration == "lazy" else {}
+        self.table_index = index
+        self._deferred_index = None
+        return proposal["value"]
+
+    @traitlets.observe("hydration")
+    def _on_hydration_change(self, change: Dict[str, Any]) -> None:
+        if change["new"] == "full" and self.table_index:
+            self._send_tables(list(self.table_index))
+
     @traitlets.observe("data")
     def _on_data_change(self, change: Dict[str, Any]) -> None:  # noqa: ARG002
-        self._sync_toml_text()
+        # A whole new document was assigned: start a new epoch so that any
+        # in-flight frontend patches based on the old one are rejected.
+        with self._lock:
+            self._reset_frontend(ops=[])
+            self._note_change()
+            self._history.clear()
+            self._sync_history_flags()
+            self._unsaved = True
+            # Not a merge of the layers any more (load_layers() sets them up again)
+            self._stack = None
+            self._layer_edits = {}
+            self.layers = []
+            self.provenance = {}
 
-    def _sync_toml_text(self) -> None:
-        if tomli_w is None:
+    @traitlets.observe("history_limit")
+    def _on_history_limit_change(self, change: Dict[str, Any]) -> None:
+        self._history.limit = change["new"]
+
+    def _note_change(self, ops: Optional[List[Op]] = None) -> None:
+        """Bookkeeping after ``data`` was edited by ``ops`` (or replaced, for ``None``)."""
+        self._invalidate_toml_text(ops)
+        self._selections.notify(self.data, ops)
+
+    def _invalidate_toml_text(self, ops: Optional[List[Op]] = None) -> None:
+        """Mark toml_text stale after ``ops`` (or a whole new document)."""
+        if ops is None:
+            self._dumper.invalidate()
+            self._source = None
+        else:
+            self._dumper.invalidate_ops(ops)
+            if self._source is not None:
+                self._source.touch(ops)
+        if self.text_sync == "eager":
+            self._sync_toml_text()
+        else:
+            # Cheap: only the first change after a render actually syncs.
             self.toml_text = ""
-            return
+
+    def _text_for_save(self, payload: Dict[str, Any]) -> Optional[str]:
+        """The text a frontend save writes; ``None``, with ``status`` set, if there is none."""
+        # Python's copy of data is authoritative and toml_text may be stale
+        # (lazy mode), so serialize here; the JS text is only a fallback, and
+        # not while tables are stand-ins: it would write them empty.
+        try:
+            return self._document_text()
+        except Exception as exc:  # noqa: BLE001
+            content = payload.get("content")
+            if content is not None and not self.table_index:
+                return str(content)
+            if writer() is None:
+                self.status = "Install tomli-w to enable saving (pip install tomli-w)."
+            else:
+                self.status = f"Error saving: {exc}"
+            return None
+
+    def _sync_toml_text(self) -> None:
         try:
-            self.toml_text = tomli_w.dumps(self.data)
+            # Only the top-level tables invalidated since the last render are re-dumped
+            with self._timed("serialize.toml_text"):
+                self.toml_text = self._document_text()
         except Exception:  # noqa: BLE001
             self.toml_text = ""
 
+    def _document_text(self) -> str:
+        """``data`` as TOML: spliced into the loaded text if possible, else re-dumped."""
+        source = self._source
+        if source is not None:
+            try:
+                with self._timed("serialize.splice"):
+                    return source.render(self.data)
+            except SpliceError:
+                pass
+        text = self._dumper.dumps(self.data)
+        if source is not None:
+            # Later edits are spliced into this rendering instead
+            text = source.with_newlines(text)
+            self._source = SourceText(text, newline=source.newline)
+        return text
+
+    def _keep_source(self, source: Optional[SourceText]) -> None:
+        """``source`` holds exactly ``data``: splice later edits into it."""
+        self._source = source if self.preserve_format and self._stack is None else None
+        if self._source is not None and self.text_sync == "eager":
+            self._sync_toml_text()
+
+    # ------------------------------------------------------------------
+    # Delta sync
+    # ------------------------------------------------------------------
+
+    def _reset_frontend(self, ops: List[Op]) -> None:
+        self._epoch += 1
+        with self.hold_sync():
+            self.data_version += 1
+            self.data_patch = {
+                "version": self.data_version,
+                "epoch": self._epoch,
+                "reset": True,
+                "ops": ops,
+            }
+
+    def _resync(self) -> None:
+        """Resend the whole document to the frontend as a root replace."""
+        value = _frontend_data(self.data, self)
+        self._reset_frontend(ops=[{"op": "replace", "path": [], "value": value}])
+
+    def _send_patch(self, ops: List[Op], origin: str, entry: Optional[int] = None) -> None:
+        with self.hold_sync():
+            self.data_version += 1
+            self.data_patch = {
+                "version": self.data_version,
+                "epoch": self._epoch,
+                "ops": self._frontend_ops(ops),
+                "origin": origin,
+                "entry": entry,
+            }
+
+    def _push_ops(self, ops: List[Op], origin: str, entry: Optional[int] = None) -> List[Op]:
+        """Apply ops from the Python side and send them to the frontend."""
+        inverse = apply_ops(self.data, ops)
+        self._settle_index(ops)
+        self._send_patch(ops, origin, entry)
+        self._note_change(ops)
+        if origin != "external":
+            self._unsaved = True
+            self._write_through(ops, origin, entry)
+        return inverse
+
+    # ------------------------------------------------------------------
+    # Lazy tables
+    # ------------------------------------------------------------------
+
+    def _frontend_ops(self, ops: List[Op]) -> List[Op]:
+        # The frontend only has an empty stand-in for tables it hasn't
+        # fetched; it gets their current bodies when it does.
+        if not self.table_index:
+            return ops
+        return [op for op in ops if len(op.get("path") or []) < 2 or op["path"][0] not in self.table_index]
+
+    def _settle_index(self, ops: List[Op]) -> None:
+        """Drop tables that ops replaced or removed wholesale from table_index."""
+        if not self.table_index:
+            return
+        touched = {op["path"][0] for op in ops if len(op.get("path") or []) == 1}
+        if any(not op.get("path") for op in ops):
+            touched = set(self.table_index)
+        if touched & set(self.table_index):
+            self.table_index = {k: v for k, v in self.table_index.items() if k not in touched}
+
+    def _evict_tables(self, keys: List[str]) -> None:
+        """The frontend dropped these bodies; send them again when asked."""
+        index = dict(self.table_index)
+        for k in keys:
+            v = self.data.get(k)
+            if isinstance(v, dict):
+                index[k] = _table_entry(v)
+        if index != self.table_index:
+            self.table_index = index
+
+    def _send_tables(self, keys: List[str]) -> None:
+        """Send the bodies of not-yet-fetched tables to the frontend."""
+        index = dict(self.table_index)
+        ops = [
+            {"op": "replace", "path": [k], "value": self.data[k]}
+            for k in keys
+            if index.pop(k, None) is not None and k in self.data
+        ]
+        if not ops:
+            return
+        with self.hold_sync():
+            self.table_index = index
+            # Not an edit: no history entry, toml_text stays valid
+            self._send_patch(ops, origin="hydrate")
+            total = sum(isinstance(v, dict) for v in self.data.values())
+            names = ", ".join(f"[{op['path'][0]}]" for op in ops)
+            self.status = (
+                f"Loaded {names} · {total - len(index)}/{total} tables"
+                if index
+                else f"Loaded all {total} tables."
+            )
+
+    def _set_document(self, obj: Any, nbytes: int, progressive: Optional[bool]) -> None:
+        """Assign a freshly parsed document, deferring table bodies if progressive."""
+        data = obj if isinstance(obj, dict) else {}
+        if progressive is None:
+            progressive = self.hydration == "lazy" or (
+                self.hydration == "auto" and nbytes >= self.progressive_load_bytes
+            )
+        self._deferred_index = _table_index(data) if progressive else {}
+        with self.hold_sync():
+            # One message: the index and the skeleton it implies
+            self.data = data
+
+    def _on_patch(self, payload: Dict[str, Any]) -> None:
+        if payload.get("epoch") != self._epoch or payload.get("base") != self.data_version:
+            # The frontend missed a patch (or edited a stale document).
+            self._resync()
+            return
+        ops = payload.get("ops") or []
+        try:
+            inverse = apply_ops(self.data, ops)
+        except (KeyError, IndexError, TypeError, ValueError) as exc:
+            # Nothing was applied; the frontend gets the document back
+            self.status = f"Error applying edit: {exc}"
+            self._resync()
+            return
+        self._settle_index(ops)
+        self.data_version += 1
+        self._note_change(ops)
+        self._unsaved = True
+        origin, entry = payload.get("origin", "edit"), payload.get("entry")
+        self._record_history(origin, entry, ops, inverse)
+        self._write_through(ops, origin, entry)
+
+    # ------------------------------------------------------------------
+    # Layers
+    # ------------------------------------------------------------------
+
+    def _write_layer_index(self) -> int:
+        n = len(self.layers)
+        return min(max(self.write_layer % n if self.write_layer < 0 else self.write_layer, 0), n - 1)
+
+    def _write_through(self, ops: List[Op], origin: str, entry: Optional[int] = None) -> None:
+        """Write edits of the merged view to the write layer and re-merge what they touched."""
+        stack = self._stack
+        if stack is None:
+            return
+        # Undo/redo of an edit we journaled restore its layer; writing the
+        # merged values through would copy them into it
+        h = self._history
+        stepped = h.peek_redo() if origin == "undo" else h.peek_undo() if origin == "redo" else None
+        saved = self._layer_edits.get(stepped["version"]) if stepped and stepped["version"] == entry else None
+        if saved is not None:
+            touched = stack.restore(saved[0], saved[1], undo=origin == "undo")
+        else:
+            layer, journal = self._write_layer_index(), []
+            touched = stack.write(layer, ops, self.data, journal)
+            self._layer_edits[self.data_version] = (layer, journal)
+        stack.recompute(touched)
+        # The merge can differ from the edit: a key removed from the write
+        # layer may still be set in a lower one.
+        fix: List[Op] = []
+        for k in sorted(touched):
+            if k not in stack:
+                if k in self.data:
+                    fix.append({"op": "remove", "path": [k]})
+            elif k not in self.data:
+                fix.append({"op": "add", "path": [k], "value": stack.value(k)})
+            elif self.data[k] != stack.get(k):
+                fix.extend(diff_ops(self.data[k], stack.value(k), [k]))
+        with self.hold_sync():
+            if fix:
+                self._push_ops(fix, origin="external")
+            self.provenance = stack.provenance()
+
+    def layer_of(self, path: Any) -> Optional[str]:
+        """The file the value at ``path`` (dotted or a list) comes from in layered mode."""
+        if self._stack is None:
+            return None
+        segs = path.split(".") if isinstance(path, str) else list(path)
+        i = self._stack.layer_of(segs)
+        return self.layers[i] if i is not None else None
+
+    # ------------------------------------------------------------------
+    # History
+    # ------------------------------------------------------------------
+
+    def _record_history(
+        self, origin: str, entry: Optional[int], ops: List[Op], inverse: List[Op]
+    ) -> None:
+        # The frontend undoes/redoes its own entries and tags them with the
+        # version they produced; if that doesn't match our stack (e.g. after
+        # a reload), the ops are recorded as a fresh edit instead.
+        h = self._history
+        if origin == "undo" and (h.peek_undo() or {}).get("version") == entry:
+            h.step_back()
+        elif origin == "redo" and (h.peek_redo() or {}).get("version") == entry:
+            h.step_forward()
+        elif origin != "external":
+            h.record(self.data_version, ops, inverse)
+        if self._layer_edits:
+            live = h.versions()
+            self._layer_edits = {v: e for v, e in self._layer_edits.items() if v in live}
+        self._sync_history_flags()
+
+    def _sync_history_flags(self) -> None:
+        with self.hold_sync():
+            self.can_undo = self._history.can_undo
+            self.can_redo = self._history.can_redo
+
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
 
-    def load(self, path: str) -> None:
-        """Load a TOML file and update the widget state."""
+    @property
+    def history(self) -> List[Dict[str, Any]]:
+        """Applied edits, oldest first, as ``{"version", "ops", "inverse"}`` dicts."""
+        return [
+            {"version": e["version"], "ops": copy.deepcopy(e["ops"]), "inverse": copy.deepcopy(e["inverse"])}
+            for e in self._history.entries()
+        ]
+
+    def get(self, path: Path_, default: Any = None) -> Any:
+        """Value at a dotted path (``"server.port"``, ``'a."b.c"'``) or list of keys; ``default`` if missing."""
+        return get_path(self.data, path, default)
+
+    def set(self, path: Path_, value: Any) -> None:
+        """Set the value at a dotted path, creating tables on the way; an undoable edit."""
+        segs = split_path(path)
+        with self._lock:
+            absent = object()
+            exists = get_path(self.data, segs, absent) is not absent
+            self.apply_ops([{"op": "replace" if exists else "add", "path": segs, "value": value}])
+
+    def select(self, path: Path_, default: Any = None) -> PathView:
+        """A view of the value at ``path`` that changes only when that value does.
+
+        ``view.value`` is a copy of ``get(path, default)``, refreshed when an
+        edit touches the path, a table above it or anything below it;
+        ``view.observe(callback, "value")`` is called only when it changed.
+        Selecting the same path again returns the same view.
+        """
+        with self._lock:
+            return self._selections.select(self.data, path, default)
+
+    def apply_ops(self, ops: List[Op]) -> None:
+        """Edit ``data`` in place and push only the ops to the frontend.
+
+        Each op is ``{"op": "add" | "replace" | "remove", "path": [...], "value": ...}``.
+        Paths may also be dotted strings. The edit is recorded in the undo history.
+        """
+        with self._lock:
+            ops = normalize_ops(ops, self.data)
+            inverse = self._push_ops(ops, origin="edit")
+            self._record_history("edit", None, ops, inverse)
+
+    def undo(self) -> bool:
+        """Undo the last edit. Returns ``False`` if there was nothing to undo."""
+        with self._lock:
+            entry = self._history.step_back()
+            if entry is None:
+                return False
+            # The history's values stay its own
+            self._push_ops(copy.deepcopy(entry["inverse"]), origin="undo", entry=entry["version"])
+            self._sync_history_flags()
+        return True
+
+    def redo(self) -> bool:
+        """Redo the last undone edit. Returns ``False`` if there was nothing to redo."""
+        with self._lock:
+            entry = self._history.step_forward()
+            if entry is None:
+                return False
+            self._push_ops(copy.deepcopy(entry["ops"]), origin="redo", entry=entry["version"])
+            self._sync_history_flags()
+        return True
+
+    def load(self, path: str, progressive: Optional[bool] = None) -> None:
+        """Load a TOML file and update the widget state.
+
+        With ``progressive``, the frontend first gets the root values and the
+        list of top-level tables; each table's body is sent when its tab is
+        opened. It defaults to on for ``hydration="lazy"``, and for files of at
+        least ``progressive_load_bytes`` with ``"auto"``. ``data`` always holds
+        the whole document.
+        """
         p = Path(path).expanduser()
         if not p.exists():
-            self.data = {}
-            self.status = f"File not found: {p}"
+            with self._lock:
+                self.data = {}
+                self.status = f"File not found: {p}"
+            return
+        try:
+            nbytes = p.stat().st_size
+            if nbytes >= self.progressive_load_bytes:
+                self.status = f"Reading {p.name} ({nbytes / 1e6:.1f} MB)…"
+            parsed = self.parse_cache.parse(p)
+            self._stamps[str(p.resolve())] = (parsed.digest, parsed.mtime_ns, parsed.nbytes)
+            with self._lock:
+                self._set_document(parsed.doc, parsed.nbytes, progressive)
+                self.name = p.stem
+                self._loaded_from(p, parsed.text)
+                if self.table_index:
+                    self.status = f"Loaded: {p.name} · {len(self.table_index)} tables load as they are opened"
+                else:
+                    self.status = f"Loaded: {p.name}"
+        except Exception as exc:  # noqa: BLE001
+            with self._lock:
+                self.data = {}
+                self.status = f"Error loading TOML: {exc}"
+
+    def load_layers(
+        self, paths: List[str], write_layer: Optional[int] = None, progressive: Optional[bool] = None
+    ) -> None:
+        """Load several TOML files as one config, later files overriding earlier ones.
+
+        ``data`` becomes the merge: tables merge key by key, other values are
+        replaced whole. Edits are written to ``layers[write_layer]`` and saved
+        with :meth:`save_layers`. Missing files are empty layers.
+        """
+        files = [Path(p).expanduser() for p in paths]
+        if not files:
+            self.status = "No layers specified."
+            return
+        docs: List[Dict[str, Any]] = []
+        nbytes = 0
+        try:
+            for p in files:
+                if not p.exists():
+                    docs.append({})
+                    continue
+                parsed = self.parse_cache.parse(p)
+                self._stamps[str(p.resolve())] = (parsed.digest, parsed.mtime_ns, parsed.nbytes)
+                docs.append(parsed.doc)
+                nbytes += parsed.nbytes
+            stack = LayerStack(docs)
+        except Exception as exc:  # noqa: BLE001
+            with self._lock:
+                self.data = {}
+                self.status = f"Error loading TOML: {exc}"
+            return
+        with self._lock:
+            self._stop_watching()
+            self._path = None
+            with self.hold_sync():
+                self._set_document(stack.merged(), nbytes, progressive)
+                self._stack = stack
+                self.layers = [str(p) for p in files]
+                if write_layer is not None:
+                    self.write_layer = write_layer
+                self.provenance = stack.provenance()
+                self.name = files[-1].stem
+                self._unsaved = False
+                self.status = "Loaded: " + " + ".join(p.name for p in files)
+
+    def save_layers(self) -> None:
+        """Save every layer edited since it was loaded. Requires tomli-w."""
+        stack = self._stack
+        if stack is None:
+            self.status = "No layers loaded."
+            return
+        if writer() is None:
+            self.status = "Install tomli-w to enable saving (pip install tomli-w)."
             return
         try:
-            with p.open("rb") as f:
-                obj = tomllib.load(f)
-            self.data = obj if isinstance(obj, dict) else {}
-            self.name = p.stem
-            self.status = f"Loaded: {p.name}"
+            with self._lock:
+                texts = {i: toml_dumps(stack.docs[i]) for i in sorted(stack.dirty)}
+                # Cleared now so edits made while writing mark their layer
+                # again; put back for the layers that weren't written
+                stack.dirty.clear()
+            names = []
+            pending = list(texts)
+            try:
+                for i, text in texts.items():
+                    p = Path(self.layers[i])
+                    names.append(p.name if self._write_file(p, text) else f"{p.name} (no changes)")
+                    pending.remove(i)
+            finally:
+                with self._lock:
+                    stack.dirty.update(pending)
+            with self._lock:
+                self._unsaved = False
+                self.status = f"Saved: {', '.join(names)}" if names else "Saved: no layers changed"
         except Exception as exc:  # noqa: BLE001
-            self.data = {}
-            self.status = f"Error loading TOML: {exc}"
+            self.status = f"Error saving: {exc}"
 
     def save(self, path: Optional[str] = None) -> None:
-        """Save the current data to a TOML file. Requires tomli-w."""
-        if tomli_w is None:
+        """Save the current data to a TOML file. Requires tomli-w.
+
+        In layered mode, ``save()`` without a path saves the edited layers.
+        """
+        if writer() is None:
             self.status = "Install tomli-w to enable saving (pip install tomli-w)."
             return
+        if not path and self._stack is not None:
+            self.save_layers()
+            return
         if not path:
             self.status = "No path specified."
             return
         p = Path(path).expanduser()
+        errors = validate(self.data)
+        if errors:
+            self.status = f"Error saving: {errors[0]}"
+            return
         try:
-            p.parent.mkdir(parents=True, exist_ok=True)
-            p.write_text(tomli_w.dumps(self.data), encoding="utf-8")
-            self.status = f"Saved: {p.name}"
+            with self._lock, self._timed("serialize.save"):
+                text = self._document_text()
+            self.status = self._saved_status(p, self._write_file(p, text))
         except Exception as exc:  # noqa: BLE001
             self.status = f"Error saving: {exc}"
 
+    def _write_file(self, path: Path, text: str) -> bool:
+        """Atomically write ``text`` to ``path``; ``False`` if it was already there."""
+        key = str(path.expanduser().resolve())
+        data = text.encode("utf-8")
+        watched = self._path is not None and key == str(self._path)
+        if watched:
+            self._writing = digest(data)
+        try:
+            with self._timed("save.write"):
+                written, stamp = write_if_changed(Path(key), data, fsync=self.fsync, last=self._stamps.get(key))
+        finally:
+            self._writing = None
+        if stamp is not None:
+            self._stamps[key] = stamp
+        if watched:
+            with self._lock:
+                # The file now holds data (minus edits made while writing)
+                self._groups = self._split(text)
+                self._unsaved = False
+                self.conflict = {}
+        return written
+
+    @staticmethod
+    def _saved_status(path: Path, written: bool) -> str:
+        return f"Saved: {path.name}" if written else f"Saved: {path.name} (no changes)"
+
     # ------------------------------------------------------------------
-    # Command handler (JS → Python)
+    # Watching the loaded file
     # ------------------------------------------------------------------
 
-    @traitlets.observe("command_nonce")
-    def _on_command(self, change: Dict[str, Any]) -> None:  # noqa: ARG002
-        cmd = self.command
-        payload = self.command_payload or {}
+    def _loaded_from(self, path: Path, text: Optional[str]) -> None:
+        """Note that data now matches ``path``; (re)start watching it."""
+        resolved = path.expanduser().resolve()
+        moved = resolved != self._path
+        self._path = resolved
+        if text is None and self.watch:
+            # Parsed from the cache; the text is still needed as a baseline
+            try:
+                text = resolved.read_bytes().decode("utf-8")  # CRLF kept
+            except (OSError, UnicodeDecodeError):
+                pass
+        self._groups = self._split(text) if text is not None else None
+        stamp = self._stamps.get(str(resolved))
+        if text is not None:
+            self._keep_source(SourceText(text))
+        elif stamp is not None:
+            # Parsed from the cache: read the text if a save needs it
+            self._keep_source(SourceText.from_file(resolved, stamp[0]))
+        self._unsaved = False
+        self.conflict = {}
+        if moved and self.watch:
+            self._start_watching()
+
+    def _split(self, text: str) -> Optional[Dict[str, str]]:
+        if not self.watch:
+            return None
+        try:
+            return split_tables(text)
+        except ValueError:
+            return None
+
+    @traitlets.observe("watch")
+    def _on_watch_change(self, change: Dict[str, Any]) -> None:
+        if change["new"]:
+            self._start_watching()
+        else:
+            self._stop_watching()
+
+    def _start_watching(self) -> None:
+        self._stop_watching()
+        if self._path is not None:
+            self._watcher = FileWatcher(self._path, self._on_file_changed).start()
+
+    def _stop_watching(self) -> None:
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _on_file_changed(self) -> None:
+        # Called on the watcher thread
+        path = self._path
+        if path is None:
+            return
+        try:
+            raw = path.read_bytes()
+        except OSError:
+            return  # deleted or mid-rename; the next event brings the new file
+        stamp = stamp_of(path, raw)
+        if stamp is None or stamp[0] == self._writing:
+            return  # our own save
+        with self._lock:
+            last = self._stamps.get(str(path))
+            if last is not None and last[0] == stamp[0]:
+                return  # saved by us, or touched without changing
+            if self._unsaved:
+                changed = parse_changed(self._groups or {}, raw.decode("utf-8", "replace"))
+                tables = sorted(changed[1]) if changed is not None else []
+                self.conflict = {"path": path.name, "tables": tables}
+                self.status = f"{path.name} changed on disk; you have unsaved edits."
+                return
+            self._reload_from(raw, stamp)
+
+    def _reload_from(self, raw: bytes, stamp: Stamp, full: bool = False) -> None:
+        """Bring data in line with ``raw`` (the watched file), as external ops."""
+        path = self._path
+        assert path is not None
+        try:
+            text = raw.decode("utf-8")
+            changed = None if full or self._groups is None else parse_changed(self._groups, text)
+            if changed is None:
+                # Everything may have changed: diff every top-level key
+                new = tomllib.loads(text)
+                groups = self._split(text)
+                values, removed = new, [k for k in self.data if k not in new]
+            else:
+                groups, values, removed = changed
+        except (UnicodeDecodeError, tomllib.TOMLDecodeError) as exc:
+            # Possibly caught mid-write by a non-atomic editor; wait for the next event
+            self.status = f"Error reloading {path.name}: {exc}"
+            return
+        ops: List[Op] = []
+        for k, v in values.items():
+            if k not in self.data:
+                ops.append({"op": "add", "path": [k], "value": v})
+            elif self.data[k] != v:
+                ops.append({"op": "replace", "path": [k], "value": v})
+        ops.extend({"op": "remove", "path": [k]} for k in removed if k in self.data)
+        self._stamps[str(path)] = stamp
+        self._groups = groups
+        self.conflict = {}
+        if not ops:
+            self._keep_source(SourceText(text))  # comments or layout may have changed
+            return
+        with self.hold_sync():
+            # Tables the frontend hasn't fetched stay that way; it gets the new
+            # body when it asks. Everything else goes out as ops.
+            index = dict(self.table_index)
+            lazy: List[Op] = []
+            rest: List[Op] = []
+            for op in ops:
+                pending = op["path"][0] in index and isinstance(op.get("value"), dict)
+                (lazy if pending else rest).append(op)
+            if lazy:
+                apply_ops(self.data, lazy)
+                for op in lazy:
+                    index[op["path"][0]] = _table_entry(op["value"])
+                self.table_index = index
+                self._note_change(lazy)
+            if rest:
+                self._push_ops(rest, origin="external")
+            names = ", ".join(f"[{op['path'][0]}]" for op in ops)
+            self.status = f"Reloaded {path.name}: {names}"
+        self._keep_source(SourceText(text))
+
+    def _resolve_conflict(self, action: str) -> None:
+        path = self._path
+        if action == "reload" and path is not None:
+            try:
+                raw = path.read_bytes()
+            except OSError as exc:
+                self.status = f"Error reloading {path.name}: {exc}"
+                return
+            stamp = stamp_of(path, raw)
+            if stamp is not None:
+                # Drop the local edits: diff the whole file against data
+                self._reload_from(raw, stamp, full=True)
+                self._unsaved = False
+        elif action == "keep":
+            # Saving will overwrite the file; don't ask again for this version
+            if path is not None:
+                try:
+                    raw = path.read_bytes()
+                    stamp = stamp_of(path, raw)
+                    if stamp is not None:
+                        self._stamps[str(path)] = stamp
+                        self._groups = self._split(raw.decode("utf-8"))
+                except (OSError, UnicodeDecodeError):
+                    pass
+            self.conflict = {}
+            self.status = "Kept your edits; saving will overwrite the file."
+
+    def close(self) -> None:
+        self._stop_watching()
+        # A save still queued gets written; the thread goes away after it
+        self._runner.shutdown()
+        super().close()
+
+    # ------------------------------------------------------------------
+    # Instrumentation
+    # ------------------------------------------------------------------
+
+    @traitlets.observe("instrument")
+    def _on_instrument_change(self, change: Dict[str, Any]) -> None:
+        if change["new"] == "off":
+            self._stats = None
+        elif self._stats is None:
+            self._stats = Stats()
+
+    def _timed(self, key: str) -> ContextManager[None]:
+        stats = self._stats
+        return stats.timings.time(key) if stats is not None else nullcontext()
+
+    def _send(self, msg: Dict[str, Any], buffers: Optional[List[Any]] = None) -> None:
+        # Every state update and custom message to the frontend goes through here
+        stats = self._stats
+        if stats is not None:
+            stats.sent.add(msg, buffers)
+        super()._send(msg, buffers=buffers)
+
+    def _handle_msg(self, msg: Dict[str, Any]) -> None:
+        stats = self._stats
+        if stats is not None:
+            stats.received.add(msg["content"]["data"], msg.get("buffers"))
+        super()._handle_msg(msg)
+
+    def _on_custom_msg(self, _widget: Any, content: Dict[str, Any], buffers: List[Any]) -> None:
+        if not isinstance(content, dict):
+            return
+        if content.get("type") == "request":
+            self._on_request(content, buffers)
+            return
+        if content.get("type") != "stats":
+            return
+        stats = self._stats
+        if stats is None:
+            return
+        stats.frontend = content.get("frontend") or {}
+        if self.instrument == "overlay":
+            self.send({"type": "stats", "stats": self.stats()})
+
+    def stats(self, reset: bool = False) -> Dict[str, Any]:
+        """What ``instrument`` has recorded so far.
+
+        ``python`` and ``frontend`` map keys such as ``command.patch``,
+        ``serialize.save``, ``render`` or ``roundtrip.patch`` to ``count``,
+        ``mean_ms``, ``p50_ms``, ``p95_ms``, ``max_ms`` and ``last_ms``;
+        ``payload`` counts the messages and bytes synced each way, by trait;
+        ``history`` gives the entries and approximate bytes of both undo
+        stacks. Empty while ``instrument`` is ``"off"``.
+        """
+        stats = self._stats
+        if stats is None:
+            return {}
+        front = stats.frontend
+        out = {
+            "python": stats.timings.snapshot(),
+            "frontend": front.get("timings") or {},
+            "payload": {"sent": stats.sent.snapshot(), "received": stats.received.snapshot()},
+            "history": {
+                "python": {"entries": len(self._history), "bytes": self._history.nbytes},
+                "frontend": front.get("history") or {},
+            },
+        }
+        if reset:
+            self._stats = Stats()
+        return out
+
+    # ------------------------------------------------------------------
+    # Requests (JS → Python)
+    # ------------------------------------------------------------------
+    # The frontend sends {"type": "request", "batch": [{"id", "command",
+    # "payload"}, ...]} (the batch as one frame with wire="binary"). The
+    # commands run in order and one {"type": "reply", "replies": [{"id",
+    # "ok", "result" | "error"}, ...]} answers the whole batch, after the
+    # state changes they caused have been sent.
+
+    def _on_request(self, content: Dict[str, Any], buffers: List[Any]) -> None:
+        batch = content.get("batch") or []
+        if is_frame(batch):
+            batch = decode({**batch, "buffer": buffers[0]}) if buffers else []
+        with self._lock:
+            replies = [self._answer(request) for request in batch if isinstance(request, dict)]
+        if not replies:
+            return
+        if _binary(self):
+            frame = encode(replies, self.compress_bytes)
+            buffer = frame.pop("buffer")
+            self.send({"type": "reply", "replies": frame}, [buffer])
+        else:
+            self.send({"type": "reply", "replies": replies})
 
-        if cmd == "load_raw":
+    def _answer(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        cmd = str(request.get("command") or "")
+        try:
+            with self._timed(f"command.{cmd}"):
+                result = self._dispatch(cmd, request.get("payload") or {})
+        except Exception as exc:  # noqa: BLE001
+            self.status = f"Error: {exc}"
+            return {"id": request.get("id"), "ok": False, "error": f"{type(exc).__name__}: {exc}"}
+        return {"id": request.get("id"), "ok": True, "result": result}
+
+    def _dispatch(self, cmd: str, payload: Dict[str, Any]) -> Any:
+        """Run one frontend command; returns the reply's result."""
+        if cmd == "patch":
+            self._on_patch(payload)
+            return self.data_version
+
+        elif cmd == "resync":
+            self._resync()
+
+        elif cmd == "undo":
+            # Frontend has no local history left (e.g. after a reload)
+            return self.undo()
+
+        elif cmd == "redo":
+            return self.redo()
+
+        elif cmd == "load_tables":
+            # A tab whose body hasn't been sent yet was opened
+            self._send_tables(list(payload.get("keys") or []))
+
+        elif cmd == "evict_tables":
+            self._evict_tables(list(payload.get("keys") or []))
+
+        elif cmd == "resolve_conflict":
+            # The file changed on disk under unsaved edits: "reload" or "keep"
+            self._resolve_conflict(payload.get("action", ""))
+
+        elif cmd == "render_text":
+            # Raw tab opened or a download needs the text. The frontend can't
+            # serialize tables it hasn't fetched, so render even when "off".
+            if self.text_sync != "off" or self.table_index:
+                self._run("render_text", self._render_text)
+
+        elif cmd == "load_raw":
             # JS fallback if not Mac native
             content = payload.get("content", "")
             suggested_name = payload.get("name", "")
-            try:
-                obj = tomllib.load(io.BytesIO(content.encode("utf-8")))
-                self.data = obj if isinstance(obj, dict) else {}
-                if suggested_name:
-                    self.name = Path(suggested_name).stem
-                self.status = f"Loaded: {suggested_name or 'file'}"
-                # We don't have absolute path, default to current dir for future saves
-                self._last_save_path = str(Path.cwd() / (suggested_name or f"{self.name}.toml"))
-            except Exception as exc:  # noqa: BLE001
-                self.data = {}
-                self.status = f"Error parsing TOML: {exc}"
+            self._run(
+                "load",
+                lambda: self._load_raw(content, suggested_name),
+                f"Loading {suggested_name or 'file'}…",
+            )
 
         elif cmd == "mac_native_open":
-            import subprocess
-            try:
-                res = subprocess.run(
-                    ['osascript', '-e', 'POSIX path of (choose file with prompt "Select TOML file")'],
-                    capture_output=True, text=True, check=False
-                )
-                path = res.stdout.strip()
-                if path:
-                    self.load(path)
-                    self._last_save_path = path
-            except Exception as exc:  # noqa: BLE001
-                self.status = f"Dialog error: {exc}"
+            self._run("load", self._mac_native_open)
 
         elif cmd == "mac_native_save_as":
-            import subprocess
-            try:
-                res = subprocess.run(
-                    ['osascript', '-e', f'POSIX path of (choose file name with prompt "Save TOML file as" default name "{self.name}.toml")'],
-                    capture_output=True, text=True, check=False
-                )
-                path = res.stdout.strip()
-                if path:
-                    content = payload.get("content", "")
-                    Path(path).write_text(content, encoding="utf-8")
-                    self.name = Path(path).stem
-                    self.status = f"Saved: {Path(path).name}"
-                    self._last_save_path = path
-            except Exception as exc:  # noqa: BLE001
-                self.status = f"Dialog error: {exc}"
+            self._run("save", lambda: self._mac_native_save_as(payload))
 
         elif cmd == "save_local":
             # Save silently to known absolute path, or fallback to name
-            content = payload.get("content", "")
-            path_str = getattr(self, "_last_save_path", str(Path.cwd() / f"{self.name}.toml"))
-            try:
-                Path(path_str).write_text(content, encoding="utf-8")
-                self.status = f"Saved: {Path(path_str).name}"
-            except Exception as exc:  # noqa: BLE001
-                self.status = f"Error saving: {exc}"
+            self._run("save", lambda: self._save_local(payload), "Saving…")
 
         else:
-            if cmd:
-                self.status = f"Unknown command: {cmd}"
+            raise ValueError(f"Unknown command: {cmd!r}")
+        return None
+
+    # ------------------------------------------------------------------
+    # File commands — run inline, or on the worker thread in background
+    # mode; slow work happens outside the lock.
+    # ------------------------------------------------------------------
+
+    def _run(self, key: str, job: Callable[[], None], status: str = "") -> None:
+        if not self.background:
+            job()
+            return
+        if status:
+            self.status = status
+        self._runner.submit(key, lambda: self._time_job(key, job))
+
+    def _time_job(self, key: str, job: Callable[[], None]) -> None:
+        with self._timed(f"job.{key}"):
+            job()
+
+    def _render_text(self) -> None:
+        with self._lock:
+            self._sync_toml_text()
+            if not self.toml_text and self.data:
+                self.status = "Could not render TOML text (install tomli-w for exact output)."
+
+    def _load_raw(self, content: str, suggested_name: str) -> None:
+        try:
+            raw = content.encode("utf-8")
+            obj = tomllib.load(io.BytesIO(raw))
+        except Exception as exc:  # noqa: BLE001
+            with self._lock:
+                self.data = {}
+                self.status = f"Error parsing TOML: {exc}"
+            return
+        with self._lock:
+            self._set_document(obj, len(raw), None)
+            self._keep_source(SourceText(content))
+            if suggested_name:
+                self.name = Path(suggested_name).stem
+            self.status = f"Loaded: {suggested_name or 'file'}"
+            # We don't have absolute path, default to current dir for future saves
+            self._last_save_path = str(Path.cwd() / (suggested_name or f"{self.name}.toml"))
 
-        self.command = ""
-        self.command_payload = {}
+    def _mac_native_open(self) -> None:
+        import subprocess
+        try:
+            res = subprocess.run(
+                ['osascript', '-e', 'POSIX path of (choose file with prompt "Select TOML file")'],
+                capture_output=True, text=True, check=False
+            )
+            path = res.stdout.strip()
+            if path:
+                self.load(path)
+                self._last_save_path = path
+        except Exception as exc:  # noqa: BLE001
+            self.status = f"Dialog error: {exc}"
+
+    def _mac_native_save_as(self, payload: Dict[str, Any]) -> None:
+        import subprocess
+        try:
+            res = subprocess.run(
+                ['osascript', '-e', f'POSIX path of (choose file name with prompt "Save TOML file as" default name "{self.name}.toml")'],
+                capture_output=True, text=True, check=False
+            )
+            path = res.stdout.strip()
+            if path:
+                with self._lock:
+                    content = self._text_for_save(payload)
+                if content is None:
+                    return
+                written = self._write_file(Path(path), content)
+                with self._lock:
+                    self.name = Path(path).stem
+                    self.status = self._saved_status(Path(path), written)
+                    self._last_save_path = path
+        except Exception as exc:  # noqa: BLE001
+            self.status = f"Dialog error: {exc}"
 
+    def _save_local(self, payload: Dict[str, Any]) -> None:
+        if self._stack is not None:
+            self.save_layers()
+            return
+        with self._lock:
+            content = self._text_for_save(payload)
+            path_str = getattr(self, "_last_save_path", str(Path.cwd() / f"{self.name}.toml"))
+        if content is None:
+            return
+        try:
+            status = self._saved_status(Path(path_str), self._write_file(Path(path_str), content))
+        except Exception as exc:  # noqa: BLE001
+            status = f"Error saving: {exc}"
+        with self._lock:
+            self.status = status
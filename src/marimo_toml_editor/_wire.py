@@ -0,0 +1,297 @@
+"""marimo-toml-editor — binary encoding of the data channel.
+
+With ``wire="binary"``, ``data``, ``data_patch`` and ``toml_text`` (and the
+frontend's command payloads) cross the comm as MessagePack in a binary
+buffer instead of JSON text. Each value becomes a frame::
+
+    {"$wire": "msgpack" | "msgpack+deflate", "size": <msgpack bytes>, "buffer": <bytes>}
+
+and ipywidgets moves ``buffer`` out of the JSON message. Lists of at least
+``TYPED_MIN`` floats, or of ints that fit in 32 bits, are packed as
+little-endian typed arrays (extension types 1 and 2). Frames of at least
+``compress_bytes`` are deflated (raw, no zlib header) when that makes them
+smaller. Dates and times travel as ISO strings, as they do in JSON.
+
+widget.js holds the mirror image: ``wireValue`` decodes frames (including
+deflated ones) and ``encodeWire`` packs command payloads.
+"""
+
+from __future__ import annotations
+
+import datetime
+import struct
+import zlib
+from typing import Any, Callable, Dict, List
+
+WIRE = "$wire"  # marks a frame
+TYPED_MIN = 8  # shorter lists aren't worth a typed array
+
+EXT_INT32 = 1
+EXT_FLOAT64 = 2
+
+_INT32_MIN, _INT32_MAX = -(2**31), 2**31 - 1
+
+_B = struct.Struct(">BB")
+_H = struct.Struct(">BH")
+_I = struct.Struct(">BI")
+_EXT8 = struct.Struct(">BBb")
+_EXT16 = struct.Struct(">BHb")
+_EXT32 = struct.Struct(">BIb")
+_F64 = struct.Struct(">Bd")
+_i8 = struct.Struct(">Bb")
+_i16 = struct.Struct(">Bh")
+_i32 = struct.Struct(">Bi")
+_i64 = struct.Struct(">Bq")
+_u64 = struct.Struct(">BQ")
+
+
+# ---------------------------------------------------------------------------
+# MessagePack
+# ---------------------------------------------------------------------------
+
+
+def _head(out: bytearray, n: int, fix: int, fix_max: int, c8: int, c16: int, c32: int) -> None:
+    if n <= fix_max:
+        out.append(fix | n)
+    elif c8 and n < 0x100:
+        out += _B.pack(c8, n)
+    elif n < 0x10000:
+        out += _H.pack(c16, n)
+    else:
+        out += _I.pack(c32, n)
+
+
+def _pack_int(out: bytearray, n: int) -> None:
+    if 0 <= n < 0x80:
+        out.append(n)
+    elif -32 <= n < 0:
+        out.append(n & 0xFF)
+    elif -0x80 <= n < 0x80:
+        out += _i8.pack(0xD0, n)
+    elif -0x8000 <= n < 0x8000:
+        out += _i16.pack(0xD1, n)
+    elif _INT32_MIN <= n <= _INT32_MAX:
+        out += _i32.pack(0xD2, n)
+    elif -(2**63) <= n < 2**63:
+        out += _i64.pack(0xD3, n)
+    elif 0 <= n < 2**64:
+        out += _u64.pack(0xCF, n)
+    else:
+        raise OverflowError(f"Integer too large to encode: {n}")
+
+
+def _pack_ext(out: bytearray, code: int, data: bytes) -> None:
+    n = len(data)
+    if n < 0x100:
+        out += _EXT8.pack(0xC7, n, code)
+    elif n < 0x10000:
+        out += _EXT16.pack(0xC8, n, code)
+    else:
+        out += _EXT32.pack(0xC9, n, code)
+    out += data
+
+
+def _pack_list(out: bytearray, items: List[Any]) -> None:
+    n = len(items)
+    if n >= TYPED_MIN:
+        first = type(items[0])
+        if first is float and all(type(v) is float for v in items):
+            _pack_ext(out, EXT_FLOAT64, struct.pack(f"<{n}d", *items))
+            return
+        if (
+            first is int
+            and all(type(v) is int for v in items)
+            and _INT32_MIN <= min(items)
+            and max(items) <= _INT32_MAX
+        ):
+            _pack_ext(out, EXT_INT32, struct.pack(f"<{n}i", *items))
+            return
+    _head(out, n, 0x90, 15, 0, 0xDC, 0xDD)
+    for v in items:
+        _pack(out, v)
+
+
+def _pack(out: bytearray, obj: Any) -> None:
+    t = type(obj)
+    if t is str:
+        b = obj.encode("utf-8")
+        _head(out, len(b), 0xA0, 31, 0xD9, 0xDA, 0xDB)
+        out += b
+    elif t is dict:
+        _head(out, len(obj), 0x80, 15, 0, 0xDE, 0xDF)
+        for k, v in obj.items():
+            _pack(out, k)
+            _pack(out, v)
+    elif t is int:
+        _pack_int(out, obj)
+    elif t is float:
+        out += _F64.pack(0xCB, obj)
+    elif t is bool:
+        out.append(0xC3 if obj else 0xC2)
+    elif t is list or t is tuple:
+        _pack_list(out, list(obj) if t is tuple else obj)
+    elif obj is None:
+        out.append(0xC0)
+    elif isinstance(obj, (datetime.date, datetime.time)):
+        _pack(out, obj.isoformat())
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        b = bytes(obj)
+        _head(out, len(b), 0, -1, 0xC4, 0xC5, 0xC6)
+        out += b
+    # Subclasses (IntEnum, OrderedDict, str subclasses, ...) as their base type
+    elif isinstance(obj, bool):
+        _pack(out, bool(obj))
+    elif isinstance(obj, int):
+        _pack_int(out, int(obj))
+    elif isinstance(obj, float):
+        _pack(out, float(obj))
+    elif isinstance(obj, str):
+        _pack(out, str(obj))
+    elif isinstance(obj, dict):
+        _pack(out, dict(obj))
+    elif isinstance(obj, (list, tuple)):
+        _pack_list(out, list(obj))
+    else:
+        raise TypeError(f"Can't encode {type(obj).__name__}")
+
+
+def pack(obj: Any) -> bytes:
+    """``obj`` as MessagePack, with typed arrays for numeric lists."""
+    out = bytearray()
+    _pack(out, obj)
+    return bytes(out)
+
+
+def unpack(data: Any) -> Any:
+    """Decode :func:`pack`'s output (or widget.js's); typed arrays become lists."""
+    buf = bytes(data)
+    unpack_from = struct.unpack_from
+    pos = 0
+
+    def read() -> Any:
+        nonlocal pos
+        b = buf[pos]
+        pos += 1
+        if b < 0x80:
+            return b
+        if b < 0x90:
+            return read_map(b & 0x0F)
+        if b < 0xA0:
+            return [read() for _ in range(b & 0x0F)]
+        if b < 0xC0:
+            return read_str(b & 0x1F)
+        if b >= 0xE0:
+            return b - 0x100
+        handler = _READERS.get(b)
+        if handler is None:
+            raise ValueError(f"Unknown MessagePack byte 0x{b:02x} at {pos - 1}")
+        return handler()
+
+    def take(fmt: str) -> Any:
+        nonlocal pos
+        value = unpack_from(fmt, buf, pos)[0]
+        pos += struct.calcsize(fmt)
+        return value
+
+    def read_str(n: int) -> str:
+        nonlocal pos
+        s = buf[pos : pos + n].decode("utf-8")
+        pos += n
+        return s
+
+    def read_bin(n: int) -> bytes:
+        nonlocal pos
+        b = buf[pos : pos + n]
+        pos += n
+        return b
+
+    def read_map(n: int) -> Dict[Any, Any]:
+        out = {}
+        for _ in range(n):
+            k = read()
+            out[k] = read()
+        return out
+
+    def read_ext(n: int) -> Any:
+        nonlocal pos
+        code = take(">b")
+        start = pos
+        pos += n
+        if code == EXT_INT32:
+            return list(unpack_from(f"<{n // 4}i", buf, start))
+        if code == EXT_FLOAT64:
+            return list(unpack_from(f"<{n // 8}d", buf, start))
+        raise ValueError(f"Unknown extension type {code}")
+
+    _READERS: Dict[int, Callable[[], Any]] = {
+        0xC0: lambda: None,
+        0xC2: lambda: False,
+        0xC3: lambda: True,
+        0xC4: lambda: read_bin(take(">B")),
+        0xC5: lambda: read_bin(take(">H")),
+        0xC6: lambda: read_bin(take(">I")),
+        0xC7: lambda: read_ext(take(">B")),
+        0xC8: lambda: read_ext(take(">H")),
+        0xC9: lambda: read_ext(take(">I")),
+        0xCA: lambda: take(">f"),
+        0xCB: lambda: take(">d"),
+        0xCC: lambda: take(">B"),
+        0xCD: lambda: take(">H"),
+        0xCE: lambda: take(">I"),
+        0xCF: lambda: take(">Q"),
+        0xD0: lambda: take(">b"),
+        0xD1: lambda: take(">h"),
+        0xD2: lambda: take(">i"),
+        0xD3: lambda: take(">q"),
+        0xD4: lambda: read_ext(1),
+        0xD5: lambda: read_ext(2),
+        0xD6: lambda: read_ext(4),
+        0xD7: lambda: read_ext(8),
+        0xD8: lambda: read_ext(16),
+        0xD9: lambda: read_str(take(">B")),
+        0xDA: lambda: read_str(take(">H")),
+        0xDB: lambda: read_str(take(">I")),
+        0xDC: lambda: [read() for _ in range(take(">H"))],
+        0xDD: lambda: [read() for _ in range(take(">I"))],
+        0xDE: lambda: read_map(take(">H")),
+        0xDF: lambda: read_map(take(">I")),
+    }
+
+    value = read()
+    if pos != len(buf):
+        raise ValueError(f"{len(buf) - pos} trailing bytes after MessagePack value")
+    return value
+
+
+# ---------------------------------------------------------------------------
+# Frames
+# ---------------------------------------------------------------------------
+
+
+def encode(obj: Any, compress_bytes: int = 0) -> Dict[str, Any]:
+    """``obj`` as a frame; deflated if it packs to at least ``compress_bytes`` (0: never)."""
+    raw = pack(obj)
+    if compress_bytes and len(raw) >= compress_bytes:
+        z = zlib.compressobj(6, zlib.DEFLATED, -15)
+        body = z.compress(raw) + z.flush()
+        if len(body) < len(raw):
+            return {WIRE: "msgpack+deflate", "size": len(raw), "buffer": body}
+    return {WIRE: "msgpack", "size": len(raw), "buffer": raw}
+
+
+def is_frame(value: Any) -> bool:
+    return isinstance(value, dict) and WIRE in value
+
+
+def decode(value: Any) -> Any:
+    """The value a frame holds; anything else is returned as is."""
+    if not is_frame(value):
+        return value
+    codec, buf = value[WIRE], value.get("buffer")
+    if buf is None:
+        raise ValueError("Wire frame without a buffer")
+    if codec == "msgpack+deflate":
+        buf = zlib.decompress(bytes(buf), -15)
+    elif codec != "msgpack":
+        raise ValueError(f"Unknown wire codec {codec!r}")
+    return unpack(buf)
@@ -3,40 +3,98 @@
 
 // ---- Utilities ----------------------------------------------------------------
 
-function deepClone(x) { return JSON.parse(JSON.stringify(x)); }
 function isHexColor(s) { return typeof s === "string" && /^#[0-9A-Fa-f]{6}$/.test(s); }
 
-function setByPath(obj, path, value) {
+function getByPath(obj, path) {
     const parts = path.split(".").filter(Boolean);
     let cur = obj;
-    for (let i = 0; i < parts.length - 1; i++) {
-        const p = parts[i];
-        if (typeof cur[p] !== "object" || cur[p] === null || Array.isArray(cur[p])) cur[p] = {};
+    for (const p of parts) {
+        if (!cur || typeof cur !== "object") return undefined;
         cur = cur[p];
     }
-    cur[parts[parts.length - 1]] = value;
+    return cur;
 }
 
-function deleteByPath(obj, path) {
-    const parts = path.split(".").filter(Boolean);
-    let cur = obj;
-    for (let i = 0; i < parts.length - 1; i++) {
-        const p = parts[i];
-        if (!(p in cur)) return;
-        cur = cur[p];
-        if (typeof cur !== "object" || cur === null) return;
+function pathOf(fullPath) { return fullPath.split(".").filter(Boolean); }
+
+// ---- Patches (see _patch.py) ------------------------------------------------------
+// An op is {op: "add" | "replace" | "remove", path: [...segments], value}.
+// Ops are applied in place; the document carries its (epoch, version) under
+// a symbol so several views of one model apply each Python patch only once.
+
+const META = Symbol("tce-meta");
+
+function docMeta(model, data) {
+    if (!data[META]) {
+        const p = synced(model, "data_patch") || {};
+        Object.defineProperty(data, META, {
+            value: { epoch: p.epoch || 0, version: model.get("data_version") || 0 },
+            enumerable: false,
+        });
     }
-    delete cur[parts[parts.length - 1]];
+    return data[META];
 }
 
-function getByPath(obj, path) {
-    const parts = path.split(".").filter(Boolean);
-    let cur = obj;
-    for (const p of parts) {
-        if (!cur || typeof cur !== "object") return undefined;
-        cur = cur[p];
+// applyOp returns the op that undoes it. Inverses hold references to the
+// values they restore rather than copies, so history costs O(changed size).
+// "add" creates the tables on its way; "replace" needs the value to exist.
+function applyOp(doc, op) {
+    const path = op.path || [];
+    if (path.length === 0) {
+        const old = { ...doc };
+        for (const k of Object.keys(doc)) delete doc[k];
+        if (op.op !== "remove") Object.assign(doc, op.value || {});
+        return { op: "replace", path: [], value: old };
     }
-    return cur;
+    let cur = doc;
+    let created = null; // first table auto-created along the path
+    for (let i = 0; i < path.length - 1; i++) {
+        const seg = path[i];
+        if (!Array.isArray(cur) && op.op === "add" &&
+            (typeof cur[seg] !== "object" || cur[seg] === null)) {
+            if (!created && !(seg in cur)) created = path.slice(0, i + 1);
+            cur[seg] = {};
+        }
+        cur = cur[seg];
+        if (typeof cur !== "object" || cur === null) throw new Error(`Bad path: ${path.join(".")}`);
+    }
+    const key = path[path.length - 1];
+    if (created) {
+        cur[key] = op.value;
+        return { op: "remove", path: created };
+    }
+    if (Array.isArray(cur)) {
+        if (op.op === "add") { cur.splice(key, 0, op.value); return { op: "remove", path }; }
+        if (!(key >= 0 && key < cur.length)) throw new Error(`Bad path: ${path.join(".")}`);
+        const old = cur[key];
+        if (op.op === "replace") { cur[key] = op.value; return { op: "replace", path, value: old }; }
+        cur.splice(key, 1);
+        return { op: "add", path, value: old };
+    }
+    const had = Object.prototype.hasOwnProperty.call(cur, key);
+    if (op.op === "replace" && !had) throw new Error(`Nothing to replace at ${path.join(".")}`);
+    const old = cur[key];
+    if (op.op === "remove") {
+        delete cur[key];
+        return had ? { op: "add", path, value: old } : null;
+    }
+    cur[key] = op.value;
+    return had ? { op: "replace", path, value: old } : { op: "remove", path };
+}
+
+// applyOps is all or nothing: if an op throws, the ones before it are undone.
+function applyOps(doc, ops) {
+    const inverse = [];
+    try {
+        for (const op of ops) {
+            const inv = applyOp(doc, op);
+            if (inv) inverse.unshift(inv);
+        }
+    } catch (err) {
+        for (const inv of inverse) applyOp(doc, inv);
+        throw err;
+    }
+    return inverse;
 }
 
 function keysSorted(obj) {
@@ -76,8 +134,526 @@ function iconBtn(emoji, title, extraClass) {
     return b;
 }
 
+// ---- Key index -----------------------------------------------------------------
+// Every key in the document by dotted path, for search. Entries keep their
+// path lowercased so a query costs one includes() per key, and ops re-index
+// only the subtree they touched. Arrays and scalars are leaves. Building and
+// searching are jobs: step(ms) works for about ms and returns true when done.
+
+function isTable(v) { return !!v && typeof v === "object" && !Array.isArray(v); }
+
+function valueHaystack(entry) {
+    if (entry.valueHay === null) {
+        const v = entry.value;
+        entry.valueHay = v === null || v === undefined || isTable(v) ? ""
+            : (typeof v === "object" ? JSON.stringify(v) : String(v)).slice(0, 500).toLowerCase();
+    }
+    return entry.valueHay;
+}
+
+function createKeyIndex() {
+    const entries = new Map();  // dotted path → { path, segs, tab, hay, value, valueHay }
+    const children = new Map(); // dotted path → Set of child paths
+    let version = 0;            // bumped on every change; narrowing needs it unchanged
+    let last = null;            // { query, values, version, matches } of the last search
+
+    function put(segs, v, tab) {
+        const path = segs.join(".");
+        entries.set(path, { path, segs, tab, hay: path.toLowerCase(), value: v, valueHay: null });
+        if (segs.length > 1) {
+            const parent = segs.slice(0, -1).join(".");
+            if (!children.has(parent)) children.set(parent, new Set());
+            children.get(parent).add(path);
+        }
+    }
+
+    // Walks [segs, value, tab] items depth-first, indexing as it goes
+    function walk(stack) {
+        return {
+            step(ms) {
+                const deadline = performance.now() + ms;
+                let n = 0;
+                while (stack.length) {
+                    const [segs, v, tab] = stack.pop();
+                    put(segs, v, tab);
+                    if (isTable(v)) {
+                        const ks = Object.keys(v);
+                        for (let i = ks.length - 1; i >= 0; i--) stack.push([[...segs, ks[i]], v[ks[i]], tab]);
+                    }
+                    if ((++n & 255) === 0 && performance.now() > deadline) return false;
+                }
+                return true;
+            },
+        };
+    }
+
+    function drop(path) {
+        const kids = children.get(path);
+        if (kids) for (const k of kids) drop(k);
+        children.delete(path);
+        entries.delete(path);
+    }
+
+    function topItems(data, keys) {
+        return keys.slice().reverse().map(k => [[k], data[k], isTable(data[k]) ? k : "root"]);
+    }
+
+    return {
+        get size() { return entries.size; },
+
+        build(data) {
+            entries.clear(); children.clear(); version += 1;
+            return walk(topItems(data, Object.keys(data)));
+        },
+
+        /** Re-index what ops touched in data (already applied). */
+        update(data, ops) {
+            version += 1;
+            for (const op of ops) {
+                const segs = [];
+                for (const seg of op.path || []) {
+                    if (typeof seg === "number") break; // array items belong to their array
+                    segs.push(String(seg));
+                }
+                if (!segs.length) { this.build(data).step(Infinity); continue; }
+                // Start at the shallowest key that is new (an add may create tables)
+                let n = 1;
+                while (n < segs.length && entries.has(segs.slice(0, n).join("."))) n += 1;
+                const top = segs.slice(0, n);
+                const path = top.join(".");
+                drop(path);
+                if (n > 1) {
+                    const siblings = children.get(top.slice(0, -1).join("."));
+                    if (siblings) siblings.delete(path);
+                }
+                let v = data;
+                for (const seg of top) v = isTable(v) && seg in v ? v[seg] : undefined;
+                if (v !== undefined) {
+                    const tab = isTable(data[top[0]]) ? top[0] : "root";
+                    walk([[top, v, tab]]).step(Infinity);
+                }
+            }
+        },
+
+        /** Entries whose path (or value, if asked) contains query, in index order. */
+        search(query, values) {
+            // A longer query only narrows the previous one's matches
+            const narrow = last && last.version === version && last.values === values
+                && query.includes(last.query);
+            const it = (narrow ? last.matches : entries.values())[Symbol.iterator]();
+            const matches = [];
+            return {
+                matches,
+                step(ms) {
+                    const deadline = performance.now() + ms;
+                    let n = 0;
+                    for (let r = it.next(); !r.done; r = it.next()) {
+                        const e = r.value;
+                        if (e.hay.includes(query) || (values && valueHaystack(e).includes(query))) matches.push(e);
+                        if ((++n & 1023) === 0 && performance.now() > deadline) return false;
+                    }
+                    last = { query, values, version, matches };
+                    return true;
+                },
+            };
+        },
+    };
+}
+
+// ---- Wire encoding (see _wire.py) -------------------------------------------------
+// With wire = "binary", data, data_patch and toml_text arrive as frames
+// {"$wire": "msgpack" | "msgpack+deflate", size, buffer} whose buffer is a
+// DataView; command payloads go back the same way (never deflated). Frames
+// are decoded once per received value: every view of a model then shares
+// (and edits in place) the same decoded document, as with JSON.
+
+const WIRE = "$wire";
+const TYPED_MIN = 8;
+const EXT_INT32 = 1;
+const EXT_FLOAT64 = 2;
+const utf8Encoder = new TextEncoder();
+const utf8Decoder = new TextDecoder();
+const wireDecoded = new WeakMap(); // frame → decoded value
+
+function isFrame(v) { return !!v && typeof v === "object" && !Array.isArray(v) && typeof v[WIRE] === "string"; }
+
+function bytesOf(buf) {
+    if (buf instanceof Uint8Array) return buf;
+    if (ArrayBuffer.isView(buf)) return new Uint8Array(buf.buffer, buf.byteOffset, buf.byteLength);
+    return new Uint8Array(buf);
+}
+
+/** The value a synced trait holds, decoding a frame (once) if it is one. */
+function wireValue(v) {
+    if (!isFrame(v)) return v;
+    let out = wireDecoded.get(v);
+    if (out === undefined) {
+        let bytes = bytesOf(v.buffer);
+        if (v[WIRE] === "msgpack+deflate") bytes = inflateRaw(bytes, v.size);
+        else if (v[WIRE] !== "msgpack") throw new Error(`Unknown wire codec ${v[WIRE]}`);
+        out = unpackMsg(bytes);
+        wireDecoded.set(v, out);
+    }
+    return out;
+}
+
+/** A synced trait's value, decoded if it arrived as a frame. */
+function synced(model, name) { return wireValue(model.get(name)); }
+
+/** ``value`` as a frame for model.set(); the buffer travels outside the JSON. */
+function encodeWire(value) {
+    const bytes = packMsg(value);
+    return { [WIRE]: "msgpack", size: bytes.length, buffer: new DataView(bytes.buffer, 0, bytes.length) };
+}
+
+function packMsg(value) {
+    let buf = new Uint8Array(256);
+    let view = new DataView(buf.buffer);
+    let pos = 0;
+    function room(n) {
+        if (pos + n <= buf.length) return;
+        let size = buf.length * 2;
+        while (size < pos + n) size *= 2;
+        const next = new Uint8Array(size);
+        next.set(buf.subarray(0, pos));
+        buf = next;
+        view = new DataView(buf.buffer);
+    }
+    function byte(b) { room(1); buf[pos++] = b; }
+    function head(n, fix, fixMax, c8, c16, c32) {
+        room(5);
+        if (n <= fixMax) buf[pos++] = fix | n;
+        else if (c8 && n < 0x100) { buf[pos++] = c8; buf[pos++] = n; }
+        else if (n < 0x10000) { buf[pos++] = c16; view.setUint16(pos, n); pos += 2; }
+        else { buf[pos++] = c32; view.setUint32(pos, n); pos += 4; }
+    }
+    function int(n) {
+        room(9);
+        if (n >= 0 && n < 0x80) buf[pos++] = n;
+        else if (n >= -32 && n < 0) buf[pos++] = n & 0xff;
+        else if (n >= -0x80000000 && n <= 0x7fffffff) { buf[pos++] = 0xd2; view.setInt32(pos, n); pos += 4; }
+        else { buf[pos++] = 0xd3; view.setBigInt64(pos, BigInt(n)); pos += 8; }
+    }
+    function ext(code, bytes) {
+        head(bytes.length, 0, -1, 0xc7, 0xc8, 0xc9);
+        room(1 + bytes.length);
+        buf[pos++] = code;
+        buf.set(bytes, pos);
+        pos += bytes.length;
+    }
+    // Like JSON: integral numbers are ints to Python, so a float array must
+    // hold no integral values
+    function typed(arr) {
+        if (arr.length < TYPED_MIN) return false;
+        let ints = true, floats = true;
+        for (const v of arr) {
+            if (typeof v !== "number") return false;
+            if (Number.isInteger(v)) { floats = false; if (v < -0x80000000 || v > 0x7fffffff) ints = false; }
+            else { ints = false; if (!Number.isFinite(v)) floats = false; }
+            if (!ints && !floats) return false;
+        }
+        const data = new DataView(new ArrayBuffer(arr.length * (ints ? 4 : 8)));
+        arr.forEach((v, i) => ints ? data.setInt32(i * 4, v, true) : data.setFloat64(i * 8, v, true));
+        ext(ints ? EXT_INT32 : EXT_FLOAT64, new Uint8Array(data.buffer));
+        return true;
+    }
+    function write(v) {
+        if (v === null || v === undefined) byte(0xc0);
+        else if (v === true) byte(0xc3);
+        else if (v === false) byte(0xc2);
+        else if (typeof v === "number") {
+            if (Number.isSafeInteger(v)) int(v);
+            else { room(9); buf[pos++] = 0xcb; view.setFloat64(pos, v); pos += 8; }
+        } else if (typeof v === "string") {
+            const b = utf8Encoder.encode(v);
+            head(b.length, 0xa0, 31, 0xd9, 0xda, 0xdb);
+            room(b.length);
+            buf.set(b, pos);
+            pos += b.length;
+        } else if (Array.isArray(v)) {
+            if (typed(v)) return;
+            head(v.length, 0x90, 15, 0, 0xdc, 0xdd);
+            for (const x of v) write(x);
+        } else if (ArrayBuffer.isView(v) || v instanceof ArrayBuffer) {
+            const b = bytesOf(v);
+            head(b.length, 0, -1, 0xc4, 0xc5, 0xc6);
+            room(b.length);
+            buf.set(b, pos);
+            pos += b.length;
+        } else if (v instanceof Date) write(v.toISOString());
+        else if (typeof v === "object") {
+            const keys = Object.keys(v);
+            head(keys.length, 0x80, 15, 0, 0xde, 0xdf);
+            for (const k of keys) { write(k); write(v[k]); }
+        } else byte(0xc0);
+    }
+    write(value);
+    return buf.slice(0, pos);
+}
+
+function unpackMsg(bytes) {
+    const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    let pos = 0;
+    function str(n) { const s = utf8Decoder.decode(bytes.subarray(pos, pos + n)); pos += n; return s; }
+    function arr(n) { const a = new Array(n); for (let i = 0; i < n; i++) a[i] = read(); return a; }
+    function map(n) {
+        const o = {};
+        for (let i = 0; i < n; i++) {
+            const k = read();
+            const v = read();
+            // As JSON.parse does: "__proto__" is a key like any other
+            if (k === "__proto__") Object.defineProperty(o, k, { value: v, enumerable: true, writable: true, configurable: true });
+            else o[k] = v;
+        }
+        return o;
+    }
+    function ext(n) {
+        const code = view.getInt8(pos++);
+        const start = pos;
+        pos += n;
+        if (code === EXT_INT32) { const a = new Array(n >> 2); for (let i = 0; i < a.length; i++) a[i] = view.getInt32(start + i * 4, true); return a; }
+        if (code === EXT_FLOAT64) { const a = new Array(n >> 3); for (let i = 0; i < a.length; i++) a[i] = view.getFloat64(start + i * 8, true); return a; }
+        throw new Error(`Unknown extension type ${code}`);
+    }
+    function u8() { return bytes[pos++]; }
+    function u16() { const v = view.getUint16(pos); pos += 2; return v; }
+    function u32() { const v = view.getUint32(pos); pos += 4; return v; }
+    function bin(n) { const b = bytes.slice(pos, pos + n); pos += n; return b; }
+    function read() {
+        const b = bytes[pos++];
+        if (b < 0x80) return b;
+        if (b < 0x90) return map(b & 0x0f);
+        if (b < 0xa0) return arr(b & 0x0f);
+        if (b < 0xc0) return str(b & 0x1f);
+        if (b >= 0xe0) return b - 0x100;
+        let v;
+        switch (b) {
+            case 0xc0: return null;
+            case 0xc2: return false;
+            case 0xc3: return true;
+            case 0xc4: return bin(u8());
+            case 0xc5: return bin(u16());
+            case 0xc6: return bin(u32());
+            case 0xc7: return ext(u8());
+            case 0xc8: return ext(u16());
+            case 0xc9: return ext(u32());
+            case 0xca: v = view.getFloat32(pos); pos += 4; return v;
+            case 0xcb: v = view.getFloat64(pos); pos += 8; return v;
+            case 0xcc: return u8();
+            case 0xcd: return u16();
+            case 0xce: return u32();
+            case 0xcf: v = Number(view.getBigUint64(pos)); pos += 8; return v;
+            case 0xd0: return view.getInt8(pos++);
+            case 0xd1: v = view.getInt16(pos); pos += 2; return v;
+            case 0xd2: v = view.getInt32(pos); pos += 4; return v;
+            case 0xd3: v = Number(view.getBigInt64(pos)); pos += 8; return v;
+            case 0xd4: return ext(1);
+            case 0xd5: return ext(2);
+            case 0xd6: return ext(4);
+            case 0xd7: return ext(8);
+            case 0xd8: return ext(16);
+            case 0xd9: return str(u8());
+            case 0xda: return str(u16());
+            case 0xdb: return str(u32());
+            case 0xdc: return arr(u16());
+            case 0xdd: return arr(u32());
+            case 0xde: return map(u16());
+            case 0xdf: return map(u32());
+        }
+        throw new Error(`Unknown MessagePack byte 0x${b.toString(16)} at ${pos - 1}`);
+    }
+    const value = read();
+    if (pos !== bytes.length) throw new Error("Trailing bytes after MessagePack value");
+    return value;
+}
+
+// Raw DEFLATE (RFC 1951) decoder. Synchronous, unlike DecompressionStream,
+// so a deflated frame is decoded in the change handler that receives it.
+const LEN_BASE = [3, 4, 5, 6, 7, 8, 9, 10, 11, 13, 15, 17, 19, 23, 27, 31, 35, 43, 51, 59, 67, 83, 99, 115, 131, 163, 195, 227, 258];
+const LEN_EXTRA = [0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 2, 3, 3, 3, 3, 4, 4, 4, 4, 5, 5, 5, 5, 0];
+const DIST_BASE = [1, 2, 3, 4, 5, 7, 9, 13, 17, 25, 33, 49, 65, 97, 129, 193, 257, 385, 513, 769, 1025, 1537, 2049, 3073, 4097, 6145, 8193, 12289, 16385, 24577];
+const DIST_EXTRA = [0, 0, 0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6, 7, 7, 8, 8, 9, 9, 10, 10, 11, 11, 12, 12, 13, 13];
+const CODE_ORDER = [16, 17, 18, 0, 8, 7, 9, 6, 10, 5, 11, 4, 12, 3, 13, 2, 14, 1, 15];
+
+/** Canonical Huffman code from code lengths: symbols grouped by length. */
+function huffman(lengths) {
+    const counts = new Uint16Array(16);
+    for (const n of lengths) counts[n]++;
+    counts[0] = 0;
+    const offsets = new Uint16Array(16);
+    for (let n = 1; n < 16; n++) offsets[n] = offsets[n - 1] + counts[n - 1];
+    const symbols = new Uint16Array(lengths.length);
+    for (let s = 0; s < lengths.length; s++) if (lengths[s]) symbols[offsets[lengths[s]]++] = s;
+    return { counts, symbols };
+}
+
+let fixedCodes = null;
+
+function inflateRaw(src, size) {
+    const out = new Uint8Array(size);
+    let pos = 0, bitBuf = 0, bitCount = 0, n = 0;
+    function bits(k) {
+        while (bitCount < k) {
+            if (pos >= src.length) throw new Error("Truncated deflate stream");
+            bitBuf |= src[pos++] << bitCount;
+            bitCount += 8;
+        }
+        const v = bitBuf & ((1 << k) - 1);
+        bitBuf >>>= k;
+        bitCount -= k;
+        return v;
+    }
+    function symbol(h) {
+        let code = 0, first = 0, index = 0;
+        for (let len = 1; len < 16; len++) {
+            code |= bits(1);
+            const count = h.counts[len];
+            if (code - count < first) return h.symbols[index + (code - first)];
+            index += count;
+            first = (first + count) << 1;
+            code <<= 1;
+        }
+        throw new Error("Bad deflate code");
+    }
+    function codes(lit, dist) {
+        for (;;) {
+            let s = symbol(lit);
+            if (s < 256) { out[n++] = s; continue; }
+            if (s === 256) return;
+            s -= 257;
+            const len = LEN_BASE[s] + bits(LEN_EXTRA[s]);
+            const d = symbol(dist);
+            const back = DIST_BASE[d] + bits(DIST_EXTRA[d]);
+            if (back > n || n + len > size) throw new Error("Bad deflate distance");
+            for (let i = 0; i < len; i++, n++) out[n] = out[n - back];
+        }
+    }
+    function dynamic() {
+        const nlit = bits(5) + 257, ndist = bits(5) + 1, ncode = bits(4) + 4;
+        const lengths = new Uint8Array(19);
+        for (let i = 0; i < ncode; i++) lengths[CODE_ORDER[i]] = bits(3);
+        const lenCode = huffman(lengths);
+        const all = new Uint8Array(nlit + ndist);
+        for (let i = 0; i < nlit + ndist;) {
+            const s = symbol(lenCode);
+            if (s < 16) { all[i++] = s; continue; }
+            let repeat, value = 0;
+            if (s === 16) { if (!i) throw new Error("Bad deflate lengths"); value = all[i - 1]; repeat = 3 + bits(2); }
+            else if (s === 17) repeat = 3 + bits(3);
+            else repeat = 11 + bits(7);
+            if (i + repeat > all.length) throw new Error("Bad deflate lengths");
+            all.fill(value, i, i + repeat);
+            i += repeat;
+        }
+        codes(huffman(all.subarray(0, nlit)), huffman(all.subarray(nlit)));
+    }
+    for (let last = 0; !last;) {
+        last = bits(1);
+        const type = bits(2);
+        if (type === 0) {
+            bitBuf = 0;
+            bitCount = 0;
+            const len = src[pos] | (src[pos + 1] << 8);
+            pos += 4;
+            if (pos + len > src.length || n + len > size) throw new Error("Bad stored block");
+            out.set(src.subarray(pos, pos + len), n);
+            pos += len;
+            n += len;
+        } else if (type === 1) {
+            if (!fixedCodes) {
+                const lit = new Uint8Array(288);
+                lit.fill(8, 0, 144); lit.fill(9, 144, 256); lit.fill(7, 256, 280); lit.fill(8, 280, 288);
+                fixedCodes = [huffman(lit), huffman(new Uint8Array(30).fill(5))];
+            }
+            codes(...fixedCodes);
+        } else if (type === 2) dynamic();
+        else throw new Error("Bad deflate block type");
+    }
+    if (n !== size) throw new Error("Deflate stream size mismatch");
+    return out;
+}
+
+// ---- Instrumentation -----------------------------------------------------------
+// Only used while instrument is "on" or "overlay": render timings and round
+// trips are kept here and reported to Python (a custom message) at most once
+// per PERF_REPORT_MS; Python merges them into stats().
+
+const PERF_KEEP = 256;
+const PERF_REPORT_MS = 1000;
+
+function createPerf(onChange) {
+    const timings = new Map(); // key → { samples, count, total }
+    const started = new Map(); // "key#id" → start time, for round trips
+    let changed = false;
+    const round = x => Math.round(x * 1000) / 1000;
+
+    function add(key, ms) {
+        let t = timings.get(key);
+        if (!t) timings.set(key, t = { samples: [], count: 0, total: 0 });
+        t.samples.push(ms);
+        if (t.samples.length > PERF_KEEP) t.samples.shift();
+        t.count += 1;
+        t.total += ms;
+        changed = true;
+        onChange();
+    }
+
+    return {
+        add,
+        /** A request went out; end() with the same key and id when its answer arrives. */
+        begin(key, id = "") {
+            const k = `${key}#${id}`;
+            if (!started.has(k)) started.set(k, performance.now());
+        },
+        end(key, id = "") {
+            const k = `${key}#${id}`;
+            const t0 = started.get(k);
+            if (t0 === undefined) return;
+            started.delete(k);
+            add(`roundtrip.${key}`, performance.now() - t0);
+        },
+        /** Forget round trips still waiting for an answer (e.g. after a resync). */
+        abandon(key) {
+            for (const k of started.keys()) if (k.startsWith(`${key}#`)) started.delete(k);
+        },
+        /** Summaries in the shape of Python's (see _stats.py); null if nothing new. */
+        takeSnapshot() {
+            if (!changed) return null;
+            changed = false;
+            const out = {};
+            for (const [key, t] of [...timings].sort(([a], [b]) => (a < b ? -1 : 1))) {
+                const s = [...t.samples].sort((a, b) => a - b);
+                const q = p => s[Math.min(s.length - 1, Math.floor(p * s.length))];
+                out[key] = {
+                    count: t.count,
+                    mean_ms: round(t.total / t.count),
+                    p50_ms: round(q(0.5)),
+                    p95_ms: round(q(0.95)),
+                    max_ms: round(s[s.length - 1]),
+                    last_ms: round(t.samples[t.samples.length - 1]),
+                };
+            }
+            return out;
+        },
+        clear() {
+            timings.clear();
+            started.clear();
+            changed = false;
+        },
+    };
+}
+
+function formatBytes(n) {
+    if (n < 1024) return `${n} B`;
+    if (n < 1024 * 1024) return `${(n / 1024).toFixed(1)} KB`;
+    return `${(n / 1024 / 1024).toFixed(1)} MB`;
+}
+
 // ---- Module entry -------------------------------------------------------------
 
+// The codec on its own, for benchmarks/check_wire.py
+export { encodeWire, wireValue };
+
 export default {
     render({ model, el }) {
         el.innerHTML = "";
@@ -86,43 +662,210 @@ export default {
         el.appendChild(root);
 
         // ---- History -----------------------------------------------------------------
+        // Each entry is {ops, inverse, version}: undo replays the inverse ops,
+        // redo the forward ones, so neither touches more than the edited values.
+        // version (the document version the edit produced) identifies the entry
+        // to Python, which mirrors this stack. history_limit caps the entries.
         let history = [];
-        let hIndex = -1;
-        // Guards to prevent change:data from resetting history inappropriately
-        let _localChange = false;      // set during commitChange (user edit)
-        let _applyingSnapshot = false; // set during applySnapshot (undo/redo)
-
-        function pushHistory(snapshot) {
-            history = history.slice(0, hIndex + 1);
-            history.push(snapshot);
-            hIndex = history.length - 1;
+        let hIndex = 0; // number of entries currently applied
+
+        function pushHistory(ops, inverse, version) {
+            history.length = hIndex;
+            history.push({ ops, inverse, version });
+            const excess = history.length - Math.max(1, model.get("history_limit") || 100);
+            if (excess > 0) history.splice(0, excess);
+            hIndex = history.length;
         }
         function canUndo() { return hIndex > 0; }
-        function canRedo() { return hIndex < history.length - 1; }
-
-        function applySnapshot(snapshot) {
-            _applyingSnapshot = true;
-            model.set("data", deepClone(snapshot));
-            model.save_changes();
-            _applyingSnapshot = false;
+        function canRedo() { return hIndex < history.length; }
+
+        // After a reload only Python still has the history; fall back to it.
+        function undo() {
+            if (canUndo()) {
+                hIndex -= 1;
+                batched(() => {
+                    sendOps(history[hIndex].inverse, "undo", history[hIndex].version);
+                    renderAll();
+                });
+            } else if (model.get("can_undo")) {
+                sendCommand("undo");
+            }
         }
-
-        function resetHistoryToCurrent() {
-            history = [];
-            hIndex = -1;
-            pushHistory(deepClone(model.get("data") || {}));
+        function redo() {
+            if (canRedo()) {
+                batched(() => {
+                    sendOps(history[hIndex].ops, "redo", history[hIndex].version);
+                    hIndex += 1;
+                    renderAll();
+                });
+            } else if (model.get("can_redo")) {
+                sendCommand("redo");
+            }
+        }
+        function syncUndoButtons() {
+            undoBtn.disabled = !(canUndo() || model.get("can_undo"));
+            redoBtn.disabled = !(canRedo() || model.get("can_redo"));
         }
 
-        function ensureHistoryInit() {
-            if (history.length === 0) pushHistory(deepClone(model.get("data") || {}));
+        function resetHistory() {
+            history = [];
+            hIndex = 0;
         }
 
         // ---- UI state ----------------------------------------------------------------
         let activeTab = "root";
-        let searchQuery = "";
         const expanded = new Set();
         let expandedInitialized = false;
         let isDirty = false;
+        let renderedVersion = -1;
+
+        // ---- Instrumentation (instrument != "off") ------------------------------------
+        const perf = createPerf(scheduleReport);
+        let reportTimer = null;
+
+        function instrumented() { return (model.get("instrument") || "off") !== "off"; }
+
+        function scheduleReport() {
+            if (reportTimer) return;
+            reportTimer = setTimeout(() => { reportTimer = null; sendReport(); }, PERF_REPORT_MS);
+        }
+
+        function sendReport() {
+            if (!instrumented()) return;
+            const timings = perf.takeSnapshot();
+            if (!timings) return;
+            model.send({ type: "stats", frontend: { timings, history: historySize() } });
+        }
+
+        function historySize() {
+            let bytes = 0;
+            for (const e of history) bytes += (e.nbytes ??= JSON.stringify([e.ops, e.inverse]).length);
+            return { entries: history.length, bytes };
+        }
+
+        // ---- Requests (see _on_request in _widget.py) -----------------------------------
+        // Commands go to Python as custom messages: {type: "request", batch:
+        // [{id, command, payload}, ...]}, answered by one {type: "reply",
+        // replies: [{id, ok, result | error}, ...]} after the whole batch ran.
+        // sendCommand returns a promise of the result; commands issued inside
+        // batched() share one message. With wire="binary" the batch (and the
+        // replies) travel as a single frame.
+        const viewId = Math.random().toString(36).slice(2, 10); // views share the model's messages
+        const pendingReplies = new Map(); // id → {resolve, reject}
+        let requestSeq = 0;
+        let outbox = null; // requests of the open batch
+
+        function sendCommand(type, payload) {
+            const id = `${viewId}:${++requestSeq}`;
+            const request = { id, command: type, payload: payload || {} };
+            const reply = new Promise((resolve, reject) => pendingReplies.set(id, { resolve, reject }));
+            // Python also reports failures in status; callers may still catch them
+            reply.catch(err => console.warn(`marimo-toml-editor: ${type}: ${err.message}`));
+            if (outbox) outbox.push(request);
+            else postRequests([request]);
+            return reply;
+        }
+
+        function batched(fn) {
+            if (outbox) return fn();
+            outbox = [];
+            try {
+                return fn();
+            } finally {
+                const requests = outbox;
+                outbox = null;
+                if (requests.length) postRequests(requests);
+            }
+        }
+
+        function postRequests(batch) {
+            if (model.get("wire") === "binary") {
+                const { buffer, ...frame } = encodeWire(batch);
+                model.send({ type: "request", batch: frame }, undefined, [buffer]);
+            } else {
+                model.send({ type: "request", batch });
+            }
+            if (batch.some(r => PUBLISHED_COMMANDS.has(r.command))) notePublishable();
+        }
+
+        function onReplies(msg, buffers) {
+            let replies = msg.replies || [];
+            if (isFrame(replies)) replies = wireValue({ ...replies, buffer: buffers[0] });
+            for (const r of replies) {
+                const pending = pendingReplies.get(r.id);
+                if (!pending) continue; // another view's request
+                pendingReplies.delete(r.id);
+                if (r.ok) pending.resolve(r.result);
+                else pending.reject(new Error(r.error || "Command failed"));
+            }
+        }
+
+        // ---- Publication ----------------------------------------------------------------
+        // marimo re-runs the cells that read the widget's value when the
+        // frontend saves model changes; requests don't, so the value is
+        // published (published bumped and saved) after each document-changing
+        // request, or with publish="deferred" only on Apply, when focus leaves
+        // the widget, or publish_delay seconds after the last edit.
+        const PUBLISHED_COMMANDS = new Set(["patch", "undo", "redo", "load_raw", "mac_native_open", "resolve_conflict"]);
+        let unpublished = false;
+        let publishTimer = null;
+
+        function deferred() { return model.get("publish") === "deferred"; }
+
+        function notePublishable() {
+            unpublished = true;
+            if (!deferred()) { publish(); return; }
+            syncApplyButton();
+            clearTimeout(publishTimer);
+            const delay = model.get("publish_delay") || 0;
+            if (delay > 0) publishTimer = setTimeout(publish, delay * 1000);
+        }
+
+        function publish() {
+            clearTimeout(publishTimer);
+            publishTimer = null;
+            if (!unpublished) return;
+            unpublished = false;
+            syncApplyButton();
+            model.set("published", (model.get("published") || 0) + 1);
+            model.save_changes();
+        }
+
+        function syncApplyButton() {
+            applyBtn.classList.toggle("visible", deferred());
+            applyBtn.disabled = !unpublished;
+        }
+
+        // ---- Lazy tables -------------------------------------------------------------
+        // Tables listed in table_index arrive as empty stand-ins; their bodies
+        // are asked for when the tab opens. Only the HYDRATED_KEPT most
+        // recently opened bodies are kept: older ones are emptied again and
+        // handed back to Python, which resends them if the tab is reopened.
+        const HYDRATED_KEPT = 8;
+        const requestedTables = new Set(); // bodies asked for
+        const hydrated = [];               // fetched bodies, most recently opened first
+        const evicted = new Map();         // handed back, until table_index says so
+
+        function pendingTable(key) {
+            return (model.get("table_index") || {})[key] || evicted.get(key) || null;
+        }
+
+        function touchHydrated(key) {
+            const i = hydrated.indexOf(key);
+            if (i === 0) return;
+            if (i > 0) hydrated.splice(i, 1);
+            hydrated.unshift(key);
+            if (hydrated.length <= HYDRATED_KEPT || model.get("hydration") === "full") return;
+            const keys = hydrated.splice(HYDRATED_KEPT);
+            const data = synced(model, "data") || {};
+            for (const k of keys) {
+                evicted.set(k, { type: "table", size: Object.keys(data[k] || {}).length });
+                requestedTables.delete(k);
+                data[k] = {};
+            }
+            trackOps(keys.map(k => ({ op: "replace", path: [k], value: {} })));
+            sendCommand("evict_tables", { keys });
+        }
 
         function expandAllTablesByDefault(data) {
             function walk(obj, basePath) {
@@ -138,14 +881,8 @@ export default {
             walk(data, "");
         }
 
-        function sendCommand(type, payload) {
-            model.set("command", type);
-            model.set("command_payload", payload || {});
-            model.set("command_nonce", (model.get("command_nonce") || 0) + 1);
-            model.save_changes();
-        }
-
         function topLevelSplit(data) {
+            if (splitCache && splitCache.data === data) return splitCache.split;
             const rootScalars = {};
             const tables = {};
             for (const k of keysSorted(data)) {
@@ -153,7 +890,9 @@ export default {
                 if (v && typeof v === "object" && !Array.isArray(v)) tables[k] = v;
                 else rootScalars[k] = v;
             }
-            return { rootScalars, tables };
+            const split = { rootScalars, tables };
+            splitCache = { data, split };
+            return split;
         }
 
         function markDirty() {
@@ -165,19 +904,419 @@ export default {
             if (dirtyDot) dirtyDot.classList.remove("visible");
         }
 
+        // sendOps: apply ops to the local document and ship only the delta.
+        // Python acks by bumping data_version; a mismatch triggers a resync.
+        // origin ("edit", "undo" or "redo") and entry tell Python how to
+        // update its mirror of the history.
+        function sendOps(ops, origin = "edit", entry = null) {
+            const data = synced(model, "data") || {};
+            const meta = docMeta(model, data);
+            const inverse = applyOps(data, ops);
+            trackOps(ops);
+            sendCommand("patch", { epoch: meta.epoch, base: meta.version, ops, origin, entry });
+            meta.version += 1;
+            if (instrumented()) perf.begin("patch", meta.version);
+            return inverse;
+        }
+
         // commitChange: user made an edit in the UI
-        // _localChange flag prevents the resulting change:data event from resetting history
-        function commitChange(mutator) {
-            ensureHistoryInit();
-            const data = deepClone(model.get("data") || {});
-            mutator(data);
-            _localChange = true;
-            model.set("data", data);
-            model.save_changes();
-            _localChange = false;
-            pushHistory(deepClone(data));
-            markDirty();
+        function commitChange(ops) {
+            if (!ops.length) return;
+            batched(() => {
+                const inverse = sendOps(ops);
+                pushHistory(ops, inverse, docMeta(model, synced(model, "data")).version);
+                markDirty();
+                renderAll();
+            });
+        }
+
+        // ---- Keyed rendering ----------------------------------------------------------
+        // Rows are cached by TOML path and reused across renders unless an op
+        // touched that path (or something below it), so an edit rebuilds its own
+        // row rather than the panel. Cards are cached by table path and windows
+        // by scroller key; anything a render leaves detached is dropped.
+        const rowCache = new Map();    // path → { el, value, open, group, epoch }
+        const cardCache = new Map();   // table path → { card, header, body }
+        const sortCache = new Map();   // table path → { obj, keys }
+        const tabCache = new Map();    // tab name → button
+        const dirtyPaths = new Set();  // paths an op touched, with their ancestors
+        const dirtyKeys = new Set();   // tables whose set of keys changed
+        let splitCache = null;         // { data, split } for topLevelSplit
+        let uiEpoch = 0;               // bumped when the search results change
+
+        /** Note applied ops: mark what must re-render and re-index what changed. */
+        function trackOps(ops) {
+            if (keyIndex) {
+                // A half-built index may still walk the old values; start over
+                if (keyIndex.ready) keyIndex.update(synced(model, "data") || {}, ops);
+                else keyIndex = null;
+            }
+            if (searchState) scheduleSearch();
+            for (const op of ops) {
+                const path = op.path || [];
+                if (path.length === 0) { clearRenderCaches(); return; }
+                // An add may also create a top-level table on its way down
+                if (path.length === 1 || op.op === "add") splitCache = null;
+                let p = "";
+                for (let i = 0; i < path.length; i++) {
+                    // An add may create intermediate tables, so every ancestor's
+                    // key set is suspect, not just the direct parent's.
+                    if (op.op !== "replace") dirtyKeys.add(p);
+                    p = p ? `${p}.${path[i]}` : String(path[i]);
+                    dirtyPaths.add(p);
+                }
+            }
+        }
+
+        function clearRenderCaches() {
+            if (keyIndex) {
+                keyIndex = null;
+                if (searchState) scheduleSearch();
+            }
+            rowCache.clear();
+            cardCache.clear();
+            sortCache.clear();
+            windowCache.clear();
+            splitCache = null;
+            dirtyPaths.clear();
+            dirtyKeys.clear();
+        }
+
+        function sweepRenderCaches() {
+            for (const [k, c] of rowCache) if (!c.el.isConnected) rowCache.delete(k);
+            for (const [k, c] of cardCache) if (!c.card.isConnected) { cardCache.delete(k); sortCache.delete(k); }
+            for (const [k, w] of windowCache) if (!w.el.isConnected) windowCache.delete(k);
+            for (const [k, b] of tabCache) if (!b.isConnected) tabCache.delete(k);
+            dirtyPaths.clear();
+            dirtyKeys.clear();
+        }
+
+        function sortedKeys(obj, path) {
+            const c = sortCache.get(path);
+            if (c && c.obj === obj && !dirtyKeys.has(path)) return c.keys;
+            const keys = keysSorted(obj);
+            sortCache.set(path, { obj, keys });
+            return keys;
+        }
+
+        /** Make parent's children exactly els, moving only what is out of place. */
+        function reconcileChildren(parent, els) {
+            let cur = parent.firstChild;
+            for (const child of els) {
+                if (child === cur) { cur = cur.nextSibling; continue; }
+                parent.insertBefore(child, cur);
+            }
+            while (cur) {
+                const next = cur.nextSibling;
+                parent.removeChild(cur);
+                cur = next;
+            }
+        }
+
+        // ---- Search --------------------------------------------------------------------
+        // The search box looks through every key path in the document (and,
+        // when toggled, every value) via a key index built on first use and kept
+        // current by ops. Input is debounced and matching runs in frame-sized
+        // slices. Results can jump to any tab; the active tab shows only rows
+        // that match or lead to a match.
+        const SEARCH_DEBOUNCE_MS = 120;
+        const SEARCH_SLICE_MS = 8;
+        const SEARCH_RESULTS_SHOWN = 50;
+        let keyIndex = null;
+        let searchValues = false;
+        let searchState = null;  // { query, matches, tabs, filters } of the last search
+        let searchTimer = 0;
+        let searchFrame = 0;
+        let jumpWhenDone = false;
+
+        function scheduleSearch(delay = SEARCH_DEBOUNCE_MS) {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(runSearch, delay);
+        }
+
+        function runSearch() {
+            cancelAnimationFrame(searchFrame);
+            const query = searchBox.value.trim().toLowerCase();
+            if (!query) {
+                jumpWhenDone = false;
+                if (searchState) { searchState = null; showSearch(); }
+                return;
+            }
+            if (!keyIndex) {
+                keyIndex = createKeyIndex();
+                keyIndex.building = keyIndex.build(synced(model, "data") || {});
+            }
+            const index = keyIndex;
+            let job = null;
+            const step = () => {
+                if (index !== keyIndex) { scheduleSearch(0); return; } // reset mid-way
+                if (!index.ready) {
+                    index.ready = index.building.step(SEARCH_SLICE_MS);
+                } else {
+                    job = job || index.search(query, searchValues);
+                    if (job.step(SEARCH_SLICE_MS)) { finishSearch(query, job.matches); return; }
+                }
+                searchFrame = requestAnimationFrame(step);
+            };
+            step();
+        }
+
+        function finishSearch(query, matches) {
+            const tabCounts = new Map();
+            for (const e of matches) tabCounts.set(e.tab, (tabCounts.get(e.tab) || 0) + 1);
+            searchState = { query, matches, tabs: tabCounts, filters: new Map() };
+            showSearch();
+            if (jumpWhenDone) {
+                jumpWhenDone = false;
+                if (matches.length) jumpTo(matches[0]);
+            }
+        }
+
+        /** Paths to show in a tab: its matches and their ancestors. Built per tab on demand. */
+        function searchFilter(tab) {
+            let f = searchState.filters.get(tab);
+            if (f) return f;
+            f = { shown: new Set(), direct: new Set() };
+            for (const e of searchState.matches) {
+                if (e.tab !== tab) continue;
+                f.direct.add(e.path);
+                for (let i = e.segs.length; i > 0; i--) {
+                    const p = i === e.segs.length ? e.path : e.segs.slice(0, i).join(".");
+                    if (f.shown.has(p)) break;
+                    f.shown.add(p);
+                }
+            }
+            searchState.filters.set(tab, f);
+            return f;
+        }
+
+        /** Keys of obj (at basePath) the search leaves visible. */
+        function searchVisible(ks, basePath) {
+            if (!searchState) return ks;
+            const { shown, direct } = searchFilter(activeTab);
+            // Everything under a matching table is shown unfiltered
+            let p = "";
+            for (const seg of basePath ? basePath.split(".") : []) {
+                p = p ? `${p}.${seg}` : seg;
+                if (direct.has(p)) return ks;
+            }
+            return ks.filter(k => shown.has(basePath ? `${basePath}.${k}` : k));
+        }
+
+        function showSearch() {
+            uiEpoch += 1;
+            renderAll();
+            searchResults.innerHTML = "";
+            searchResults.classList.toggle("visible", !!searchState);
+            if (!searchState) return;
+            const { matches, tabs: tabCounts } = searchState;
+            const summary = document.createElement("div");
+            summary.className = "search-summary";
+            summary.textContent = matches.length
+                ? `${matches.length} match${matches.length === 1 ? "" : "es"} in ${tabCounts.size} tab${tabCounts.size === 1 ? "" : "s"}`
+                : `No keys match "${searchState.query}".`;
+            searchResults.appendChild(summary);
+            for (const e of matches.slice(0, SEARCH_RESULTS_SHOWN)) {
+                const b = document.createElement("button");
+                b.type = "button";
+                b.className = "search-result";
+                b.textContent = e.path;
+                if (e.tab !== activeTab) {
+                    const t = document.createElement("span");
+                    t.className = "search-tab";
+                    t.textContent = e.tab;
+                    b.appendChild(t);
+                }
+                b.onclick = () => jumpTo(e);
+                searchResults.appendChild(b);
+            }
+            if (matches.length > SEARCH_RESULTS_SHOWN) {
+                const more = document.createElement("div");
+                more.className = "hint";
+                more.textContent = `…and ${matches.length - SEARCH_RESULTS_SHOWN} more; refine the search to narrow them.`;
+                searchResults.appendChild(more);
+            }
+        }
+
+        /** Open the match's tab, unfold its tables, scroll to it and focus it. */
+        function jumpTo(entry) {
+            activeTab = entry.tab;
+            let p = "";
+            for (const seg of entry.segs.slice(0, -1)) {
+                p = p ? `${p}.${seg}` : seg;
+                expanded.add(p);
+            }
             renderAll();
+            if (entry.tab === "root" || entry.segs.length > 1) {
+                const win = windowCache.get(`card:${entry.segs.slice(0, -1).join(".")}`);
+                if (win) win.reveal(entry.segs[entry.segs.length - 1]);
+            }
+            // Keys inside an inline table have no row of their own; use the nearest one
+            const rows = new Map(Array.prototype.map.call(panel.querySelectorAll("[data-path]"), r => [r.dataset.path, r]));
+            let row = null;
+            for (let i = entry.segs.length; i > 0 && !row; i--) row = rows.get(entry.segs.slice(0, i).join(".")) || null;
+            if (!row) return;
+            if (row.scrollIntoView) row.scrollIntoView({ block: "nearest" });
+            const target = row.querySelector("input,select,textarea");
+            if (target) target.focus();
+            row.classList.add("search-hit");
+            setTimeout(() => row.classList.remove("search-hit"), 1200);
+        }
+
+        // ---- Windowed rendering -----------------------------------------------------
+        // Tables and lists longer than VIRTUAL_THRESHOLD only keep the rows in
+        // view (plus OVERSCAN on each side) in the DOM, inside a fixed-height
+        // scroller. Row heights are measured once rendered and cached per
+        // scroller; rows not seen yet count as ROW_ESTIMATE. Scroll offsets are
+        // kept per scroller so they survive re-renders.
+        const VIRTUAL_THRESHOLD = 150;
+        const OVERSCAN = 8;
+        const ROW_ESTIMATE = 36;
+        const VIEWPORT_HEIGHT = 520;
+        const rowHeights = new Map(); // scroller key → Map(row key → px)
+        const scrollTops = new Map(); // scroller key → scrollTop
+
+        const windowCache = new Map(); // scroller key → window
+
+        // A window persists per scroller key, so re-renders reconcile its rows
+        // instead of rebuilding the scroller. update() takes the new row count
+        // and callbacks; rows painted since the last update are reused on scroll.
+        function windowFor(scrollKey) {
+            const cached = windowCache.get(scrollKey);
+            if (cached) return cached;
+
+            const viewport = document.createElement("div");
+            viewport.className = "vscroll";
+            viewport.style.maxHeight = `${VIEWPORT_HEIGHT}px`;
+            const topPad = document.createElement("div");
+            const rows = document.createElement("div");
+            rows.className = "vscroll-rows";
+            const bottomPad = document.createElement("div");
+            viewport.appendChild(topPad); viewport.appendChild(rows); viewport.appendChild(bottomPad);
+
+            if (!rowHeights.has(scrollKey)) rowHeights.set(scrollKey, new Map());
+            const heights = rowHeights.get(scrollKey);
+            let count = 0;
+            let keyAt = i => i;
+            let renderRow = () => document.createElement("div");
+            let offsets = new Float64Array(1);
+            let painted = new Map(); // row key → element, since the last update()
+
+            function layout() {
+                if (offsets.length !== count + 1) offsets = new Float64Array(count + 1);
+                for (let i = 0; i < count; i++) offsets[i + 1] = offsets[i] + (heights.get(keyAt(i)) || ROW_ESTIMATE);
+            }
+            function indexAt(y) {
+                let lo = 0, hi = count;
+                while (lo < hi) {
+                    const mid = (lo + hi) >> 1;
+                    if (offsets[mid + 1] <= y) lo = mid + 1; else hi = mid;
+                }
+                return lo;
+            }
+
+            function paint() {
+                const top = viewport.scrollTop;
+                const start = Math.max(0, indexAt(top) - OVERSCAN);
+                const end = Math.min(count, indexAt(top + (viewport.clientHeight || VIEWPORT_HEIGHT)) + 1 + OVERSCAN);
+                const next = new Map();
+                const els = [];
+                for (let i = start; i < end; i++) {
+                    const key = keyAt(i);
+                    const row = painted.get(key) || renderRow(i);
+                    next.set(key, row);
+                    els.push(row);
+                }
+                painted = next;
+                reconcileChildren(rows, els);
+                // Measure from one row's top to the next so gaps are included
+                let changed = false;
+                for (let i = 0; i < els.length; i++) {
+                    const h = i + 1 < els.length && els[i + 1].offsetTop
+                        ? els[i + 1].offsetTop - els[i].offsetTop
+                        : els[i].offsetHeight;
+                    if (h && heights.get(keyAt(start + i)) !== h) { heights.set(keyAt(start + i), h); changed = true; }
+                }
+                if (changed) layout();
+                topPad.style.height = `${offsets[start]}px`;
+                bottomPad.style.height = `${offsets[count] - offsets[end]}px`;
+            }
+
+            let frame = 0;
+            viewport.addEventListener("scroll", () => {
+                scrollTops.set(scrollKey, viewport.scrollTop);
+                if (!frame) frame = requestAnimationFrame(() => { frame = 0; paint(); });
+            });
+
+            const win = {
+                el: viewport,
+                update(n, keyFn, rowFn) {
+                    count = n; keyAt = keyFn; renderRow = rowFn;
+                    painted = new Map();
+                    layout();
+                    bottomPad.style.height = `${offsets[count]}px`;
+                    pendingWindows.add(win);
+                },
+                /** Scroll the row with this key into view; false if absent. */
+                reveal(key) {
+                    for (let i = 0; i < count; i++) {
+                        if (keyAt(i) !== key) continue;
+                        viewport.scrollTop = Math.max(0, offsets[i] - ROW_ESTIMATE);
+                        scrollTops.set(scrollKey, viewport.scrollTop);
+                        paint();
+                        return true;
+                    }
+                    return false;
+                },
+                // Runs once the scroller is attached: a detached element can't
+                // be scrolled, and a re-attached one may have lost its offset.
+                attach() {
+                    const saved = scrollTops.get(scrollKey) || 0;
+                    if (viewport.scrollTop !== saved) viewport.scrollTop = saved;
+                    paint();
+                },
+            };
+            windowCache.set(scrollKey, win);
+            return win;
+        }
+
+        const pendingWindows = new Set();
+        function flushWindows() {
+            for (const win of pendingWindows) win.attach();
+            pendingWindows.clear();
+        }
+
+        // Rows and list items carry data-path; focus is remembered as that path
+        // plus the index of the focused control inside it, so it can be put back
+        // after the row is rebuilt.
+        const FOCUSABLE = "input,select,textarea,button";
+
+        function captureFocus() {
+            const rootNode = el.getRootNode ? el.getRootNode() : document;
+            const active = rootNode.activeElement;
+            if (!active || !panel.contains(active)) return null;
+            const row = active.closest("[data-path]");
+            if (!row) return null;
+            return {
+                el: active,
+                path: row.dataset.path,
+                index: Array.prototype.indexOf.call(row.querySelectorAll(FOCUSABLE), active),
+                start: active.selectionStart,
+                end: active.selectionEnd,
+            };
+        }
+
+        function restoreFocus(saved) {
+            if (!saved) return;
+            const rootNode = el.getRootNode ? el.getRootNode() : document;
+            if (saved.el.isConnected && rootNode.activeElement === saved.el) return; // row was reused
+            const row = Array.prototype.find.call(panel.querySelectorAll("[data-path]"), r => r.dataset.path === saved.path);
+            const target = row && row.querySelectorAll(FOCUSABLE)[saved.index];
+            if (!target) return;
+            target.focus();
+            if (typeof saved.start === "number" && target.setSelectionRange) {
+                try { target.setSelectionRange(saved.start, saved.end); } catch (_) { /* not a text input */ }
+            }
         }
 
         // ---- Value editors -----------------------------------------------------------
@@ -200,73 +1339,72 @@ export default {
                 return "string";
             }
 
-            const current = deepClone(arr);
+            const base = pathOf(fullPath);
+            const current = arr;
 
-            current.forEach((item, idx) => {
+            function renderItem(idx) {
+                const item = current[idx];
                 const row = document.createElement("div");
                 row.className = "list-item";
+                row.dataset.path = `${fullPath}[${idx}]`;
 
                 let inp;
                 if (typeof item === "boolean") {
                     inp = document.createElement("select");
                     inp.innerHTML = `<option value="true">true</option><option value="false">false</option>`;
                     inp.value = String(item);
-                    inp.onchange = () => commitChange(d => {
-                        const a = deepClone(getByPath(d, fullPath) || []);
-                        a[idx] = inp.value === "true";
-                        setByPath(d, fullPath, a);
-                    });
+                    inp.onchange = () => commitChange([
+                        { op: "replace", path: [...base, idx], value: inp.value === "true" },
+                    ]);
                 } else if (typeof item === "number") {
                     inp = document.createElement("input");
                     inp.type = "number"; inp.className = "num"; inp.value = String(item);
                     inp.onchange = () => {
                         const n = Number(inp.value);
-                        commitChange(d => {
-                            const a = deepClone(getByPath(d, fullPath) || []);
-                            a[idx] = Number.isFinite(n) ? n : 0;
-                            setByPath(d, fullPath, a);
-                        });
+                        commitChange([
+                            { op: "replace", path: [...base, idx], value: Number.isFinite(n) ? n : 0 },
+                        ]);
                     };
                 } else {
                     inp = document.createElement("input");
                     inp.type = "text"; inp.className = "text";
                     inp.value = item == null ? "" : String(item);
-                    inp.onchange = () => commitChange(d => {
-                        const a = deepClone(getByPath(d, fullPath) || []);
-                        a[idx] = inp.value;
-                        setByPath(d, fullPath, a);
-                    });
+                    inp.onchange = () => commitChange([
+                        { op: "replace", path: [...base, idx], value: inp.value },
+                    ]);
                 }
 
                 const upBtn = iconBtn("↑", "Move up");
                 upBtn.disabled = idx === 0;
-                upBtn.onclick = () => commitChange(d => {
-                    const a = deepClone(getByPath(d, fullPath) || []);
-                    [a[idx - 1], a[idx]] = [a[idx], a[idx - 1]];
-                    setByPath(d, fullPath, a);
-                });
+                upBtn.onclick = () => commitChange([
+                    { op: "replace", path: [...base, idx - 1], value: current[idx] },
+                    { op: "replace", path: [...base, idx], value: current[idx - 1] },
+                ]);
 
                 const downBtn = iconBtn("↓", "Move down");
                 downBtn.disabled = idx === current.length - 1;
-                downBtn.onclick = () => commitChange(d => {
-                    const a = deepClone(getByPath(d, fullPath) || []);
-                    [a[idx], a[idx + 1]] = [a[idx + 1], a[idx]];
-                    setByPath(d, fullPath, a);
-                });
+                downBtn.onclick = () => commitChange([
+                    { op: "replace", path: [...base, idx], value: current[idx + 1] },
+                    { op: "replace", path: [...base, idx + 1], value: current[idx] },
+                ]);
 
                 const delBtn = iconBtn("✕", "Remove", "danger");
-                delBtn.onclick = () => commitChange(d => {
-                    const a = deepClone(getByPath(d, fullPath) || []);
-                    a.splice(idx, 1);
-                    setByPath(d, fullPath, a);
-                });
+                delBtn.onclick = () => commitChange([{ op: "remove", path: [...base, idx] }]);
 
                 row.appendChild(inp);
                 row.appendChild(upBtn);
                 row.appendChild(downBtn);
                 row.appendChild(delBtn);
-                itemsDiv.appendChild(row);
-            });
+                return row;
+            }
+
+            if (current.length > VIRTUAL_THRESHOLD) {
+                const win = windowFor(`list:${fullPath}`);
+                itemsDiv.appendChild(win.el);
+                win.update(current.length, i => i, renderItem);
+            } else {
+                for (let idx = 0; idx < current.length; idx++) itemsDiv.appendChild(renderItem(idx));
+            }
 
             // Add item row
             const addRow = document.createElement("div");
@@ -293,11 +1431,7 @@ export default {
                 if (guessedType === "boolean") newVal = addInp.value === "true";
                 else if (guessedType === "number") newVal = Number(addInp.value);
                 else newVal = addInp.value;
-                commitChange(d => {
-                    const a = deepClone(getByPath(d, fullPath) || []);
-                    a.push(newVal);
-                    setByPath(d, fullPath, a);
-                });
+                commitChange([{ op: "add", path: [...base, current.length], value: newVal }]);
                 if (guessedType === "string") addInp.value = "";
             };
             addInp.addEventListener("keydown", e => { if (e.key === "Enter") addBtn.click(); });
@@ -330,7 +1464,7 @@ export default {
                 renderScalarEditor(vEl, childPath, k, v);
 
                 const del = iconBtn("✕", "Delete", "danger");
-                del.onclick = () => commitChange(d => deleteByPath(d, childPath));
+                del.onclick = () => commitChange([{ op: "remove", path: pathOf(childPath) }]);
 
                 row.appendChild(kEl); row.appendChild(vEl); row.appendChild(del);
                 wrap.appendChild(row);
@@ -357,13 +1491,12 @@ export default {
                 const k = newKey.value.trim();
                 if (!k || k.includes(".")) return;
                 const full = fullPath ? `${fullPath}.${k}` : k;
-                commitChange(d => {
-                    if (getByPath(d, full) !== undefined) return;
-                    const raw = newVal.value;
-                    if (raw === "true" || raw === "false") setByPath(d, full, raw === "true");
-                    else if (raw !== "" && !isNaN(Number(raw))) setByPath(d, full, Number(raw));
-                    else setByPath(d, full, raw);
-                });
+                if (getByPath(synced(model, "data"), full) !== undefined) return;
+                const raw = newVal.value;
+                let value = raw;
+                if (raw === "true" || raw === "false") value = raw === "true";
+                else if (raw !== "" && !isNaN(Number(raw))) value = Number(raw);
+                commitChange([{ op: "add", path: pathOf(full), value }]);
                 newKey.value = ""; newVal.value = "";
             };
             newVal.addEventListener("keydown", e => { if (e.key === "Enter") addBtn.click(); });
@@ -378,7 +1511,7 @@ export default {
                 const sel = document.createElement("select");
                 sel.innerHTML = `<option value="true">true</option><option value="false">false</option>`;
                 sel.value = String(value);
-                sel.onchange = () => commitChange(d => setByPath(d, fullPath, sel.value === "true"));
+                sel.onchange = () => commitChange([{ op: "replace", path: pathOf(fullPath), value: sel.value === "true" }]);
                 container.appendChild(sel);
                 return;
             }
@@ -388,7 +1521,7 @@ export default {
                 inp.className = "num"; inp.type = "number"; inp.value = String(value);
                 inp.onchange = () => {
                     const n = Number(inp.value);
-                    commitChange(d => setByPath(d, fullPath, Number.isFinite(n) ? n : 0));
+                    commitChange([{ op: "replace", path: pathOf(fullPath), value: Number.isFinite(n) ? n : 0 }]);
                 };
                 container.appendChild(inp);
                 return;
@@ -403,15 +1536,18 @@ export default {
                     col.value = isHexColor(value) ? value : "#000000";
                     const txt = document.createElement("input");
                     txt.type = "text"; txt.className = "text"; txt.value = value;
-                    col.oninput = () => { txt.value = col.value; commitChange(d => setByPath(d, fullPath, col.value)); };
-                    txt.onchange = () => commitChange(d => setByPath(d, fullPath, txt.value));
+                    col.oninput = () => {
+                        txt.value = col.value;
+                        commitChange([{ op: "replace", path: pathOf(fullPath), value: col.value }]);
+                    };
+                    txt.onchange = () => commitChange([{ op: "replace", path: pathOf(fullPath), value: txt.value }]);
                     wrap.appendChild(col); wrap.appendChild(txt);
                     container.appendChild(wrap);
                     return;
                 }
                 const inp = document.createElement("input");
                 inp.type = "text"; inp.className = "text"; inp.value = value;
-                inp.onchange = () => commitChange(d => setByPath(d, fullPath, inp.value));
+                inp.onchange = () => commitChange([{ op: "replace", path: pathOf(fullPath), value: inp.value }]);
                 container.appendChild(inp);
                 return;
             }
@@ -420,7 +1556,7 @@ export default {
             const inp = document.createElement("input");
             inp.type = "text"; inp.className = "text";
             inp.value = value == null ? "" : String(value);
-            inp.onchange = () => commitChange(d => setByPath(d, fullPath, inp.value));
+            inp.onchange = () => commitChange([{ op: "replace", path: pathOf(fullPath), value: inp.value }]);
             container.appendChild(inp);
         }
 
@@ -475,16 +1611,16 @@ export default {
                 const k = (key.value || "").trim();
                 if (!k || k.includes(".")) return;
                 const full = basePath ? `${basePath}.${k}` : k;
-                commitChange(d => {
-                    if (getByPath(d, full) !== undefined) return;
-                    const t = type.value;
-                    if (t === "table") { setByPath(d, full, {}); expanded.add(full); }
-                    else if (t === "array") { setByPath(d, full, []); }
-                    else if (t === "boolean") { setByPath(d, full, val.value.toLowerCase().trim() === "true"); }
-                    else if (t === "number") { const n = Number(val.value); setByPath(d, full, Number.isFinite(n) ? n : 0); }
-                    else if (t === "color") { setByPath(d, full, isHexColor(val.value.trim()) ? val.value.trim() : "#000000"); }
-                    else { setByPath(d, full, String(val.value)); }
-                });
+                if (getByPath(synced(model, "data"), full) !== undefined) return;
+                const t = type.value;
+                let value;
+                if (t === "table") { value = {}; expanded.add(full); }
+                else if (t === "array") { value = []; }
+                else if (t === "boolean") { value = val.value.toLowerCase().trim() === "true"; }
+                else if (t === "number") { const n = Number(val.value); value = Number.isFinite(n) ? n : 0; }
+                else if (t === "color") { value = isHexColor(val.value.trim()) ? val.value.trim() : "#000000"; }
+                else { value = String(val.value); }
+                commitChange([{ op: "add", path: pathOf(full), value }]);
                 key.value = ""; syncValUI();
             };
 
@@ -495,102 +1631,181 @@ export default {
 
         // ---- Object card ------------------------------------------------------------
 
-        function renderObjectCard(obj, basePath, titleText) {
-            const card = document.createElement("div");
-            card.className = "card";
-
-            const header = document.createElement("div");
-            header.className = "sectionTitle";
-            header.textContent = titleText;
-            card.appendChild(header);
-            card.appendChild(renderAddBox(basePath));
-
-            const ks = keysSorted(obj);
-            const visible = searchQuery
-                ? ks.filter(k => k.toLowerCase().includes(searchQuery.toLowerCase()))
-                : ks;
+        /** One row per key; deep tables render as a fold group with their contents. */
+        function renderKeyRow(obj, basePath, k) {
+            const v = obj[k];
+            const fullPath = basePath ? `${basePath}.${k}` : k;
+            const isObj = v && typeof v === "object" && !Array.isArray(v);
 
-            if (ks.length === 0) {
-                const e = document.createElement("div"); e.className = "hint";
-                e.textContent = "No keys yet. Use the Add row above.";
-                card.appendChild(e); return card;
-            }
-            if (visible.length === 0) {
-                const e = document.createElement("div"); e.className = "hint";
-                e.textContent = `No keys match "${searchQuery}".`;
-                card.appendChild(e); return card;
+            // Shallow dict → inline
+            if (isObj && Object.keys(v).length <= INLINE_LIMIT && isShallowScalarDict(v)) {
+                const row = document.createElement("div");
+                row.className = "row"; row.style.alignItems = "start";
+                row.dataset.path = fullPath;
+                const keyEl = document.createElement("div");
+                keyEl.className = "k";
+                keyEl.appendChild(typeBadge(v));
+                keyEl.appendChild(document.createTextNode(" " + k));
+                appendLayerBadge(keyEl, fullPath, v);
+                const valEl = document.createElement("div"); valEl.className = "v";
+                renderInlineDict(valEl, fullPath, v);
+                const del = iconBtn("✕", "Delete", "danger");
+                del.onclick = () => commitChange([{ op: "remove", path: pathOf(fullPath) }]);
+                row.appendChild(keyEl); row.appendChild(valEl); row.appendChild(del);
+                return row;
             }
 
-            for (const k of visible) {
-                const v = obj[k];
-                const fullPath = basePath ? `${basePath}.${k}` : k;
-                const isObj = v && typeof v === "object" && !Array.isArray(v);
-
-                // Shallow dict → inline
-                if (isObj && Object.keys(v).length <= INLINE_LIMIT && isShallowScalarDict(v)) {
-                    const row = document.createElement("div");
-                    row.className = "row"; row.style.alignItems = "start";
-                    const keyEl = document.createElement("div");
-                    keyEl.className = "k";
-                    keyEl.appendChild(typeBadge(v));
-                    keyEl.appendChild(document.createTextNode(" " + k));
-                    const valEl = document.createElement("div"); valEl.className = "v";
-                    renderInlineDict(valEl, fullPath, v);
-                    const del = iconBtn("✕", "Delete", "danger");
-                    del.onclick = () => commitChange(d => deleteByPath(d, fullPath));
-                    row.appendChild(keyEl); row.appendChild(valEl); row.appendChild(del);
-                    card.appendChild(row); continue;
-                }
-
-                // Deep dict → fold
-                if (isObj) {
-                    const open = expanded.has(fullPath);
-                    const foldRow = document.createElement("div"); foldRow.className = "fold-row";
-                    const fold = document.createElement("div"); fold.className = "fold";
-                    fold.innerHTML = `${open ? "▾" : "▸"} <span>${k}</span>`;
-                    fold.onclick = () => {
-                        if (expanded.has(fullPath)) expanded.delete(fullPath);
-                        else expanded.add(fullPath);
-                        renderAll();
-                    };
-                    const del = iconBtn("✕", "Delete section", "danger");
-                    del.onclick = () => commitChange(d => deleteByPath(d, fullPath));
-                    foldRow.appendChild(fold); foldRow.appendChild(del); card.appendChild(foldRow);
-                    if (open) {
-                        const inner = renderObjectCard(v, fullPath, "Contents");
-                        inner.classList.add("indent"); card.appendChild(inner);
-                    }
-                    continue;
-                }
-
-                // Array → list editor
-                if (Array.isArray(v)) {
-                    const row = document.createElement("div");
-                    row.className = "row"; row.style.alignItems = "start";
-                    const keyEl = document.createElement("div"); keyEl.className = "k";
-                    keyEl.appendChild(typeBadge(v));
-                    keyEl.appendChild(document.createTextNode(" " + k));
-                    const valEl = document.createElement("div"); valEl.className = "v";
-                    renderListEditor(valEl, fullPath, v);
-                    const del = iconBtn("✕", "Delete", "danger");
-                    del.onclick = () => commitChange(d => deleteByPath(d, fullPath));
-                    row.appendChild(keyEl); row.appendChild(valEl); row.appendChild(del);
-                    card.appendChild(row); continue;
+            // Deep dict → fold
+            if (isObj) {
+                const open = expanded.has(fullPath);
+                const foldRow = document.createElement("div"); foldRow.className = "fold-row";
+                const fold = document.createElement("div"); fold.className = "fold";
+                fold.innerHTML = `${open ? "▾" : "▸"} <span>${k}</span>`;
+                fold.onclick = () => {
+                    if (expanded.has(fullPath)) expanded.delete(fullPath);
+                    else expanded.add(fullPath);
+                    renderAll();
+                };
+                const del = iconBtn("✕", "Delete section", "danger");
+                del.onclick = () => commitChange([{ op: "remove", path: pathOf(fullPath) }]);
+                foldRow.appendChild(fold); foldRow.appendChild(del);
+                const group = document.createElement("div");
+                group.dataset.path = fullPath;
+                group.appendChild(foldRow);
+                if (open) {
+                    const inner = renderObjectCard(v, fullPath, "Contents");
+                    inner.classList.add("indent"); group.appendChild(inner);
                 }
+                return group;
+            }
 
-                // Scalar
-                const row = document.createElement("div"); row.className = "row";
+            // Array → list editor
+            if (Array.isArray(v)) {
+                const row = document.createElement("div");
+                row.className = "row"; row.style.alignItems = "start";
+                row.dataset.path = fullPath;
                 const keyEl = document.createElement("div"); keyEl.className = "k";
                 keyEl.appendChild(typeBadge(v));
                 keyEl.appendChild(document.createTextNode(" " + k));
+                appendLayerBadge(keyEl, fullPath, v);
                 const valEl = document.createElement("div"); valEl.className = "v";
-                renderScalarEditor(valEl, fullPath, k, v);
+                renderListEditor(valEl, fullPath, v);
                 const del = iconBtn("✕", "Delete", "danger");
-                del.onclick = () => commitChange(d => deleteByPath(d, fullPath));
+                del.onclick = () => commitChange([{ op: "remove", path: pathOf(fullPath) }]);
                 row.appendChild(keyEl); row.appendChild(valEl); row.appendChild(del);
-                card.appendChild(row);
+                return row;
+            }
+
+            // Scalar
+            const row = document.createElement("div"); row.className = "row";
+            row.dataset.path = fullPath;
+            const keyEl = document.createElement("div"); keyEl.className = "k";
+            keyEl.appendChild(typeBadge(v));
+            keyEl.appendChild(document.createTextNode(" " + k));
+            appendLayerBadge(keyEl, fullPath, v);
+            const valEl = document.createElement("div"); valEl.className = "v";
+            renderScalarEditor(valEl, fullPath, k, v);
+            const del = iconBtn("✕", "Delete", "danger");
+            del.onclick = () => commitChange([{ op: "remove", path: pathOf(fullPath) }]);
+            row.appendChild(keyEl); row.appendChild(valEl); row.appendChild(del);
+            return row;
+        }
+
+        function isFoldGroup(v) {
+            return !!v && typeof v === "object" && !Array.isArray(v)
+                && !(Object.keys(v).length <= INLINE_LIMIT && isShallowScalarDict(v));
+        }
+
+        // ---- Layers -----------------------------------------------------------------
+        // In layered mode every row names the file its value comes from.
+
+        function fileName(p) {
+            return String(p).split(/[\\/]/).pop();
+        }
+
+        function appendLayerBadge(keyEl, fullPath, v) {
+            const layers = model.get("layers") || [];
+            if (layers.length < 2) return;
+            const prov = model.get("provenance") || {};
+            let i = prov[fullPath];
+            if (i === undefined && v && typeof v === "object" && !Array.isArray(v)) {
+                // Inline table: the topmost layer among its keys
+                for (const k of Object.keys(v)) i = Math.max(i ?? 0, prov[`${fullPath}.${k}`] ?? 0);
+            }
+            i = i ?? 0;
+            const b = document.createElement("span");
+            b.className = "layer-badge" + (i > 0 ? " override" : "");
+            b.textContent = fileName(layers[i]);
+            b.title = `From ${layers[i]}`;
+            keyEl.appendChild(b);
+        }
+
+        /** Mark a dotted path and its ancestors for re-render. */
+        function markPathDirty(dotted) {
+            let p = "";
+            for (const seg of dotted.split(".")) {
+                p = p ? `${p}.${seg}` : seg;
+                dirtyPaths.add(p);
+            }
+        }
+
+        /** Cached row for obj[k], rebuilt only if its value or path changed. */
+        function rowFor(obj, basePath, k) {
+            const fullPath = basePath ? `${basePath}.${k}` : k;
+            const v = obj[k];
+            const open = expanded.has(fullPath);
+            const dirty = dirtyPaths.has(fullPath);
+            const c = rowCache.get(fullPath);
+            if (c && c.value === v && c.open === open) {
+                if (c.group && (!dirty || isFoldGroup(v))) {
+                    // Edits below an open table only touch its nested card;
+                    // the card also follows the search filter.
+                    if (open && (dirty || c.epoch !== uiEpoch)) {
+                        renderObjectCard(v, fullPath, "Contents");
+                        c.epoch = uiEpoch;
+                    }
+                    return c.el;
+                }
+                if (!c.group && !dirty) return c.el;
+            }
+            const el = renderKeyRow(obj, basePath, k);
+            rowCache.set(fullPath, { el, value: v, open, group: isFoldGroup(v), epoch: uiEpoch });
+            return el;
+        }
+
+        function renderObjectCard(obj, basePath, titleText) {
+            let c = cardCache.get(basePath);
+            if (!c) {
+                const card = document.createElement("div");
+                card.className = "card";
+                const header = document.createElement("div");
+                header.className = "sectionTitle";
+                const body = document.createElement("div");
+                card.appendChild(header);
+                card.appendChild(renderAddBox(basePath));
+                card.appendChild(body);
+                c = { card, header, body };
+                cardCache.set(basePath, c);
+            }
+            c.header.textContent = titleText;
+
+            const ks = sortedKeys(obj, basePath);
+            const visible = searchVisible(ks, basePath);
+
+            if (ks.length === 0 || visible.length === 0) {
+                const e = document.createElement("div"); e.className = "hint";
+                e.textContent = ks.length === 0
+                    ? "No keys yet. Use the Add row above."
+                    : `No keys match "${searchState.query}" here.`;
+                reconcileChildren(c.body, [e]);
+            } else if (visible.length > VIRTUAL_THRESHOLD) {
+                const win = windowFor(`card:${basePath}`);
+                reconcileChildren(c.body, [win.el]);
+                win.update(visible.length, i => visible[i], i => rowFor(obj, basePath, visible[i]));
+            } else {
+                reconcileChildren(c.body, visible.map(k => rowFor(obj, basePath, k)));
             }
-            return card;
+            return c.card;
         }
 
         // ---- Raw tab ----------------------------------------------------------------
@@ -638,7 +1853,41 @@ export default {
         function getTomlText() {
             // Prefer Python-generated text (via tomli-w) if available and fresh,
             // otherwise fall back to the JS serializer.
-            return (model.get("toml_text") || "").trim() || tomlSerialize(model.get("data") || {});
+            return (synced(model, "toml_text") || "").trim() || tomlSerialize(synced(model, "data") || {});
+        }
+
+        // With text_sync "lazy", Python only renders toml_text when asked and
+        // clears it ("") when the data changes. Requests are debounced so a
+        // burst of edits while the Raw tab is open renders the text once.
+        const TEXT_DEBOUNCE_MS = 150;
+        let textTimer = null;
+        let textWaiters = [];
+
+        // Tables not fetched yet (progressive load) can only be serialized by Python
+        function pythonRendersText() {
+            return model.get("text_sync") !== "off" || Object.keys(model.get("table_index") || {}).length > 0;
+        }
+
+        function requestTomlText() {
+            if (!pythonRendersText() || textTimer) return;
+            textTimer = setTimeout(() => {
+                textTimer = null;
+                if (instrumented()) perf.begin("render_text");
+                sendCommand("render_text");
+            }, TEXT_DEBOUNCE_MS);
+        }
+
+        function withTomlText(cb) {
+            if ((synced(model, "toml_text") || "").trim() || !pythonRendersText()) { cb(getTomlText()); return; }
+            textWaiters.push(cb);
+            requestTomlText();
+        }
+
+        function flushTextWaiters() {
+            const waiters = textWaiters;
+            textWaiters = [];
+            const text = getTomlText();
+            for (const cb of waiters) cb(text);
         }
 
         function renderRawPanel() {
@@ -650,7 +1899,15 @@ export default {
 
             const ta = document.createElement("textarea");
             ta.className = "raw-area";
-            ta.value = getTomlText();
+            const text = synced(model, "toml_text") || "";
+            const empty = Object.keys(synced(model, "data") || {}).length === 0;
+            if (text.trim() || !pythonRendersText() || empty) {
+                ta.value = getTomlText();
+            } else {
+                ta.value = "";
+                ta.placeholder = "Rendering TOML…";
+                requestTomlText();
+            }
             ta.readOnly = true;
             wrap.appendChild(ta);
 
@@ -690,30 +1947,35 @@ export default {
         }
 
         async function saveFilePicker(saveAs = false) {
-            const tomlText = getTomlText();
-
-            if (saveAs && isMac) {
-                // Native macOS Save As dialog via Python
-                sendCommand("mac_native_save_as", { content: tomlText });
+            if (saveAs && !isMac) {
+                // Fallback for Save As on non-Mac: trigger download
+                withTomlText(tomlText => {
+                    const suggestedName = (model.get("name") || "config") + ".toml";
+                    const blob = new Blob([tomlText], { type: "text/plain" });
+                    const url = URL.createObjectURL(blob);
+                    const a = document.createElement("a");
+                    a.href = url; a.download = suggestedName; a.click();
+                    URL.revokeObjectURL(url);
+                    model.set("status", "Downloaded as file.");
+                    model.save_changes();
+                    markClean();
+                });
                 return;
             }
 
-            if (saveAs && !isMac) {
-                // Fallback for Save As on non-Mac: trigger download
-                const suggestedName = (model.get("name") || "config") + ".toml";
-                const blob = new Blob([tomlText], { type: "text/plain" });
-                const url = URL.createObjectURL(blob);
-                const a = document.createElement("a");
-                a.href = url; a.download = suggestedName; a.click();
-                URL.revokeObjectURL(url);
-                model.set("status", "Downloaded as file.");
-                model.save_changes();
-                markClean();
+            // Python serializes its own copy; the JS text is only a fallback for
+            // text_sync "off" (serializing a large document just to send it
+            // unused would cost more than the save).
+            const payload = pythonRendersText() ? {} : { content: getTomlText() };
+
+            if (saveAs && isMac) {
+                // Native macOS Save As dialog via Python
+                sendCommand("mac_native_save_as", payload);
                 return;
             }
 
             // Normal Save (overwrite current file directly in Python)
-            sendCommand("save_local", { content: tomlText });
+            sendCommand("save_local", payload);
             markClean();
         }
 
@@ -760,56 +2022,167 @@ export default {
         saveAsBtn.textContent = "📄 Save As";
         saveAsBtn.onclick = () => saveFilePicker(true);
 
+        const applyBtn = document.createElement("button");
+        applyBtn.className = "btn apply-btn"; applyBtn.type = "button";
+        applyBtn.textContent = "✓ Apply";
+        applyBtn.title = "Publish the edits to the notebook";
+        applyBtn.onclick = publish;
+
         const undoBtn = document.createElement("button");
         undoBtn.className = "btn"; undoBtn.type = "button";
         undoBtn.textContent = "↩ Undo";
-        undoBtn.onclick = () => {
-            ensureHistoryInit();
-            if (!canUndo()) return;
-            hIndex -= 1;
-            applySnapshot(history[hIndex]);
-            renderAll();
-        };
+        undoBtn.onclick = undo;
 
         const redoBtn = document.createElement("button");
         redoBtn.className = "btn"; redoBtn.type = "button";
         redoBtn.textContent = "↪ Redo";
-        redoBtn.onclick = () => {
-            ensureHistoryInit();
-            if (!canRedo()) return;
-            hIndex += 1;
-            applySnapshot(history[hIndex]);
-            renderAll();
+        redoBtn.onclick = redo;
+
+        // Layered mode: which file edits go to
+        const layerSelect = document.createElement("select");
+        layerSelect.className = "layer-select";
+        layerSelect.title = "Layer that edits are written to";
+        layerSelect.onchange = () => {
+            model.set("write_layer", Number(layerSelect.value));
+            model.save_changes();
         };
 
+        function renderLayerSelect() {
+            const layers = model.get("layers") || [];
+            layerSelect.classList.toggle("visible", layers.length > 1);
+            layerSelect.replaceChildren(...layers.map((p, i) => {
+                const o = document.createElement("option");
+                o.value = String(i);
+                o.textContent = `✎ ${fileName(p)}`;
+                return o;
+            }));
+            const w = model.get("write_layer") ?? -1;
+            layerSelect.value = String(w < 0 ? layers.length + w : w);
+        }
+
         const status = document.createElement("div");
         status.className = "status";
 
         topbar.appendChild(openBtn);
         topbar.appendChild(saveBtn);
         topbar.appendChild(saveAsBtn);
+        topbar.appendChild(applyBtn);
         topbar.appendChild(undoBtn);
         topbar.appendChild(redoBtn);
+        topbar.appendChild(layerSelect);
         topbar.appendChild(status);
 
         // Tabs + persistent search box
         const tabs = document.createElement("div");
         tabs.className = "tabs";
 
-        // searchBox is created once and re-appended on each render (never recreated)
+        // The search box is created once and stays put; tab buttons are reconciled around it
         const searchBox = document.createElement("input");
         searchBox.type = "search";
         searchBox.className = "search-box";
-        searchBox.placeholder = "🔍 Filter keys…";
-        searchBox.oninput = () => { searchQuery = searchBox.value; renderAll(); };
+        searchBox.placeholder = "🔍 Search keys…";
+        searchBox.oninput = () => scheduleSearch();
+        searchBox.addEventListener("keydown", e => {
+            if (e.key === "Enter") { e.preventDefault(); jumpWhenDone = true; scheduleSearch(0); }
+            if (e.key === "Escape") { searchBox.value = ""; scheduleSearch(0); }
+        });
+
+        const searchValuesBtn = document.createElement("button");
+        searchValuesBtn.type = "button";
+        searchValuesBtn.className = "tab search-values";
+        searchValuesBtn.textContent = "=";
+        searchValuesBtn.title = "Also match values";
+        searchValuesBtn.onclick = () => {
+            searchValues = !searchValues;
+            searchValuesBtn.classList.toggle("active", searchValues);
+            scheduleSearch(0);
+        };
+
+        const searchResults = document.createElement("div");
+        searchResults.className = "search-results";
+
+        // Shown when the watched file changed on disk under unsaved edits
+        const conflictBar = document.createElement("div");
+        conflictBar.className = "conflict";
+
+        function renderConflict() {
+            const c = model.get("conflict") || {};
+            conflictBar.innerHTML = "";
+            conflictBar.classList.toggle("visible", !!c.path);
+            if (!c.path) return;
+            const msg = document.createElement("span");
+            const tables = (c.tables || []).map(t => `[${t}]`).join(", ");
+            msg.textContent = `${c.path} changed on disk${tables ? ` (${tables})` : ""}.`;
+            const reloadBtn = document.createElement("button");
+            reloadBtn.className = "btn"; reloadBtn.type = "button";
+            reloadBtn.textContent = "Reload from disk";
+            reloadBtn.onclick = () => {
+                sendCommand("resolve_conflict", { action: "reload" });
+                markClean();
+            };
+            const keepBtn = document.createElement("button");
+            keepBtn.className = "btn"; keepBtn.type = "button";
+            keepBtn.textContent = "Keep my edits";
+            keepBtn.onclick = () => sendCommand("resolve_conflict", { action: "keep" });
+            conflictBar.appendChild(msg);
+            conflictBar.appendChild(reloadBtn);
+            conflictBar.appendChild(keepBtn);
+        }
+
+        // instrument="overlay": Python's stats(), refreshed with every report
+        const perfOverlay = document.createElement("div");
+        perfOverlay.className = "perf-overlay";
+
+        function renderPerfOverlay(stats) {
+            const rows = [["", "p50 / p95 ms"]];
+            const timing = (label, t) => {
+                if (t) rows.push([label, `${t.p50_ms} / ${t.p95_ms} · ${t.count}×`]);
+            };
+            const fe = stats.frontend || {};
+            timing("render", fe.render);
+            for (const k of Object.keys(fe)) if (k.startsWith("roundtrip.")) timing(`⇄ ${k.slice(10)}`, fe[k]);
+            const py = stats.python || {};
+            for (const k of Object.keys(py)) timing(`py ${k}`, py[k]);
+            const { sent, received } = stats.payload || {};
+            if (sent) rows.push(["→ browser", `${formatBytes(sent.bytes)} · ${sent.messages} msgs`]);
+            if (received) rows.push(["→ kernel", `${formatBytes(received.bytes)} · ${received.messages} msgs`]);
+            const h = stats.history || {};
+            for (const side of ["python", "frontend"]) {
+                if (h[side] && h[side].entries !== undefined) {
+                    rows.push([`history (${side === "python" ? "py" : "js"})`, `${h[side].entries} · ${formatBytes(h[side].bytes)}`]);
+                }
+            }
+            perfOverlay.replaceChildren(...rows.map(([k, v]) => {
+                const row = document.createElement("div");
+                row.className = "perf-row";
+                const key = document.createElement("span");
+                key.textContent = k;
+                const val = document.createElement("span");
+                val.textContent = v;
+                row.appendChild(key);
+                row.appendChild(val);
+                return row;
+            }));
+        }
+
+        function syncInstrument() {
+            const mode = model.get("instrument") || "off";
+            perfOverlay.classList.toggle("visible", mode === "overlay");
+            if (mode === "off") perf.clear();
+        }
 
         const panel = document.createElement("div");
         panel.className = "panel";
+        const panelTitle = document.createElement("div");
+        panelTitle.className = "sectionTitle";
 
         root.appendChild(titleEl);
         root.appendChild(topbar);
+        root.appendChild(conflictBar);
         root.appendChild(tabs);
+        root.appendChild(searchResults);
         root.appendChild(panel);
+        root.appendChild(perfOverlay);
 
         // Keyboard shortcuts
         el.addEventListener("keydown", e => {
@@ -821,7 +2194,15 @@ export default {
 
         // ---- Main render ------------------------------------------------------------
 
+        // A render may ask for table bodies and hand others back: one request
         function renderAll() {
+            if (!instrumented()) { batched(renderNow); return; }
+            const t0 = performance.now();
+            batched(renderNow);
+            perf.add("render", performance.now() - t0);
+        }
+
+        function renderNow() {
             // Sync title (only if not currently focused to avoid caret jump)
             if (document.activeElement !== titleEl) {
                 titleEl.textContent = model.get("name") || "config";
@@ -831,13 +2212,13 @@ export default {
             const s = model.get("status") || "";
             status.textContent = s;
             status.className = "status";
-            if (s.startsWith("Loaded") || s.startsWith("Saved") || s === "Ready.") status.classList.add("ok");
+            if (s.startsWith("Loaded") || s.startsWith("Reloaded") || s.startsWith("Saved") || s === "Ready.") status.classList.add("ok");
             else if (s.startsWith("Error") || s.startsWith("File not found") || s.startsWith("Install")) status.classList.add("err");
 
-            undoBtn.disabled = !canUndo();
-            redoBtn.disabled = !canRedo();
+            syncUndoButtons();
 
-            const data = model.get("data") || {};
+            const data = synced(model, "data") || {};
+            renderedVersion = docMeta(model, data).version;
             if (!expandedInitialized) {
                 expandAllTablesByDefault(data);
                 expandedInitialized = true;
@@ -847,74 +2228,187 @@ export default {
             const tabNames = ["root", ...keysSorted(tables), "raw"];
             if (!tabNames.includes(activeTab)) activeTab = "root";
 
-            // Rebuild tabs — capture searchBox focus state before clearing
-            // In Shadow DOM, document.activeElement points to the host, so we use matches(':focus')
-            const searchHadFocus = searchBox.matches(':focus');
-            const searchCursorPos = searchHadFocus ? searchBox.selectionStart : null;
-
-            // Ensure searchBox is inside tabs before we insertBefore it
-            if (searchBox.parentNode !== tabs) {
-                tabs.appendChild(searchBox);
-            }
-
-            // Clear existing tab buttons but keep the searchBox
-            while (tabs.firstChild && tabs.firstChild !== searchBox) {
-                tabs.removeChild(tabs.firstChild);
-            }
-
-            for (const t of tabNames) {
-                const b = document.createElement("button");
+            // Tabs are keyed by name, so existing buttons (and the search box's
+            // focus) stay where they are.
+            const tabEls = tabNames.map(t => {
+                let b = tabCache.get(t);
+                if (!b) {
+                    b = document.createElement("button");
+                    b.type = "button";
+                    b.onclick = () => { activeTab = t; renderAll(); };
+                    tabCache.set(t, b);
+                }
                 b.className = "tab" + (t === activeTab ? " active" : "");
-                b.textContent = t === "raw" ? "{ } Raw" : t;
-                b.type = "button";
-                b.onclick = () => { activeTab = t; renderAll(); };
-                tabs.insertBefore(b, searchBox);
-            }
-
-            // Panel
-            panel.innerHTML = "";
+                const hits = searchState && searchState.tabs.get(t);
+                const label = t === "raw" ? "{ } Raw" : t;
+                b.textContent = hits ? `${label} · ${hits}` : label;
+                return b;
+            });
+            reconcileChildren(tabs, [...tabEls, searchBox, searchValuesBtn]);
+
+            // Panel — cached cards and rows are reused; only the raw tab is
+            // rebuilt every time.
+            const focus = captureFocus();
+            let view;
+            const pending = pendingTable(activeTab);
+            if (!pending && hydrated.includes(activeTab)) touchHydrated(activeTab);
             if (activeTab === "raw") {
-                panel.appendChild(renderRawPanel());
+                view = [renderRawPanel()];
+            } else if (pending) {
+                // Lazy table: its body hasn't been sent yet
+                panelTitle.textContent = `[${activeTab}]`;
+                const note = document.createElement("div");
+                note.className = "hint";
+                note.textContent = `Loading [${activeTab}] (${pending.size} keys)…`;
+                view = [panelTitle, note];
+                if (!requestedTables.has(activeTab)) {
+                    requestedTables.add(activeTab);
+                    if (instrumented()) perf.begin("load_tables", activeTab);
+                    sendCommand("load_tables", { keys: [activeTab] });
+                }
             } else if (activeTab === "root") {
-                const title = document.createElement("div");
-                title.className = "sectionTitle"; title.textContent = "Root (scalar values)";
-                panel.appendChild(title);
-                panel.appendChild(renderObjectCard(rootScalars, "", "Root"));
+                panelTitle.textContent = "Root (scalar values)";
+                view = [panelTitle, renderObjectCard(rootScalars, "", "Root")];
             } else {
-                const title = document.createElement("div");
-                title.className = "sectionTitle"; title.textContent = `[${activeTab}]`;
-                panel.appendChild(title);
-                panel.appendChild(renderObjectCard(tables[activeTab] || {}, activeTab, activeTab));
-            }
-
-            // Restore search focus and cursor position
-            if (searchHadFocus) {
-                searchBox.focus();
-                if (searchCursorPos !== null) {
-                    searchBox.setSelectionRange(searchCursorPos, searchCursorPos);
-                }
+                panelTitle.textContent = `[${activeTab}]`;
+                view = [panelTitle, renderObjectCard(tables[activeTab] || {}, activeTab, activeTab)];
             }
+            reconcileChildren(panel, view);
+            flushWindows();
+            restoreFocus(focus);
+            sweepRenderCaches();
         }
 
         // ---- Model observers --------------------------------------------------------
 
         model.on("change:data", () => {
-            // Guard: user edit or undo/redo → just re-render, keep history intact
-            if (_localChange || _applyingSnapshot) { renderAll(); return; }
-            // External change from Python (e.g. programmatic load) → reset history
+            // A whole new document from Python (e.g. programmatic load) → reset history
             expandedInitialized = false;
-            resetHistoryToCurrent();
+            hydrated.length = 0;
+            resetHistory();
+            clearRenderCaches();
             markClean();
             renderAll();
         });
-        model.on("change:status", renderAll);
+        model.on("change:data_patch", () => {
+            const p = synced(model, "data_patch") || {};
+            const data = synced(model, "data") || {};
+            const meta = docMeta(model, data);
+            if (p.reset) {
+                // New epoch: whole document replaced or resynced
+                if (meta.epoch !== p.epoch) {
+                    applyOps(data, p.ops || []);
+                    clearRenderCaches();
+                }
+                meta.epoch = p.epoch;
+                meta.version = p.version;
+                if ((p.ops || []).length) {
+                    expandedInitialized = false;
+                    hydrated.length = 0;
+                    resetHistory();
+                    markClean();
+                }
+            } else if (p.epoch === meta.epoch && p.version === meta.version + 1) {
+                const inverse = applyOps(data, p.ops || []);
+                trackOps(p.ops || []);
+                meta.version = p.version;
+                // Keep the local stack in step with Python's
+                if (p.origin === "undo") {
+                    if (canUndo() && history[hIndex - 1].version === p.entry) hIndex -= 1;
+                } else if (p.origin === "redo") {
+                    if (canRedo() && history[hIndex].version === p.entry) hIndex += 1;
+                } else if (p.origin === "hydrate") {
+                    // Lazy table bodies, not an edit
+                    for (const op of p.ops || []) {
+                        perf.end("load_tables", op.path[0]);
+                        expandAllTablesByDefault({ [op.path[0]]: op.value });
+                        evicted.delete(op.path[0]);
+                        if (!hydrated.includes(op.path[0])) hydrated.push(op.path[0]);
+                    }
+                } else if (p.origin !== "external") {
+                    pushHistory(p.ops || [], inverse, p.version);
+                }
+            } else if (p.epoch !== meta.epoch || p.version > meta.version) {
+                // Missed a patch — ask Python for the full document
+                perf.abandon("patch");
+                sendCommand("resync");
+                return;
+            }
+            renderAll();
+        });
+        // data_version acks our own patches; another view of the same model
+        // may have edited the shared document in the meantime.
+        model.on("change:data_version", () => {
+            perf.end("patch", model.get("data_version"));
+            if (renderedVersion === docMeta(model, synced(model, "data") || {}).version) return;
+            // The other view's ops never reached this one's dirty set
+            clearRenderCaches();
+            renderAll();
+        });
+        model.on("change:can_undo", syncUndoButtons);
+        model.on("change:can_redo", syncUndoButtons);
+        model.on("change:status", () => {
+            // Python could not render the text (e.g. tomli-w missing): use the JS serializer
+            if (textWaiters.length) flushTextWaiters();
+            renderAll();
+        });
+        model.on("change:toml_text", () => {
+            if ((synced(model, "toml_text") || "").trim()) {
+                perf.end("render_text");
+                flushTextWaiters();
+            }
+            if (activeTab === "raw") renderAll();
+        });
+        model.on("change:table_index", () => {
+            // A new document may list tables requested before
+            requestedTables.clear();
+            evicted.clear();
+            renderAll();
+        });
+        model.on("change:conflict", renderConflict);
+        model.on("change:instrument", () => {
+            syncInstrument();
+            renderAll();
+        });
+        model.on("change:publish", () => {
+            if (!deferred()) publish();
+            syncApplyButton();
+        });
+        // Focus leaving the widget publishes (an input's change event comes first)
+        root.addEventListener("focusout", e => {
+            if (deferred() && !root.contains(e.relatedTarget)) publish();
+        });
+        model.on("msg:custom", (msg, buffers) => {
+            if (msg && msg.type === "reply") onReplies(msg, buffers || []);
+            else if (msg && msg.type === "stats" && model.get("instrument") === "overlay") renderPerfOverlay(msg.stats || {});
+        });
+        model.on("change:layers", () => {
+            renderLayerSelect();
+            clearRenderCaches();
+            renderAll();
+        });
+        model.on("change:write_layer", renderLayerSelect);
+        let shownProvenance = model.get("provenance") || {};
+        model.on("change:provenance", () => {
+            // Re-render only the rows whose layer changed
+            const prov = model.get("provenance") || {};
+            for (const p of new Set([...Object.keys(shownProvenance), ...Object.keys(prov)])) {
+                if (shownProvenance[p] !== prov[p]) markPathDirty(p);
+            }
+            shownProvenance = prov;
+            renderAll();
+        });
         model.on("change:name", () => {
             if (document.activeElement !== titleEl) {
                 titleEl.textContent = model.get("name") || "config";
             }
         });
 
-        resetHistoryToCurrent();
+        resetHistory();
+        syncInstrument();
+        syncApplyButton();
+        renderConflict();
+        renderLayerSelect();
         renderAll();
     }
 };